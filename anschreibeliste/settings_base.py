@@ -85,6 +85,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'ledger.context_processors.js_config',
             ],
             'builtins': [
                 "base.icons",
@@ -111,6 +112,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Readers do not block the writer and vice versa.
+            # Commits survive crashes of the server, a power loss may undo the latest ones
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY; PRAGMA cache_size=-16000',
+            # Take the write lock when the transaction starts, waiting for it honors the timeout
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     },
 }
 
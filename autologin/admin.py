@@ -1,13 +1,55 @@
 from django.contrib import admin
 from django.contrib.sessions.models import Session
+from django.db.models import Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 from django.forms import ModelForm, Select
-from .models import AutoLogin, AutoLoginHistory
+from django.utils.translation import ngettext
+from .conf import settings
+from .models import AutoLogin, AutoLoginHistory, AutoLoginRollup
+from . import history
 # Register your models here.
 
-class HistoryInline(admin.TabularInline):
+class ReadOnlyInline(admin.TabularInline):
+    extra = 0
+    can_delete = False
+    # Newest entries first, only the first entries per login rule are shown
+    order_field: str
+
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request)\
+            .annotate(row=Window(RowNumber(), partition_by='login', order_by=f'-{self.order_field}'))\
+            .filter(row__lte=settings.ADMIN_HISTORY_ENTRIES)\
+            .order_by(f'-{self.order_field}')
+
+class HistoryInline(ReadOnlyInline):
     model = AutoLoginHistory
-    readonly_fields = [field.name for field in AutoLoginHistory._meta.fields]
+    order_field = 'timestamp'
+
+    @property
+    def verbose_name_plural(self):
+        count = settings.ADMIN_HISTORY_ENTRIES
+        return ngettext('Latest renewal', 'Latest %(count)d renewals', count) % {'count': count}
+
+    def get_queryset(self, request):
+        # Show buffered entries too
+        history.flush()
+        return super().get_queryset(request)
+
+class RollupInline(ReadOnlyInline):
+    model = AutoLoginRollup
+    order_field = 'date'
+
+    @property
+    def verbose_name_plural(self):
+        count = settings.ADMIN_HISTORY_ENTRIES
+        return ngettext('Latest daily renewal count', 'Latest %(count)d daily renewal counts', count) % {'count': count}
     
 def get_active_sessions() -> tuple[str, str]:
     return ((k, k) for k in Session.objects.filter(expire_date__gt=timezone.now()).values_list('session_key', flat=True))
@@ -20,4 +62,4 @@ class AutoLoginForm(ModelForm):
             'session_key': Select(choices=get_active_sessions)
         }
 
-admin.site.register(AutoLogin, list_display=('name', 'user'), inlines=[HistoryInline], form=AutoLoginForm)
+admin.site.register(AutoLogin, list_display=('name', 'user'), inlines=[HistoryInline, RollupInline], form=AutoLoginForm)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AutologinConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'autologin'
+
+    def ready(self) -> None:
+        from . import signals
+        from .conf import settings
+        settings.validate()
+        return super().ready()
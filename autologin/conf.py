@@ -0,0 +1,13 @@
+from utils.settings import AppSettings
+
+from datetime import timedelta
+
+# Older history entries are rolled up into daily counts
+HISTORY_RETENTION = timedelta(days=30)
+# Older daily counts are deleted, `None` keeps them
+ROLLUP_RETENTION = timedelta(days=365)
+
+# Entries shown per login rule in the admin
+ADMIN_HISTORY_ENTRIES = 20
+
+settings = AppSettings('AUTOLOGIN', globals(), nullable_keys=['ROLLUP_RETENTION'])
@@ -0,0 +1,122 @@
+"""
+Buffered writes and retention of the auto login history.
+
+Entries are collected in memory and written in one query
+once enough of them came together, or `FLUSH_INTERVAL` seconds after the first one.
+They are flushed on exit as well. A process killed without running exit handlers
+(crash, SIGKILL, some worker recycles) loses the entries not written yet,
+at most `BATCH_SIZE - 1` entries of the last `FLUSH_INTERVAL` seconds.
+
+Entries older than `HISTORY_RETENTION` are rolled up into daily counts
+per IP address and user agent, see `prune()`.
+"""
+from atexit import register as at_exit
+from datetime import datetime
+from logging import getLogger
+from threading import Lock, Timer
+from typing import NamedTuple
+
+from django.db import models, transaction, connection, IntegrityError
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .conf import settings
+from .models import AutoLogin, AutoLoginHistory, AutoLoginRollup
+
+logger = getLogger('autologin')
+
+BATCH_SIZE = 20
+# Seconds an entry waits at most
+FLUSH_INTERVAL = 60
+
+_buffer: list[AutoLoginHistory] = []
+_buffer_lock = Lock()
+_timer: Timer | None = None
+
+def record(entry: AutoLoginHistory):
+    global _timer
+    with _buffer_lock:
+        _buffer.append(entry)
+        due = len(_buffer) >= BATCH_SIZE
+        if not due and _timer is None:
+            _timer = Timer(FLUSH_INTERVAL, _flush_on_timer)
+            _timer.daemon = True
+            _timer.start()
+    if due:
+        flush()
+
+def _flush_on_timer():
+    try:
+        flush()
+    finally:
+        # The timer thread is gone afterwards
+        connection.close()
+
+@at_exit
+def flush():
+    global _timer
+    with _buffer_lock:
+        entries = _buffer[:]
+        _buffer.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not entries:
+        return
+
+    # Entries of rules deleted in the meantime are dropped
+    existing = set(AutoLogin.objects.filter(pk__in={entry.login_id for entry in entries}).values_list('pk', flat=True))
+    entries = [entry for entry in entries if entry.login_id in existing]
+    try:
+        with transaction.atomic():
+            AutoLoginHistory.objects.bulk_create(entries)
+    except IntegrityError:
+        # A rule was deleted right before the insert, keep the other entries
+        for entry in entries:
+            try:
+                with transaction.atomic():
+                    entry.save()
+            except IntegrityError:
+                logger.info(f'Dropped history entry of deleted login rule {entry.login_id}')
+
+class PruneResult(NamedTuple):
+    rolled_up: int
+    rollups_deleted: int
+
+@transaction.atomic
+def prune(now: datetime | None = None) -> PruneResult:
+    """
+    Rolls up history entries past retention and deletes expired rollups
+    """
+    now = now or timezone.now()
+    flush()
+
+    expired = AutoLoginHistory.objects.filter(timestamp__lt=now - settings.HISTORY_RETENTION)
+    counts = expired\
+        .annotate(date=TruncDate('timestamp'))\
+        .values('login', 'date', 'ip_address', 'user_agent')\
+        .annotate(count=models.Count('pk'))\
+        .order_by()
+    counts = {(row['login'], row['date'], row['ip_address'], row['user_agent']): row['count'] for row in counts}
+
+    existing = AutoLoginRollup.objects.filter(
+        login__in={login for login, *_ in counts},
+        date__in={date for _, date, *_ in counts},
+    )
+    existing = {(rollup.login_id, rollup.date, rollup.ip_address, rollup.user_agent): rollup for rollup in existing}
+    updated, created = [], []
+    for key, count in counts.items():
+        if key in existing:
+            existing[key].count += count
+            updated.append(existing[key])
+        else:
+            login, date, ip_address, user_agent = key
+            created.append(AutoLoginRollup(login_id=login, date=date, ip_address=ip_address, user_agent=user_agent, count=count))
+    AutoLoginRollup.objects.bulk_update(updated, ['count'])
+    AutoLoginRollup.objects.bulk_create(created)
+    rolled_up, _ = expired.delete()
+
+    rollups_deleted = 0
+    if settings.ROLLUP_RETENTION is not None:
+        rollups_deleted, _ = AutoLoginRollup.objects.filter(date__lt=(now - settings.ROLLUP_RETENTION).date()).delete()
+    return PruneResult(rolled_up, rollups_deleted)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from ...history import prune
+
+class Command(BaseCommand):
+    help = "Roll up auto login history past retention into daily counts and delete expired counts"
+
+    def handle(self, *args, **options):
+        result = prune()
+        self.stdout.write(f"Rolled up {result.rolled_up} history entries, deleted {result.rollups_deleted} daily counts")
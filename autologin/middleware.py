@@ -1,15 +1,30 @@
-
 from typing import Any, Callable
 from django.http import HttpRequest, HttpResponse
 from django.contrib.auth import login
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_ipv46_address
+from django.db import transaction
 
 from django.conf import settings
 
-from .models import AutoLogin
+from .models import AutoLogin, AutoLoginHistory
+from . import rules, history
 from logging import getLogger
 
 logger = getLogger('autologin')
 
+def client_address(request: HttpRequest) -> str | None:
+    """
+    IP address of the client, `None` if unknown (e.g. a unix socket).
+    Behind a reverse proxy, the server has to pass on the client address (see README)
+    """
+    address = request.META.get('REMOTE_ADDR')
+    try:
+        validate_ipv46_address(address)
+    except ValidationError:
+        return None
+    return address
+
 class AutoLoginMiddleware:
     def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
         self.get_response = get_response
@@ -23,17 +38,28 @@ class AutoLoginMiddleware:
         return response
     
     def auto_login(self, request: HttpRequest): 
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        # Unknown cookies are answered from the cache
+        rule_id = rules.find_rule(session_key)
+        if rule_id is None:
+            return
         try:
-            session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
-            login_rule = AutoLogin.objects.get(session_key=session_key)
-            login(request, login_rule.user)
-            login_rule.session_key = request.session.session_key
-            login_rule.history.create(
-                new_session_id=request.session.session_key,
-                ip_address=request.META['REMOTE_ADDR'],
-                user_agent=request.META['HTTP_USER_AGENT']
-            )
-            login_rule.save()
-            logger.info(f'Renewed session for {request.META['REMOTE_ADDR']} according to login rule "{login_rule.name}"')
-        except (AutoLogin.DoesNotExist, AutoLogin.MultipleObjectsReturned):
-            pass
+            login_rule = AutoLogin.objects.select_related('user').get(pk=rule_id, session_key=session_key)
+        except AutoLogin.DoesNotExist:
+            # Rule changed in the meantime
+            rules.invalidate()
+            return
+
+        login(request, login_rule.user)
+        new_session_key = request.session.session_key
+        AutoLogin.objects.filter(pk=login_rule.pk).update(session_key=new_session_key)
+        # `update` sends no signals
+        transaction.on_commit(rules.invalidate)
+        ip_address = client_address(request)
+        history.record(AutoLoginHistory(
+            login=login_rule,
+            new_session_id=new_session_key,
+            ip_address=ip_address,
+            user_agent=request.META.get('HTTP_USER_AGENT', '')[:1024],
+        ))
+        logger.info(f'Renewed session for {ip_address or "unknown address"} according to login rule "{login_rule.name}"')
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autologin', '0002_autologinhistory_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='autologin',
+            name='session_key',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autologin', '0003_autologin_session_key_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoLoginRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('ip_address', models.GenericIPAddressField()),
+                ('user_agent', models.CharField(max_length=1024)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='autologinhistory',
+            index=models.Index(fields=['login', 'timestamp'], name='autologin_a_login_i_c354b8_idx'),
+        ),
+        migrations.AddField(
+            model_name='autologinrollup',
+            name='login',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='autologin.autologin'),
+        ),
+        migrations.AddConstraint(
+            model_name='autologinrollup',
+            constraint=models.UniqueConstraint(fields=('login', 'date', 'ip_address', 'user_agent'), name='unique_autologin_rollup'),
+        ),
+    ]
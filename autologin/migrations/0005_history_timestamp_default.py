@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autologin', '0004_autologin_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='autologinhistory',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
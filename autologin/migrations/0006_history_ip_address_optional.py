@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autologin', '0005_history_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='autologinhistory',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='autologinrollup',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from typing import Type
 from django.db import models
 from django.contrib.auth import get_user_model, models as auth_models
+from django.utils.timezone import now
 from django.utils.translation import gettext as _
 
 # Create your models here.
@@ -10,18 +11,39 @@ UserModel: Type[auth_models.AbstractBaseUser] = get_user_model()
 class AutoLogin(models.Model):
     name = models.CharField(verbose_name=_('name'), max_length=255)
     user = models.ForeignKey(UserModel, verbose_name=_('User'), on_delete=models.CASCADE)
-    session_key = models.CharField(max_length=100)
+    session_key = models.CharField(max_length=100, db_index=True)
 
     history: models.QuerySet["AutoLoginHistory"]
+    rollups: models.QuerySet["AutoLoginRollup"]
         
     def __str__(self) -> str:
         return f"{self.user}"
     
 class AutoLoginHistory(models.Model):
     login = models.ForeignKey(AutoLogin, on_delete=models.CASCADE, related_name='history')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the entry is recorded, entries are written later in batches
+    timestamp = models.DateTimeField(default=now)
     new_session_id = models.CharField(max_length=100)
-    ip_address = models.GenericIPAddressField()
+    # `None` if the server did not know the client address
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=1024)
-    
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['login', 'timestamp']),
+        ]
+
+class AutoLoginRollup(models.Model):
+    """
+    Number of session renewals per day, IP address and user agent of history entries past retention
+    """
+    login = models.ForeignKey(AutoLogin, on_delete=models.CASCADE, related_name='rollups')
+    date = models.DateField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    user_agent = models.CharField(max_length=1024)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['login', 'date', 'ip_address', 'user_agent'], name='unique_autologin_rollup'),
+        ]
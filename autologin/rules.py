@@ -0,0 +1,30 @@
+"""
+Login rules by session key, kept in the default cache.
+
+Unauthenticated requests are matched against this mapping,
+so unknown session cookies never reach the database.
+The mapping is dropped whenever a rule is saved or deleted.
+"""
+from django.core.cache import cache
+
+from .models import AutoLogin
+
+CACHE_KEY = 'autologin:rules'
+
+def get_rules() -> dict[str, int]:
+    """
+    Returns: id of the login rule for each session key
+    """
+    rules = cache.get(CACHE_KEY)
+    if rules is None:
+        rules = dict(AutoLogin.objects.exclude(session_key='').values_list('session_key', 'pk'))
+        cache.set(CACHE_KEY, rules, timeout=None)
+    return rules
+
+def find_rule(session_key: str | None) -> int | None:
+    if not session_key:
+        return None
+    return get_rules().get(session_key)
+
+def invalidate():
+    cache.delete(CACHE_KEY)
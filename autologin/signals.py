@@ -0,0 +1,10 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AutoLogin
+from . import rules
+
+@receiver([post_save, post_delete], sender=AutoLogin)
+def login_rule_changed(**kwargs):
+	transaction.on_commit(rules.invalidate)
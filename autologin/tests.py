@@ -1,3 +1,131 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import AutoLogin, AutoLoginHistory, AutoLoginRollup
+from . import history, conf
+
+class AutoLoginTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username='tablet')
+        self.session_key = 'x' * 32
+
+    def test_unknown_cookie(self):
+        AutoLogin.objects.create(name='Bar', user=self.user, session_key=self.session_key)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'y' * 32
+        self.client.get('/login/')
+        # The rules are cached now, unknown cookies do not query them
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/login/')
+        self.assertFalse([query for query in queries if 'autologin_' in query['sql']])
+
+    def test_login(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = AutoLogin.objects.create(name='Bar', user=self.user, session_key=self.session_key)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = self.session_key
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/login/', headers={'user-agent': 'Tablet'})
+        new_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+        rule.refresh_from_db()
+        self.assertEqual(rule.session_key, new_key)
+        self.assertNotEqual(new_key, self.session_key)
+        self.assertEqual(self.client.session['_auth_user_id'], str(self.user.pk))
+
+        history.flush()
+        entry = AutoLoginHistory.objects.get()
+        self.assertEqual((entry.login, entry.new_session_id, entry.user_agent), (rule, new_key, 'Tablet'))
+
+        # The old cookie does not log in anymore
+        self.client.logout()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = self.session_key
+        self.client.get('/login/')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_unknown_address(self):
+        rule = AutoLogin.objects.create(name='Bar', user=self.user, session_key=self.session_key)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = self.session_key
+        # e.g. served on a unix socket
+        self.client.get('/login/', REMOTE_ADDR='')
+        history.flush()
+        self.assertIsNone(AutoLoginHistory.objects.get(login=rule).ip_address)
+
+class HistoryBufferTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='tablet')
+        self.rule = AutoLogin.objects.create(name='Bar', user=self.user, session_key='x' * 32)
+        self.addCleanup(history.flush)
+
+    def entry(self, rule: AutoLogin) -> AutoLoginHistory:
+        return AutoLoginHistory(login=rule, new_session_id='y' * 32, ip_address='10.0.0.2', user_agent='Tablet')
+
+    def test_flush(self):
+        deleted = AutoLogin.objects.create(name='Old', user=self.user, session_key='z' * 32)
+        entry = self.entry(self.rule)
+        history.record(entry)
+        history.record(self.entry(deleted))
+        # Flushed on a timer, not only on the next login
+        self.assertIsNotNone(history._timer)
+        deleted.delete()
+
+        history.flush()
+        self.assertIsNone(history._timer)
+        # The time of the login is kept, the entry of the deleted rule is dropped
+        self.assertEqual(list(AutoLoginHistory.objects.values_list('login', 'timestamp')), [(self.rule.pk, entry.timestamp)])
+
+class HistoryRetentionTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_superuser(username='admin')
+        self.rule = AutoLogin.objects.create(name='Bar', user=self.user, session_key='x' * 32)
+
+    def add_entries(self, timestamp, count, user_agent='Tablet'):
+        AutoLoginHistory.objects.bulk_create(
+            AutoLoginHistory(login=self.rule, timestamp=timestamp, new_session_id='y' * 32, ip_address='10.0.0.2', user_agent=user_agent)
+            for _ in range(count)
+        )
+
+    def test_prune(self):
+        now = timezone.now()
+        old = now - conf.settings.HISTORY_RETENTION - timedelta(days=1)
+        self.add_entries(old, 3)
+        self.add_entries(old, 1, user_agent='Phone')
+        self.add_entries(now, 2)
+        AutoLoginRollup.objects.create(login=self.rule, date=timezone.localdate(old), ip_address='10.0.0.2', user_agent='Tablet', count=4)
+        AutoLoginRollup.objects.create(login=self.rule, date=(now - conf.settings.ROLLUP_RETENTION - timedelta(days=1)).date(), ip_address='10.0.0.2', user_agent='Tablet', count=1)
+
+        self.assertEqual(history.prune(now), (4, 1))
+        self.assertEqual(AutoLoginHistory.objects.count(), 2)
+        self.assertEqual(
+            dict(AutoLoginRollup.objects.values_list('user_agent', 'count')),
+            {'Tablet': 7, 'Phone': 1})
+
+    @override_settings(AUTOLOGIN={'ROLLUP_RETENTION': None})
+    def test_keep_rollups(self):
+        now = timezone.now()
+        AutoLoginRollup.objects.create(login=self.rule, date=(now - timedelta(days=1000)).date(), ip_address='10.0.0.2', user_agent='Tablet', count=1)
+
+        conf.settings.validate()
+        self.assertEqual(history.prune(now), (0, 0))
+        self.assertEqual(AutoLoginRollup.objects.count(), 1)
+
+    def test_admin_inline(self):
+        self.add_entries(timezone.now(), conf.settings.ADMIN_HISTORY_ENTRIES + 5)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:autologin_autologin_change', args=[self.rule.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['inline_admin_formsets'][0].formset.total_form_count(), conf.settings.ADMIN_HISTORY_ENTRIES)
+
+    @override_settings(AUTOLOGIN={'ADMIN_HISTORY_ENTRIES': 5})
+    def test_admin_inline_title(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:autologin_autologin_change', args=[self.rule.pk]))
+        self.assertContains(response, 'Latest 5 renewals')
+        self.assertContains(response, 'Latest 5 daily renewal counts')
@@ -3,10 +3,12 @@ from django.utils.safestring import mark_safe, SafeText
 from django.conf import settings
 from django.apps import apps
 from zipfile import ZipFile
+from html import escape
+from typing import NamedTuple
 import xml.etree.ElementTree as ET
+import json
 from pathlib import Path
-from functools import lru_cache
-from copy import deepcopy
+from functools import lru_cache, cache
 
 register = template.Library()
 
@@ -14,10 +16,32 @@ default_class = "lucide"
 
 USE_ICON_CACHE = getattr(settings, 'ICON_USE_CACHE', not settings.DEBUG)
 
-@lru_cache(maxsize=128 if USE_ICON_CACHE else 0)
-def get_icon(name: str) -> ET.Element:
-    module_dir = Path(__file__).parent
+MODULE_DIR = Path(__file__).parent
+# Written by `manage.py compile_icons`
+REGISTRY_PATH = MODULE_DIR / 'registry.json'
+
+class IconTemplate(NamedTuple):
+    """
+    Pre-serialized icon. `body` is the markup inside the `<svg>` element.
+    """
+    attrib: dict[str, str]
+    body: str
+
+    @classmethod
+    def from_element(cls, root: ET.Element) -> "IconTemplate":
+        body = escape(root.text or '', quote=False)
+        body += ''.join(ET.tostring(child, encoding="unicode", method="html") for child in root)
+        return cls(dict(root.attrib), body)
+
+    def render(self, tag: str = 'svg', **kwargs) -> str:
+        attrib = self.attrib | kwargs
+        attrs = ''.join(f' {key}="{escape(str(value))}"' for key, value in attrib.items())
+        return f'<{tag}{attrs}>{self.body}</{tag}>'
 
+def find_icon(name: str) -> ET.Element:
+    """
+    Load icon `name` from the `icons/` directory of any app, or from `icons.zip`
+    """
     app_paths = (Path(config.path) / 'icons' for config in apps.get_app_configs())
     app_paths = [path for path in app_paths if path.is_dir()]
 
@@ -29,7 +53,7 @@ def get_icon(name: str) -> ET.Element:
                 node.tag = node.tag.removeprefix('{http://www.w3.org/2000/svg}')
             return root
 
-    with ZipFile(module_dir / "icons.zip") as archive:
+    with ZipFile(MODULE_DIR / "icons.zip") as archive:
         keep_attrs = ['viewBox']
         try:
             with archive.open(f"{name}.svg") as file:
@@ -41,8 +65,32 @@ def get_icon(name: str) -> ET.Element:
         except KeyError:
             raise ValueError(f"Icon '{name}' not found")
 
-def icon(name: str, size: int = None, **kwargs) -> SafeText:
-    icon = get_icon(name)
+@cache
+def icon_registry() -> dict[str, IconTemplate]:
+    """
+    Icons compiled by `manage.py compile_icons`, loaded once
+    """
+    try:
+        with open(REGISTRY_PATH, encoding='utf-8') as file:
+            registry = json.load(file)
+    except FileNotFoundError:
+        return {}
+    return {name: IconTemplate(entry['attrib'], entry['body']) for name, entry in registry.items()}
+
+@lru_cache(maxsize=128 if USE_ICON_CACHE else 0)
+def load_icon(name: str) -> IconTemplate:
+    return IconTemplate.from_element(find_icon(name))
+
+def get_icon(name: str) -> IconTemplate:
+    """
+    Icons missing from the registry are looked up on disk
+    """
+    try:
+        return icon_registry()[name]
+    except KeyError:
+        return load_icon(name)
+
+def icon_attrib(size: int = None, **kwargs) -> dict[str, str]:
     if size:
         kwargs.setdefault("width", str(size))
         kwargs.setdefault("height", str(size))
@@ -50,47 +98,36 @@ def icon(name: str, size: int = None, **kwargs) -> SafeText:
         before = kwargs.get('class')
         before = (' ' + before) if before else ''
         kwargs['class'] = default_class + before
-    icon.attrib.update({key.replace('_', '-'): value for key, value in kwargs.items()})
+    return {key.replace('_', '-'): value for key, value in kwargs.items()}
 
-    return mark_safe(ET.tostring(icon, encoding="unicode", method="html"))
+def icon(name: str, size: int = None, **kwargs) -> SafeText:
+    return mark_safe(get_icon(name).render(**icon_attrib(size, **kwargs)))
 
 @register.simple_tag(name="icon", takes_context=True)
 def tag_icon(context, name: str, size: int = None, **kwargs) -> SafeText:
     if name in context.get('__loaded_icons', []):
-        if size:
-            kwargs.setdefault("width", size)
-            kwargs.setdefault("height", size)
-        if default_class:
-            before = kwargs.get("class")
-            before = (' ' + before) if before else ''
-            kwargs["class"] = default_class + before
-        root = ET.Element('svg', attrib={key.replace('_', '-'): value for key, value in kwargs.items()})
-        ET.SubElement(root, 'use', attrib={'href': f'#icon-{name}'})
-        return mark_safe(ET.tostring(root, encoding="unicode", method="html"))
+        use = IconTemplate({}, f'<use href="#icon-{escape(name)}"></use>')
+        return mark_safe(use.render(**icon_attrib(size, **kwargs)))
 
     try:
         return icon(name=name, size=size, **kwargs)
     except:
         return ''
-    
+
+def icon_symbol(name: str) -> str:
+    template = get_icon(name)
+    attrib = {key: value for key, value in template.attrib.items() if key not in ('width', 'height')}
+    return IconTemplate(attrib, template.body).render('symbol', id=f'icon-{name}')
+
 @register.simple_tag(takes_context=True)
 def load_icons(context, *args, **kwargs):
-    root = ET.Element('svg', attrib=kwargs)
-    for icon in args:
-        symbol = deepcopy(get_icon(name=icon))
-        symbol.tag = 'symbol'
-        symbol.attrib['id'] = f'icon-{icon}'
-        symbol.attrib.pop('width', None)
-        symbol.attrib.pop('height', None)
-        root.append(symbol)
+    symbols = IconTemplate({}, ''.join(icon_symbol(icon) for icon in args))
     if '__loaded_icons' not in context:
         context['__loaded_icons'] = set()
     context['__loaded_icons'].update(args)
 
-    return mark_safe(ET.tostring(root, encoding="unicode", method="html"))
+    return mark_safe(symbols.render(**kwargs))
 
 @register.simple_tag
 def icon_masks():
-    icon = get_icon('__masks')
-    return mark_safe(ET.tostring(icon, encoding="unicode", method="html"))
-
+    return mark_safe(get_icon('__masks').render())
@@ -0,0 +1,56 @@
+from pathlib import Path
+import json
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...icons import REGISTRY_PATH, IconTemplate, find_icon, icon_registry, load_icon
+
+TEMPLATE_PATTERNS = [
+    re.compile(r'''{%\s*icon\s+["']([^"']+)["']'''),
+]
+LOAD_ICONS_PATTERN = re.compile(r'''{%\s*load_icons((?:\s+["'][^"']+["'])+)''')
+PYTHON_PATTERN = re.compile(r'''\bicon\(\s*(?:name\s*=\s*)?["']([^"']+)["']''')
+STRING_PATTERN = re.compile(r'''["']([^"']+)["']''')
+
+class Command(BaseCommand):
+    help = "Compile all icons used in templates and python code into the icon registry"
+
+    def add_arguments(self, parser):
+        parser.add_argument('icons', nargs='*', help="Additional icons to compile, e.g. icons chosen at runtime")
+
+    def used_icons(self) -> set[str]:
+        roots = [Path(config.path) for config in apps.get_app_configs() if not config.name.startswith('django.')]
+        roots += [Path(directory) for engine in settings.TEMPLATES for directory in engine.get('DIRS', [])]
+
+        names = {'__masks'}
+        for root in roots:
+            for path in root.rglob('*.html'):
+                content = path.read_text(encoding='utf-8')
+                for pattern in TEMPLATE_PATTERNS:
+                    names.update(pattern.findall(content))
+                for arguments in LOAD_ICONS_PATTERN.findall(content):
+                    names.update(STRING_PATTERN.findall(arguments))
+            for path in root.rglob('*.py'):
+                names.update(PYTHON_PATTERN.findall(path.read_text(encoding='utf-8')))
+        return names
+
+    def handle(self, *args, icons: list[str], **options):
+        names = sorted(self.used_icons() | set(icons))
+
+        registry: dict[str, IconTemplate] = {}
+        for name in names:
+            try:
+                registry[name] = IconTemplate.from_element(find_icon(name))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        with open(REGISTRY_PATH, 'w', encoding='utf-8') as file:
+            json.dump({name: template._asdict() for name, template in registry.items()}, file, indent='\t', sort_keys=True)
+            file.write('\n')
+        icon_registry.cache_clear()
+        load_icon.cache_clear()
+
+        self.stdout.write(self.style.SUCCESS(f"Compiled {len(registry)} icons"))
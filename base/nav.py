@@ -1,8 +1,10 @@
 
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.http import HttpRequest
 from typing import Iterable, Mapping
-from .utils.nav import NavItem
+from functools import lru_cache
+from .utils.nav import NavItem, RequestedNavItem
 
 from logging import getLogger
 
@@ -36,3 +38,56 @@ def get_nav_from_conf() -> Iterable[NavItem]:
 
 navbar = get_nav_from_conf()
 
+def compile_active_items(items: list[NavItem]) -> dict[str, frozenset[int]]:
+    """
+    Lookup table view name -> indices of the active items, for all view names in `items`
+    """
+    view_names = {path for item in items for path in item.paths}
+    return {
+        view_name: frozenset(index for index, item in enumerate(items) if item.is_active(view_name))
+        for view_name in view_names
+    }
+
+active_items = compile_active_items(navbar)
+
+def get_active_items(view_name: str) -> frozenset[int]:
+    try:
+        return active_items[view_name]
+    except KeyError:
+        pass
+    # Views only matched by prefix (or not at all) are added on first use
+    indices = frozenset(index for index, item in enumerate(navbar) if item.is_active(view_name))
+    active_items[view_name] = indices
+    return indices
+
+def get_user_permissions(user) -> frozenset[str] | None:
+    """
+    All permissions of `user`, `None` if the user has every permission
+    """
+    if not user.is_active:
+        return frozenset()
+    if user.is_superuser:
+        return None
+    # Cached on the user object by the auth backends
+    return frozenset(user.get_all_permissions())
+
+@lru_cache(maxsize=256)
+def resolve_nav(view_name: str, permissions: frozenset[str] | None) -> tuple[RequestedNavItem, ...]:
+    active = get_active_items(view_name)
+    return tuple(
+        RequestedNavItem(title=item.title, path=item.main_path, active=index in active)
+        for index, item in enumerate(navbar)
+        if item.is_visible(permissions)
+    )
+
+def get_nav_for_request(request: HttpRequest) -> tuple[RequestedNavItem, ...]:
+    """
+    The nav items visible to the user of `request`, computed once per request
+    """
+    try:
+        return request._nav_items
+    except AttributeError:
+        pass
+    view_name = request.resolver_match.view_name if request.resolver_match else ''
+    request._nav_items = resolve_nav(view_name, get_user_permissions(request.user))
+    return request._nav_items
@@ -1,26 +1,20 @@
 from django import template
 from django.http import HttpRequest
 
-from ..nav import navbar
+from ..nav import get_nav_for_request
 
 register = template.Library()
 
 @register.inclusion_tag("linktree.html", takes_context=True)
 def link_tree(context):
     request: HttpRequest = context["request"]
-    links = (item.for_request(request) for item in navbar)
-    links = (item for item in links if item)
-    
-    links = list(links)
+    links = list(get_nav_for_request(request))
     return { "links": links }
 
 @register.simple_tag(takes_context=True)
 def link_title(context):
     request: HttpRequest = context["request"]
-    links = (item.for_request(request) for item in navbar)
-    links = (item for item in links if item)
-
-    for item in links:
+    for item in get_nav_for_request(request):
         if item.active:
             return item.title
 
@@ -0,0 +1,34 @@
+from django.test import TestCase
+from django.contrib.auth.models import User, Permission
+
+from .nav import get_user_permissions
+from .utils.nav import NavItem
+
+class NavItemTest(TestCase):
+    def test_visible(self):
+        public = NavItem('Public', paths='public')
+        restricted = NavItem('Restricted', paths='restricted', permissions=['ledger.view_account', 'ledger.view_product'])
+
+        # `None` is a user with every permission
+        self.assertTrue(restricted.is_visible(None))
+        self.assertTrue(public.is_visible(frozenset()))
+        self.assertFalse(restricted.is_visible(frozenset()))
+        self.assertFalse(restricted.is_visible(frozenset({'ledger.view_account'})))
+        self.assertTrue(restricted.is_visible(frozenset({'ledger.view_account', 'ledger.view_product', 'wiki.view_article'})))
+
+    def test_active(self):
+        item = NavItem('Wiki', paths=['wiki:index', 'wiki:search'], path_prefixes='wiki:article')
+
+        self.assertTrue(item.is_active('wiki:index'))
+        self.assertTrue(item.is_active('wiki:article-edit'))
+        self.assertFalse(item.is_active('wiki:upload'))
+        self.assertFalse(item.is_active('ledger:main'))
+
+    def test_user_permissions(self):
+        user = User.objects.create_user(username='test')
+        user.user_permissions.add(Permission.objects.get(codename='view_account', content_type__app_label='ledger'))
+        self.assertEqual(get_user_permissions(user), frozenset({'ledger.view_account'}))
+
+        user.is_active = False
+        self.assertEqual(get_user_permissions(user), frozenset())
+        self.assertIsNone(get_user_permissions(User(username='admin', is_superuser=True)))
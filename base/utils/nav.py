@@ -3,7 +3,7 @@ from dataclasses import dataclass, field
 from collections.abc import Iterable
 from django.http import HttpRequest
 
-@dataclass
+@dataclass(frozen=True)
 class RequestedNavItem:
     title: str
     path: str
@@ -36,19 +36,21 @@ class NavItem:
 
         self.permissions = set(permissions)
 
+    def is_visible(self, permissions: set[str] | None) -> bool:
+        """
+        `permissions` are all permissions of the user, `None` if the user has every permission
+        """
+        return not self.permissions or permissions is None or self.permissions <= permissions
+
+    def is_active(self, view_name: str) -> bool:
+        return view_name in self.paths or any(view_name.startswith(prefix) for prefix in self.path_prefixes)
+
     def for_request(self, request: HttpRequest) -> RequestedNavItem | None:
         if not request.user.has_perms(self.permissions):
             return None
-        
-        view_name = request.resolver_match.view_name
-        is_active = \
-            view_name in self.paths or\
-            any(view_name.startswith(prefix) for prefix in self.path_prefixes)        
 
         return RequestedNavItem(
             title=self.title,
             path=self.main_path,
-            active=is_active
+            active=self.is_active(request.resolver_match.view_name)
         )
-
-
@@ -13,7 +13,7 @@ class IngredientAssignCategory(AdminActionForm):
 
 @admin.register(models.Ingredient)
 class IngredientAdmin(AdminActionFormsMixin, admin.ModelAdmin):
-    list_display = ['name', 'category']
+    list_display = ['name', 'category', 'product']
     ordering = ['category__name', 'name']
 
     @action_with_form(IngredientAssignCategory, description='Assign ingredients to category')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BlackbookConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blackbook'
+
+    def ready(self) -> None:
+        from . import signals
+        return super().ready()
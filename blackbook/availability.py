@@ -0,0 +1,89 @@
+"""
+Which recipes can be made from the available ingredients.
+
+Each recipe is kept as a bitset of its ingredients,
+so a query is a few integer operations per recipe.
+The index is built on first use and rebuilt whenever its version (`caching.AVAILABILITY`) changes.
+Changing recipe steps invalidates it in all processes sharing the default cache,
+others see the change once the version expires.
+"""
+from collections.abc import Iterable
+from threading import Lock
+from typing import NamedTuple
+
+from ledger.models import Product
+
+from .models import RecipeStep, Ingredient
+from . import caching
+
+class Availability(NamedTuple):
+    makeable: list[int]
+    # (recipe id, id of the missing ingredient)
+    missing_one: list[tuple[int, int]]
+
+class AvailabilityIndex:
+    bits: dict[int, int]
+    ingredients: list[int]
+    recipes: list[tuple[int, int]]
+
+    def __init__(self, steps: Iterable[tuple[int, int]]) -> None:
+        """
+        `steps` are `(recipe id, ingredient id)` pairs
+        """
+        self.bits = {}
+        self.ingredients = []
+        masks: dict[int, int] = {}
+        for recipe, ingredient in steps:
+            if ingredient not in self.bits:
+                self.bits[ingredient] = len(self.ingredients)
+                self.ingredients.append(ingredient)
+            masks[recipe] = masks.get(recipe, 0) | (1 << self.bits[ingredient])
+        self.recipes = list(masks.items())
+
+    def mask(self, ingredients: Iterable[int]) -> int:
+        mask = 0
+        for ingredient in ingredients:
+            if ingredient in self.bits:
+                mask |= 1 << self.bits[ingredient]
+        return mask
+
+    def query(self, available: Iterable[int]) -> Availability:
+        available = self.mask(available)
+        makeable, missing_one = [], []
+        for recipe, required in self.recipes:
+            missing = required & ~available
+            if not missing:
+                makeable.append(recipe)
+            elif missing.bit_count() == 1:
+                missing_one.append((recipe, self.ingredients[missing.bit_length() - 1]))
+        return Availability(makeable, missing_one)
+
+# (version, index)
+_index: tuple[str, AvailabilityIndex] | None = None
+_index_lock = Lock()
+
+def get_index() -> AvailabilityIndex:
+    global _index
+    version, = caching.get_versions(caching.AVAILABILITY)
+    with _index_lock:
+        if _index is None or _index[0] != version:
+            steps = RecipeStep.objects.exclude(ingredient=None).values_list('recipe_id', 'ingredient_id')
+            _index = (version, AvailabilityIndex(steps.iterator()))
+        return _index[1]
+
+def invalidate():
+    global _index
+    with _index_lock:
+        _index = None
+    caching.invalidate(caching.AVAILABILITY)
+
+def stock_ingredients() -> list[int]:
+    """
+    Ingredients whose stock product is visible
+    """
+    return list(Ingredient.objects
+        .filter(product__category=Product.ProductCategory.STOCK, product__visible=True)
+        .values_list('pk', flat=True))
+
+def available_recipes(ingredients: Iterable[int]) -> Availability:
+    return get_index().query(ingredients)
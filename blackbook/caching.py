@@ -0,0 +1,73 @@
+"""
+Versions of the cached recipe fragments.
+
+Each version is a random token kept in the default cache.
+Invalidating deletes the token, so all fragments keyed by it are abandoned.
+- `recipe:<pk>`: a single recipe changed
+- `recipe_list`: recipes were added, removed, renamed or retagged
+- `catalog`: models shared by all recipes changed (tags, ingredients, glasses, ...)
+- `availability`: recipe steps changed, see `availability`
+
+Versions expire after `VERSION_MAX_AGE`, so changes whose invalidation a process does not see
+(e.g. by `blackbook_import` with a cache not shared between processes) show up eventually.
+"""
+from hashlib import sha1
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+from .models import ServingGlass, PrepMethod
+from .svg import build_sprite
+
+CATALOG = 'catalog'
+RECIPE_LIST = 'recipe_list'
+AVAILABILITY = 'availability'
+
+VERSION_MAX_AGE = 60
+# Fragments of outdated versions are dropped eventually
+FRAGMENT_TIMEOUT = 60 * 60
+
+def version_key(name: str) -> str:
+    return f'blackbook:version:{name}'
+
+def recipe_version_name(pk) -> str:
+    return f'recipe:{pk}'
+
+def get_versions(*names: str) -> list[str]:
+    keys = [version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=VERSION_MAX_AGE)
+        versions |= missing
+    return [versions[key] for key in keys]
+
+def invalidate(*names: str):
+    cache.delete_many([version_key(name) for name in names])
+
+def invalidate_recipes(pks):
+    invalidate(*(recipe_version_name(pk) for pk in pks))
+
+def recipe_fragment_key(pk) -> str:
+    return 'blackbook:recipe:' + ':'.join([str(pk), get_language() or '', *get_versions(recipe_version_name(pk), CATALOG)])
+
+def recipe_list_version() -> str:
+    """
+    Vary the recipe list fragment on this
+    """
+    return ':'.join(get_versions(RECIPE_LIST, CATALOG))
+
+def get_icon_sprite() -> tuple[str, str]:
+    """
+    Sprite of all serving glass and prep method icons, and its version
+    """
+    key = 'blackbook:sprite:' + get_versions(CATALOG)[0]
+    sprite = cache.get(key)
+    if sprite is None:
+        icons = [*ServingGlass.objects.exclude(icon='').values_list('icon', flat=True),
+                 *PrepMethod.objects.exclude(icon='').values_list('icon', flat=True)]
+        content = build_sprite(icons)
+        sprite = (content, sha1(content.encode()).hexdigest()[:12])
+        cache.set(key, sprite, timeout=FRAGMENT_TIMEOUT)
+    return sprite
@@ -3,7 +3,6 @@ from typing import Any, Callable, Iterator, Tuple
 from django.forms import ModelForm, ModelChoiceField, FileField, ValidationError,  TextInput, BaseInlineFormSet, inlineformset_factory, CheckboxInput, CheckboxSelectMultiple,modelformset_factory
 from django.forms.widgets import ColorInput
 from itertools import groupby
-from io import BytesIO
 from django.core.files.uploadedfile import UploadedFile
 
 from colorfield.forms import ColorField
@@ -11,6 +10,7 @@ from colorfield.forms import ColorField
 from django.utils.safestring import SafeText, mark_safe
 from ledger.models import Product
 from .models import Recipe, ServingGlass, PrepMethod, RecipeStep, Ingredient, Tag
+from . import svg as svg_pipeline
 from django.utils.translation import gettext_lazy as _
 
 import xml.etree.ElementTree as ET
@@ -79,31 +79,16 @@ RecipeForm.base_fields['description'].widget.attrs['rows'] = '3'
 
 def clean_svg(svg: str, file: UploadedFile | None=None) -> str:
     if file:
-        if file.content_type == 'image/svg+xml':
-            new_data = BytesIO()
-            for chunk in file.chunks():
-                new_data.write(chunk)
-            new_data.seek(0)
-            element = ET.parse(new_data).getroot()
-        else:
+        if file.content_type != 'image/svg+xml':
             raise ValidationError('Unknown mime type', 'invalid_mime_type')
-    elif svg:
-        try:
-            element = ET.fromstring(svg)
-        except:
-            raise ValidationError('Invalid SVG code', 'invalid_svg')
-    else:
+        svg = b''.join(file.chunks())
+    elif not svg:
         return ''
-    
-    # Remove all <script> tags
-    for script_tag in element.iter('script'):
-        element.remove(script_tag)
-
-    # Remove all svg namespace
-    for node in element.iter():
-        node.tag = node.tag.removeprefix('{http://www.w3.org/2000/svg}')
 
-    return ET.tostring(element, encoding="unicode", method="html", xml_declaration=False)
+    try:
+        return svg_pipeline.clean_svg(svg)
+    except (ET.ParseError, ValueError):
+        raise ValidationError('Invalid SVG code', 'invalid_svg')
 
 class ServingGlassForm(ModelForm):
     class Meta:
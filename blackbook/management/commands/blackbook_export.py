@@ -0,0 +1,20 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from ...transfer import FORMATS, export_records, write_records
+
+class Command(BaseCommand):
+    help = "Export all recipes with their steps, tags, ingredients, glasses and methods"
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', default='-', help="File to write to. Default: stdout")
+        parser.add_argument('--format', choices=FORMATS, help="Default: by file extension, jsonl for stdout")
+
+    def handle(self, *args, file: str, format: str | None, **options):
+        format = format or ('yaml' if file.endswith(('.yaml', '.yml')) else 'jsonl')
+        if file == '-':
+            write_records(export_records(), sys.stdout, format)
+        else:
+            with open(file, 'w', encoding='utf-8') as output:
+                write_records(export_records(), output, format)
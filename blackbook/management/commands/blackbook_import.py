@@ -0,0 +1,26 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...transfer import FORMATS, import_records, read_records
+
+class Command(BaseCommand):
+    help = "Import recipes exported by blackbook_export. Objects are matched by name, recipes of the same name are replaced"
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="File to read from, '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help="Default: by file extension, jsonl for stdin")
+
+    def handle(self, *args, file: str, format: str | None, **options):
+        format = format or ('yaml' if file.endswith(('.yaml', '.yml')) else 'jsonl')
+        try:
+            if file == '-':
+                counts = import_records(read_records(sys.stdin, format))
+            else:
+                with open(file, encoding='utf-8') as input:
+                    counts = import_records(read_records(input, format))
+        except (ValueError, KeyError) as e:
+            raise CommandError(f"Invalid record: {e!r}")
+
+        summary = ', '.join(f"{count} {type}" for type, count in counts.items() if count)
+        self.stdout.write(self.style.SUCCESS(f"Imported {summary or 'nothing'}"))
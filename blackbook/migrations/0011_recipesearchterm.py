@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:15
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copy of `blackbook.search.recipe_terms` at the time of this migration
+def keyword_terms(keyword: str) -> set[str]:
+    keyword = ' '.join(keyword.casefold().split())
+    return {keyword[match.start():] for match in re.finditer(r'\S+', keyword)}
+
+def recipe_terms(name, tags, ingredients) -> set[tuple[str, str]]:
+    terms = {('name', term) for term in keyword_terms(name)}
+    terms |= {('tag', term) for tag in tags for term in keyword_terms(tag)}
+    terms |= {('has', term) for ingredient in ingredients for term in keyword_terms(ingredient)}
+    return terms
+
+def build_search_index(apps, schema_editor):
+    Recipe = apps.get_model('blackbook', 'Recipe')
+    RecipeSearchTerm = apps.get_model('blackbook', 'RecipeSearchTerm')
+
+    recipes = Recipe.objects.prefetch_related('tags', 'steps__ingredient')
+    RecipeSearchTerm.objects.bulk_create(
+        RecipeSearchTerm(recipe=recipe, category=category, term=term)
+        for recipe in recipes
+        for category, term in recipe_terms(
+            recipe.name,
+            (tag.name for tag in recipe.tags.all()),
+            (step.ingredient.name for step in recipe.steps.all() if step.ingredient),
+        )
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blackbook', '0010_alter_recipe_serving_glass'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=16)),
+                ('term', models.CharField(max_length=255)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='blackbook.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'term'], name='idx_search_category_term')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
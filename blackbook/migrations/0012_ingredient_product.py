@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blackbook', '0011_recipesearchterm'),
+        ('ledger', '0018_account_joined_squashed_0019_remove_account_joined_account_created_squashed_0020_alter_account_created'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='product',
+            field=models.ForeignKey(blank=True, default=None, help_text='Ingredient is available while this product is visible', limit_choices_to={'category': 'STCK'}, null=True, on_delete=django.db.models.deletion.SET_NULL, to='ledger.product', verbose_name='Stock product'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+def rename_duplicates(apps, schema_editor):
+    Recipe = apps.get_model('blackbook', 'Recipe')
+
+    taken = set(Recipe.objects.values_list('name', flat=True))
+    seen = set()
+    for recipe in Recipe.objects.order_by('pk'):
+        if recipe.name not in seen:
+            seen.add(recipe.name)
+            continue
+        number = 2
+        while f'{recipe.name} {number}' in taken:
+            number += 1
+        recipe.name = f'{recipe.name} {number}'
+        taken.add(recipe.name)
+        seen.add(recipe.name)
+        recipe.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blackbook', '0012_ingredient_product'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(max_length=255, unique=True, verbose_name='name'),
+        ),
+    ]
@@ -0,0 +1,152 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:22
+
+import re
+import xml.etree.ElementTree as ET
+
+from django.db import migrations, models
+
+# Copy of `blackbook.svg.clean_svg` at the time of this migration
+SVG_NAMESPACE = '{http://www.w3.org/2000/svg}'
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+
+# Decimal places kept in coordinates
+PRECISION = 2
+
+ELEMENTS = {
+    'svg', 'g', 'defs', 'symbol', 'use', 'title', 'desc',
+    'path', 'rect', 'circle', 'ellipse', 'line', 'polyline', 'polygon', 'text', 'tspan',
+    'linearGradient', 'radialGradient', 'stop', 'clipPath', 'mask', 'pattern',
+}
+ATTRIBUTES = {
+    'id', 'class', 'viewBox', 'width', 'height', 'x', 'y', 'x1', 'y1', 'x2', 'y2',
+    'cx', 'cy', 'r', 'rx', 'ry', 'd', 'points', 'transform', 'href', 'preserveAspectRatio',
+    'fill', 'fill-opacity', 'fill-rule', 'stroke', 'stroke-width', 'stroke-opacity',
+    'stroke-linecap', 'stroke-linejoin', 'stroke-miterlimit', 'stroke-dasharray', 'stroke-dashoffset',
+    'opacity', 'color', 'clip-path', 'clip-rule', 'mask', 'display', 'visibility',
+    'offset', 'stop-color', 'stop-opacity', 'gradientUnits', 'gradientTransform',
+    'patternUnits', 'patternTransform', 'maskUnits', 'clipPathUnits',
+    'font-family', 'font-size', 'font-weight', 'text-anchor', 'dominant-baseline',
+}
+# Elements whose text and whitespace is content
+TEXT_ELEMENTS = {'text', 'tspan', 'title', 'desc'}
+# Attributes whose numbers are rounded to PRECISION
+NUMERIC_ATTRIBUTES = {'d', 'points', 'transform', 'x', 'y', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'r', 'rx', 'ry', 'stroke-width'}
+
+NUMBER_PATTERN = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+REFERENCE_PATTERN = re.compile(r'url\(\s*#([^)\s]+)\s*\)')
+# Scripts and references to other documents
+UNSAFE_VALUE_PATTERN = re.compile(r'javascript:|data:|expression\(|url\(\s*(?!#)', re.IGNORECASE)
+
+def round_number(match: re.Match) -> str:
+    number = f'{round(float(match.group()), PRECISION):.{PRECISION}f}'.rstrip('0').rstrip('.')
+    if number == '-0':
+        number = '0'
+    # Leading zeros are not needed, '0.5' -> '.5'
+    return re.sub(r'^(-?)0\.', r'\1.', number)
+
+def minify_numbers(key: str, value: str) -> str:
+    value = NUMBER_PATTERN.sub(round_number, value)
+    value = re.sub(r'\s*,\s*', ',', value)
+    value = re.sub(r'\s+', ' ', value).strip()
+    if key in ('d', 'points'):
+        # No separators needed around commands and before signs
+        value = re.sub(r'\s*([a-zA-Z])\s*', r'\1', value)
+        value = re.sub(r'[ ,](-)', r'\1', value)
+    return value
+
+def sanitize(element: ET.Element) -> ET.Element | None:
+    """
+    Keeps whitelisted elements and attributes only.
+    Returns `None` if `element` itself is not allowed.
+    """
+    tag = element.tag.removeprefix(SVG_NAMESPACE)
+    if tag not in ELEMENTS:
+        return None
+    element.tag = tag
+
+    # Inline styles become attributes, attributes take precedence
+    attributes = [
+        (key.strip(), value)
+        for key, _, value in (declaration.partition(':') for declaration in element.attrib.get('style', '').split(';'))
+        if value
+    ]
+    attributes += element.attrib.items()
+
+    attrib = {}
+    for key, value in attributes:
+        if key == XLINK_HREF:
+            key = 'href'
+        if key not in ATTRIBUTES or UNSAFE_VALUE_PATTERN.search(value):
+            continue
+        # Only references into the icon itself
+        if key == 'href' and not value.startswith('#'):
+            continue
+        attrib[key] = minify_numbers(key, value) if key in NUMERIC_ATTRIBUTES else value.strip()
+    element.attrib = attrib
+    if tag == 'use' and 'href' not in attrib:
+        return None
+
+    # Whitespace between elements is not needed
+    text_content = tag in TEXT_ELEMENTS
+    if not text_content:
+        element.text = None
+    for child in list(element):
+        if sanitize(child) is None:
+            element.remove(child)
+        elif not text_content and child.tail is not None and not child.tail.strip():
+            child.tail = None
+    return element
+
+def drop_unused_ids(root: ET.Element):
+    references = set()
+    for node in root.iter():
+        for key, value in node.attrib.items():
+            if key == 'href':
+                references.add(value.removeprefix('#'))
+            references.update(REFERENCE_PATTERN.findall(value))
+    for node in root.iter():
+        if node.attrib.get('id') not in references:
+            node.attrib.pop('id', None)
+
+def clean_svg(svg: str | bytes) -> str:
+    """
+    Sanitized and minified `svg`. Raises `ET.ParseError` for invalid markup
+    and `ValueError` if the root is not an `<svg>` element.
+    """
+    root = ET.fromstring(svg)
+    if root.tag.removeprefix(SVG_NAMESPACE) != 'svg':
+        raise ValueError('Root element is not <svg>')
+    sanitize(root)
+    drop_unused_ids(root)
+    return ET.tostring(root, encoding='unicode', short_empty_elements=True).replace(' />', '/>')
+
+
+def minify_icons(apps, schema_editor):
+    for model in ['ServingGlass', 'PrepMethod']:
+        for obj in apps.get_model('blackbook', model).objects.exclude(icon=''):
+            try:
+                obj.icon = clean_svg(obj.icon)
+            except (ET.ParseError, ValueError):
+                obj.icon = ''
+            obj.save(update_fields=['icon'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blackbook', '0013_recipe_unique_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prepmethod',
+            name='icon',
+            field=models.TextField(blank=True, default='', help_text='Sanitized and minified SVG'),
+        ),
+        migrations.AlterField(
+            model_name='servingglass',
+            name='icon',
+            field=models.TextField(blank=True, default='', help_text='Sanitized and minified SVG'),
+        ),
+        migrations.RunPython(minify_icons, migrations.RunPython.noop),
+    ]
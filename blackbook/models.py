@@ -7,6 +7,8 @@ from colorfield.fields import ColorField
 
 from ledger.models import Product
 
+from .svg import IconReference, icon_reference
+
 # Create your models here.
 
 class NamedModel(models.Model):
@@ -36,16 +38,22 @@ class Tag(NamedModel):
     color = ColorField(verbose_name=_('Color'), default=random_color)
 
 
-class ServingGlass(NamedModel):
-    icon = models.TextField(default="", blank=True)
+class IconModel(NamedModel):
+    icon = models.TextField(default="", blank=True, help_text=_("Sanitized and minified SVG"))
 
+    class Meta:
+        abstract = True
+
+    @property
+    def icon_reference(self) -> IconReference | None:
+        return icon_reference(self.icon)
+
+class ServingGlass(IconModel):
     class Meta:
         verbose_name = _("Serving glass")
         verbose_name_plural = _("Serving glasses")
 
-class PrepMethod(NamedModel):
-    icon = models.TextField(default="", blank=True)
-
+class PrepMethod(IconModel):
     class Meta:
         verbose_name = _("Prep method")
         verbose_name_plural = _("Prep methods")
@@ -60,6 +68,8 @@ class IngredientCategory(NamedModel):
 
 class Ingredient(NamedModel):
     category = models.ForeignKey(IngredientCategory, on_delete=models.SET_NULL, null=True, blank=True, default=None)
+    product = models.ForeignKey(Product, verbose_name=_('Stock product'), on_delete=models.SET_NULL, null=True, blank=True, default=None,
+        limit_choices_to={'category': Product.ProductCategory.STOCK}, help_text=_("Ingredient is available while this product is visible"))
 
     class Meta:
         verbose_name = _("Ingredient")
@@ -80,6 +90,7 @@ class RecipeGroup(NamedModel):
         ordering = ['order']
 
 class Recipe(NamedModel):
+    name = models.CharField(verbose_name=_('name'), max_length=255, unique=True)
     description = models.TextField(verbose_name=_('description'), blank=True)
 
     group = models.ForeignKey(RecipeGroup, verbose_name=_('group'), on_delete=models.SET_NULL, null=True, blank=True, default=None)
@@ -100,21 +111,6 @@ class Recipe(NamedModel):
 
     def get_absolute_url(self) -> str:
         return reverse('blackbook:recipe_detail', kwargs={'pk': self.pk})
-    
-    def search_metadata(self) -> dict[str, Any]:
-        """
-        Gives keywords for search in recipe list.
-
-        Keywords are sorted into categories (the keys of the returned dict).
-        Each category has either a keyword (string) or a list of keywords (list of strings)
-
-        A recipe is matched if it has a (partial) match with at least one keyword in its respective category for every query keyword.
-        """
-        return {
-            'name': self.name.casefold(),
-            'tag': [tag.name.casefold() for tag in self.tags.all()],
-            'has': [step.ingredient.name.casefold() for step in self.steps.all() if step.ingredient]
-        }
 
 class RecipeStep(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='steps')
@@ -146,3 +142,16 @@ class RecipeStep(models.Model):
 
         s += f" {self.instruction}"
         return s.strip()
+
+class RecipeSearchTerm(models.Model):
+    """
+    Search index entry, maintained by `blackbook.search`
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='search_terms')
+    category = models.CharField(max_length=16)
+    term = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'term'], name="idx_search_category_term")
+        ]
@@ -0,0 +1,122 @@
+"""
+Inverted index for the recipe search.
+
+Every recipe is indexed with keywords sorted into categories:
+- `name`: the recipe name
+- `tag`: the names of its tags
+- `has`: the names of its ingredients
+
+A keyword is stored once for each word it contains, starting at that word
+(`"white rum"` is stored as `"white rum"` and `"rum"`),
+so a prefix match finds words inside of keywords as well.
+"""
+from collections.abc import Iterable
+import re
+import sys
+
+from django.db import models
+
+from .models import Recipe, RecipeStep, RecipeSearchTerm
+
+CATEGORIES = ['name', 'tag', 'has']
+DEFAULT_CATEGORY = 'name'
+
+QUOTED_PATTERN = re.compile(r"""([^'"\s]+)|"(.*?)"|'(.*?)'""")
+
+def keyword_terms(keyword: str) -> set[str]:
+    """
+    `keyword` from each word on
+    """
+    keyword = ' '.join(keyword.casefold().split())
+    return {keyword[match.start():] for match in re.finditer(r'\S+', keyword)}
+
+def recipe_terms(name: str, tags: Iterable[str], ingredients: Iterable[str]) -> set[tuple[str, str]]:
+    """
+    All `(category, term)` pairs of a recipe
+    """
+    terms = {('name', term) for term in keyword_terms(name)}
+    terms |= {('tag', term) for tag in tags for term in keyword_terms(tag)}
+    terms |= {('has', term) for ingredient in ingredients for term in keyword_terms(ingredient)}
+    return terms
+
+def prefix_end(prefix: str) -> str | None:
+    """
+    The smallest string greater than all strings starting with `prefix`, `None` if there is none.
+
+    Prefix matches are written as the range `prefix <= term < prefix_end(prefix)`,
+    which the `(category, term)` index can serve unlike `LIKE 'prefix%'`.
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    # Surrogates are not valid on their own
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
+def split_quoted(query: str) -> list[str]:
+    """
+    Splits at whitespace, keeping quoted parts together
+    """
+    return [next(group for group in match.groups() if group is not None) for match in QUOTED_PATTERN.finditer(query)]
+
+def parse_query(query: str) -> list[tuple[str, str, bool]]:
+    """
+    Returns: `(category, value, inverted)` for each keyword of `query`.
+
+    Keywords have the form `[-][category:]value`
+    """
+    keywords = []
+    for keyword in split_quoted(query.casefold()):
+        inverted = keyword.startswith('-')
+        keyword = keyword.removeprefix('-')
+        category, value = keyword.split(':')[:2] if ':' in keyword else (DEFAULT_CATEGORY, keyword)
+        value = ' '.join(value.split())
+        if value:
+            keywords.append((category, value, inverted))
+    return keywords
+
+def search_recipes(query: str) -> models.QuerySet:
+    """
+    Recipes matching `query`.
+
+    A recipe is matched if every keyword of the query is a prefix of a word
+    of at least one keyword in the respective category.
+    Inverted keywords (starting with `-`) must not match.
+    """
+    recipes = Recipe.objects.all()
+    for category, value, inverted in parse_query(query):
+        matching = RecipeSearchTerm.objects.filter(category=category, term__gte=value)
+        if (end := prefix_end(value)) is not None:
+            matching = matching.filter(term__lt=end)
+        matching = matching.values('recipe')
+        if inverted:
+            recipes = recipes.exclude(pk__in=matching)
+        else:
+            recipes = recipes.filter(pk__in=matching)
+    return recipes
+
+def index_recipes(recipe_ids: Iterable[int]):
+    """
+    Rebuild the search terms of the given recipes
+    """
+    recipes = Recipe.objects\
+        .filter(pk__in=set(recipe_ids))\
+        .only('name')\
+        .prefetch_related(
+            models.Prefetch('tags', to_attr='indexed_tags'),
+            models.Prefetch('steps', to_attr='indexed_steps', queryset=RecipeStep.objects.select_related('ingredient')),
+        )
+
+    recipes = list(recipes)
+    RecipeSearchTerm.objects.filter(recipe__in=recipes).delete()
+    RecipeSearchTerm.objects.bulk_create(
+        RecipeSearchTerm(recipe=recipe, category=category, term=term)
+        for recipe in recipes
+        for category, term in recipe_terms(
+            recipe.name,
+            (tag.name for tag in recipe.indexed_tags),
+            (step.ingredient.name for step in recipe.indexed_steps if step.ingredient),
+        )
+    )
@@ -0,0 +1,111 @@
+from collections.abc import Iterable
+from threading import local
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from ledger.models import Product
+
+from .models import Recipe, RecipeStep, Tag, Ingredient, IngredientCategory, ServingGlass, PrepMethod, RecipeGroup
+from . import search, availability, caching
+
+_pending = local()
+
+def flush_index():
+	recipe_ids = getattr(_pending, 'recipe_ids', set())
+	_pending.recipe_ids = set()
+	if recipe_ids:
+		search.index_recipes(recipe_ids)
+
+def reindex(recipe_ids: Iterable[int]):
+	"""
+	Index the recipes once the transaction commits.
+	Changes to many steps of a recipe index it only once.
+	"""
+	recipe_ids = set(recipe_ids)
+	if recipe_ids:
+		_pending.recipe_ids = getattr(_pending, 'recipe_ids', set()) | recipe_ids
+		transaction.on_commit(flush_index)
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(instance: Recipe, **_):
+	reindex([instance.pk])
+
+@receiver(post_save, sender=RecipeStep)
+@receiver(post_delete, sender=RecipeStep)
+def index_recipe_step(instance: RecipeStep, **_):
+	reindex([instance.recipe_id])
+
+def tagged_recipes(instance: Recipe | Tag, action: str, reverse: bool, pk_set: set[int] | None) -> list[int]:
+	"""
+	Recipes whose tags change by this `m2m_changed` signal.
+	Reverse clears are reported before the clear, the others after the change.
+	"""
+	if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+		return [instance.pk]
+	elif reverse and action in ('post_add', 'post_remove'):
+		return list(pk_set)
+	elif reverse and action == 'pre_clear':
+		return list(instance.recipe_set.values_list('pk', flat=True))
+	return []
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def index_recipe_tags(instance: Recipe | Tag, action: str, reverse: bool, pk_set: set[int] | None, **_):
+	reindex(tagged_recipes(instance, action, reverse, pk_set))
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def index_tag(instance: Tag, created: bool = False, **_):
+	if not created:
+		reindex(instance.recipe_set.values_list('pk', flat=True))
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient(instance: Ingredient, created: bool = False, **_):
+	if not created:
+		reindex(Recipe.objects.filter(steps__ingredient=instance).values_list('pk', flat=True))
+
+@receiver(post_save, sender=RecipeStep)
+@receiver(post_delete, sender=RecipeStep)
+def invalidate_availability(**_):
+	transaction.on_commit(availability.invalidate)
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_cache(instance: Recipe, **_):
+	pk = instance.pk
+	transaction.on_commit(lambda: caching.invalidate(caching.recipe_version_name(pk), caching.RECIPE_LIST))
+
+@receiver(post_save, sender=RecipeStep)
+@receiver(post_delete, sender=RecipeStep)
+def invalidate_recipe_step_cache(instance: RecipeStep, **_):
+	pk = instance.recipe_id
+	transaction.on_commit(lambda: caching.invalidate(caching.recipe_version_name(pk)))
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_cache(instance: Recipe | Tag, action: str, reverse: bool, pk_set: set[int] | None, **_):
+	pks = tagged_recipes(instance, action, reverse, pk_set)
+	if pks:
+		transaction.on_commit(lambda: caching.invalidate(caching.RECIPE_LIST, *map(caching.recipe_version_name, pks)))
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=IngredientCategory)
+@receiver(post_delete, sender=IngredientCategory)
+@receiver(post_save, sender=ServingGlass)
+@receiver(post_delete, sender=ServingGlass)
+@receiver(post_save, sender=PrepMethod)
+@receiver(post_delete, sender=PrepMethod)
+@receiver(post_save, sender=RecipeGroup)
+@receiver(post_delete, sender=RecipeGroup)
+def invalidate_catalog_cache(**_):
+	transaction.on_commit(lambda: caching.invalidate(caching.CATALOG))
+
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def invalidate_product_cache(instance: Product, **_):
+	pks = list(Recipe.objects.filter(product=instance).values_list('pk', flat=True))
+	if pks:
+		transaction.on_commit(lambda: caching.invalidate_recipes(pks))
@@ -20,28 +20,35 @@ function splitQuoted(str) {
         .map(match => match.slice(1).find(e => e !== undefined))
         .filter(e => e !== undefined);
 }
-// An array of [name, element] pairs, for faster search
-const search_items = [...document.querySelectorAll('#recipes a.recipe')]
-    .map(e => [JSON.parse(e.querySelector('script')?.textContent ?? '{}'), e]);
-function search() {
-    search_items.forEach(([_, e]) => delete e.dataset.selected);
-    const searchTerms = splitQuoted(search_bar.value.toLowerCase());
-    const matches = (metadata) => {
-        return searchTerms.every(term => {
-            const invert = term.startsWith('-');
-            if (invert) {
-                term = term.slice(1);
+const search_items = [...document.querySelectorAll('#recipes a.recipe')];
+const search_url = search_bar.dataset.searchUrl;
+let search_controller = null;
+async function search() {
+    search_items.forEach(e => delete e.dataset.selected);
+    // Only the latest query may update the list
+    search_controller?.abort();
+    const controller = search_controller = new AbortController();
+    let matches = null;
+    if (search_bar.value.trim()) {
+        try {
+            const response = await fetch(search_url + '?' + new URLSearchParams({ q: search_bar.value }), {
+                signal: controller.signal,
+            });
+            if (!response.ok) {
+                return;
             }
-            const [value, op] = [...term.split(':', 2).reverse(), 'name'];
-            let metavalue = metadata[op];
-            if (!Array.isArray(metavalue)) {
-                metavalue = [metavalue];
-            }
-            return invert != metavalue.some(e => e.includes(value));
-        });
-    };
-    search_items.forEach(([metadata, element]) => {
-        element.style.display = matches(metadata) ? '' : 'none';
+            const result = await response.json();
+            matches = new Set(result.ids.map(id => id.toString()));
+        }
+        catch {
+            return;
+        }
+    }
+    if (controller.signal.aborted) {
+        return;
+    }
+    search_items.forEach(element => {
+        element.style.display = matches === null || matches.has(element.dataset.id) ? '' : 'none';
     });
 }
 search_bar.addEventListener('input', debounce(_ => {
@@ -85,7 +92,7 @@ async function selectWithAnimation(list, index) {
 const random_button = document.querySelector('#random');
 random_button.addEventListener("click", _ => {
     document.querySelectorAll('.recipe[data-selected]').forEach(e => delete e.dataset.selected);
-    const visible_recipes = search_items.map(e => e[1]).filter(e => e.style.display !== "none");
+    const visible_recipes = search_items.filter(e => e.style.display !== "none");
     const selected_index = Math.floor(Math.random() * visible_recipes.length);
     random_button.disabled = true;
     selectWithAnimation(visible_recipes, selected_index)
@@ -0,0 +1,172 @@
+"""
+Sanitizing and minifying of the icons of serving glasses and prep methods,
+and the sprite all icons are served from.
+"""
+from functools import lru_cache
+from hashlib import sha1
+from logging import getLogger
+from typing import NamedTuple
+import re
+import xml.etree.ElementTree as ET
+
+logger = getLogger(__name__)
+
+SVG_NAMESPACE = '{http://www.w3.org/2000/svg}'
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+
+# Decimal places kept in coordinates
+PRECISION = 2
+
+ELEMENTS = {
+    'svg', 'g', 'defs', 'symbol', 'use', 'title', 'desc',
+    'path', 'rect', 'circle', 'ellipse', 'line', 'polyline', 'polygon', 'text', 'tspan',
+    'linearGradient', 'radialGradient', 'stop', 'clipPath', 'mask', 'pattern',
+}
+ATTRIBUTES = {
+    'id', 'class', 'viewBox', 'width', 'height', 'x', 'y', 'x1', 'y1', 'x2', 'y2',
+    'cx', 'cy', 'r', 'rx', 'ry', 'd', 'points', 'transform', 'href', 'preserveAspectRatio',
+    'fill', 'fill-opacity', 'fill-rule', 'stroke', 'stroke-width', 'stroke-opacity',
+    'stroke-linecap', 'stroke-linejoin', 'stroke-miterlimit', 'stroke-dasharray', 'stroke-dashoffset',
+    'opacity', 'color', 'clip-path', 'clip-rule', 'mask', 'display', 'visibility',
+    'offset', 'stop-color', 'stop-opacity', 'gradientUnits', 'gradientTransform',
+    'patternUnits', 'patternTransform', 'maskUnits', 'clipPathUnits',
+    'font-family', 'font-size', 'font-weight', 'text-anchor', 'dominant-baseline',
+}
+# Elements whose text and whitespace is content
+TEXT_ELEMENTS = {'text', 'tspan', 'title', 'desc'}
+# Attributes whose numbers are rounded to PRECISION
+NUMERIC_ATTRIBUTES = {'d', 'points', 'transform', 'x', 'y', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'r', 'rx', 'ry', 'stroke-width'}
+
+NUMBER_PATTERN = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+REFERENCE_PATTERN = re.compile(r'url\(\s*#([^)\s]+)\s*\)')
+# Scripts and references to other documents
+UNSAFE_VALUE_PATTERN = re.compile(r'javascript:|data:|expression\(|url\(\s*(?!#)', re.IGNORECASE)
+
+def round_number(match: re.Match) -> str:
+    number = f'{round(float(match.group()), PRECISION):.{PRECISION}f}'.rstrip('0').rstrip('.')
+    if number == '-0':
+        number = '0'
+    # Leading zeros are not needed, '0.5' -> '.5'
+    return re.sub(r'^(-?)0\.', r'\1.', number)
+
+def minify_numbers(key: str, value: str) -> str:
+    value = NUMBER_PATTERN.sub(round_number, value)
+    value = re.sub(r'\s*,\s*', ',', value)
+    value = re.sub(r'\s+', ' ', value).strip()
+    if key in ('d', 'points'):
+        # No separators needed around commands and before signs
+        value = re.sub(r'\s*([a-zA-Z])\s*', r'\1', value)
+        value = re.sub(r'[ ,](-)', r'\1', value)
+    return value
+
+def sanitize(element: ET.Element) -> ET.Element | None:
+    """
+    Keeps whitelisted elements and attributes only.
+    Returns `None` if `element` itself is not allowed.
+    """
+    tag = element.tag.removeprefix(SVG_NAMESPACE)
+    if tag not in ELEMENTS:
+        return None
+    element.tag = tag
+
+    # Inline styles become attributes, attributes take precedence
+    attributes = [
+        (key.strip(), value)
+        for key, _, value in (declaration.partition(':') for declaration in element.attrib.get('style', '').split(';'))
+        if value
+    ]
+    attributes += element.attrib.items()
+
+    attrib = {}
+    for key, value in attributes:
+        if key == XLINK_HREF:
+            key = 'href'
+        if key not in ATTRIBUTES or UNSAFE_VALUE_PATTERN.search(value):
+            continue
+        # Only references into the icon itself
+        if key == 'href' and not value.startswith('#'):
+            continue
+        attrib[key] = minify_numbers(key, value) if key in NUMERIC_ATTRIBUTES else value.strip()
+    element.attrib = attrib
+    if tag == 'use' and 'href' not in attrib:
+        return None
+
+    # Whitespace between elements is not needed
+    text_content = tag in TEXT_ELEMENTS
+    if not text_content:
+        element.text = None
+    for child in list(element):
+        if sanitize(child) is None:
+            element.remove(child)
+        elif not text_content and child.tail is not None and not child.tail.strip():
+            child.tail = None
+    return element
+
+def drop_unused_ids(root: ET.Element):
+    references = set()
+    for node in root.iter():
+        for key, value in node.attrib.items():
+            if key == 'href':
+                references.add(value.removeprefix('#'))
+            references.update(REFERENCE_PATTERN.findall(value))
+    for node in root.iter():
+        if node.attrib.get('id') not in references:
+            node.attrib.pop('id', None)
+
+def clean_svg(svg: str | bytes) -> str:
+    """
+    Sanitized and minified `svg`. Raises `ET.ParseError` for invalid markup
+    and `ValueError` if the root is not an `<svg>` element.
+    """
+    root = ET.fromstring(svg)
+    if root.tag.removeprefix(SVG_NAMESPACE) != 'svg':
+        raise ValueError('Root element is not <svg>')
+    sanitize(root)
+    drop_unused_ids(root)
+    return ET.tostring(root, encoding='unicode', short_empty_elements=True).replace(' />', '/>')
+
+class IconReference(NamedTuple):
+    id: str
+    attrib: dict[str, str]
+
+@lru_cache(maxsize=256)
+def icon_reference(svg: str) -> IconReference | None:
+    """
+    Symbol id of `svg` in the sprite, and the attributes for the `<svg>` referencing it.
+    Equal icons share their symbol. Returns `None` for invalid markup.
+    """
+    if not svg:
+        return None
+    try:
+        root = ET.fromstring(svg)
+    except ET.ParseError as e:
+        logger.warning(f"Skipping invalid icon: {e}")
+        return None
+    attrib = {key: value for key, value in root.attrib.items() if key in ('width', 'height', 'viewBox', 'class')}
+    return IconReference('icon-' + sha1(svg.encode()).hexdigest()[:12], attrib)
+
+def build_sprite(icons: list[str]) -> str:
+    symbols = {}
+    for svg in icons:
+        reference = icon_reference(svg)
+        # Invalid icons have no reference
+        if reference is None or reference.id in symbols:
+            continue
+        root = ET.fromstring(svg)
+        root.tag = 'symbol'
+        root.attrib = {key: value for key, value in root.attrib.items() if key not in ('width', 'height', 'class')}
+        root.attrib['id'] = reference.id
+
+        # Ids must be unique in the whole sprite
+        ids = {node.attrib['id'] for node in root.iter() if 'id' in node.attrib and node is not root}
+        for node in root.iter():
+            for key, value in node.attrib.items():
+                if key == 'id' and node is not root:
+                    node.attrib[key] = f'{reference.id}-{value}'
+                elif key == 'href' and value.removeprefix('#') in ids:
+                    node.attrib[key] = f'#{reference.id}-{value.removeprefix("#")}'
+                else:
+                    node.attrib[key] = REFERENCE_PATTERN.sub(lambda m: f'url(#{reference.id}-{m.group(1)})' if m.group(1) in ids else m.group(), value)
+        symbols[reference.id] = ET.tostring(root, encoding='unicode').replace(' />', '/>')
+
+    return f'<svg xmlns="http://www.w3.org/2000/svg">{"".join(symbols.values())}</svg>'
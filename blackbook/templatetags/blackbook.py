@@ -0,0 +1,22 @@
+from django import template
+from django.forms.utils import flatatt
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import SafeText
+
+from ..models import IconModel
+from ..caching import get_icon_sprite
+
+register = template.Library()
+
+@register.simple_tag
+def recipe_icon(obj: IconModel | None, **kwargs) -> SafeText:
+    """
+    Icon of a serving glass or prep method, referencing the icon sprite
+    """
+    reference = obj.icon_reference if obj is not None else None
+    if reference is None:
+        return ''
+    _, version = get_icon_sprite()
+    url = f"{reverse('blackbook:recipe_icons')}?v={version}#{reference.id}"
+    return format_html('<svg{}><use href="{}"/></svg>', flatatt(reference.attrib | kwargs), url)
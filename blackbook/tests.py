@@ -1,3 +1,330 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.db import connection
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from tempfile import TemporaryDirectory
+from pathlib import Path
+from unittest.mock import patch
+from io import StringIO
+
+from ledger.models import Product
+
+from .models import Recipe, RecipeStep, Tag, Ingredient, IngredientCategory, ServingGlass
+from .forms import ServingGlassForm
+from .search import search_recipes, prefix_end
+from .svg import clean_svg
+from . import caching
+from .transfer import import_records, read_records
 
 # Create your tests here.
+
+class RecipeSearchTest(TestCase):
+    def setUp(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            sour = Tag.objects.create(name='Sour')
+            rum = Ingredient.objects.create(name='White Rum')
+            lime = Ingredient.objects.create(name='Lime juice')
+            gin = Ingredient.objects.create(name='Gin')
+
+            self.daiquiri = Recipe.objects.create(name='Daiquiri')
+            self.daiquiri.tags.add(sour)
+            RecipeStep.objects.create(recipe=self.daiquiri, ingredient=rum)
+            RecipeStep.objects.create(recipe=self.daiquiri, ingredient=lime)
+
+            self.gimlet = Recipe.objects.create(name='Gimlet')
+            RecipeStep.objects.create(recipe=self.gimlet, ingredient=gin)
+            RecipeStep.objects.create(recipe=self.gimlet, ingredient=lime)
+
+        self.client.force_login(User.objects.create_user(username='test'))
+
+    def search(self, query: str) -> set[int]:
+        response = self.client.get(reverse('blackbook:recipe_search'), {'q': query})
+        return set(response.json()['ids'])
+
+    def test_search(self):
+        self.assertEqual(self.search(''), {self.daiquiri.pk, self.gimlet.pk})
+        self.assertEqual(self.search('gi'), {self.gimlet.pk})
+        self.assertEqual(self.search('has:rum'), {self.daiquiri.pk})
+        self.assertEqual(self.search('"has:white rum"'), {self.daiquiri.pk})
+        self.assertEqual(self.search('has:lime -tag:sour'), {self.gimlet.pk})
+        self.assertEqual(self.search('has:lime tag:sour'), {self.daiquiri.pk})
+        self.assertEqual(self.search('has:vodka'), set())
+        # No wildcards
+        self.assertEqual(self.search('g_'), set())
+        self.assertEqual(self.search('%'), set())
+
+    def test_prefix_range(self):
+        self.assertEqual(prefix_end('gi'), 'gj')
+        self.assertEqual(prefix_end('g\U0010ffff'), 'h')
+        self.assertEqual(prefix_end('\ud7ff'), '\ue000')
+        self.assertIsNone(prefix_end('\U0010ffff'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ginger = Recipe.objects.create(name='Gj\U0010ffff')
+        self.assertEqual(self.search('gj'), {ginger.pk})
+        self.assertEqual(self.search('gi'), {self.gimlet.pk})
+        self.assertEqual(self.search('gimlet'), {self.gimlet.pk})
+        # Served by the (category, term) index
+        self.assertNotIn('LIKE', str(search_recipes('gi').query))
+
+    def test_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.filter(name='Gin').update(name='Old Tom')
+            Ingredient.objects.get(name='Old Tom').save()
+            Tag.objects.get(name='Sour').recipe_set.add(self.gimlet)
+            self.daiquiri.steps.filter(ingredient__name='White Rum').delete()
+
+        self.assertEqual(self.search('has:tom'), {self.gimlet.pk})
+        self.assertEqual(self.search('tag:sour'), {self.daiquiri.pk, self.gimlet.pk})
+        self.assertEqual(self.search('has:rum'), set())
+
+class RecipeAvailabilityTest(TestCase):
+    def setUp(self) -> None:
+        self.rum, self.lime, self.gin, self.sugar = (Ingredient.objects.create(name=name) for name in ['Rum', 'Lime', 'Gin', 'Sugar'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.daiquiri = Recipe.objects.create(name='Daiquiri')
+            self.gimlet = Recipe.objects.create(name='Gimlet')
+            for recipe, ingredients in [(self.daiquiri, [self.rum, self.lime, self.sugar]), (self.gimlet, [self.gin, self.lime])]:
+                for ingredient in ingredients:
+                    RecipeStep.objects.create(recipe=recipe, ingredient=ingredient)
+
+        self.client.force_login(User.objects.create_user(username='test'))
+
+    def available(self, *ingredients: Ingredient, **params):
+        response = self.client.get(reverse('blackbook:recipe_availability'), {'ingredient': [i.pk for i in ingredients], **params})
+        return response.json()
+
+    def test_query(self):
+        result = self.available(self.gin, self.lime, self.sugar)
+        self.assertEqual(result['makeable'], [self.gimlet.pk])
+        self.assertEqual(result['missing_one'], [{'recipe': self.daiquiri.pk, 'ingredient': self.rum.pk}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.daiquiri.steps.filter(ingredient=self.sugar).delete()
+        result = self.available(self.rum, self.lime)
+        self.assertEqual(result['makeable'], [self.daiquiri.pk])
+
+    def test_max_age(self):
+        with patch.object(caching, 'VERSION_MAX_AGE', 0):
+            self.assertEqual(self.available(self.gin, self.lime)['makeable'], [self.gimlet.pk])
+            # Changed by another process, whose invalidation this process does not see
+            RecipeStep.objects.filter(recipe=self.gimlet, ingredient=self.gin).update(ingredient=self.rum)
+            self.assertEqual(self.available(self.gin, self.lime)['makeable'], [])
+
+    def test_stock(self):
+        self.rum.product = Product.objects.create(full_name='Rum', display_name='Rum', cost=0, member_cost=0, category=Product.ProductCategory.STOCK)
+        self.rum.save()
+        result = self.available(self.lime, self.sugar, stock='1')
+        self.assertEqual(result['makeable'], [self.daiquiri.pk])
+
+class RecipeCacheTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(full_name='Daiquiri', display_name='Daiquiri', cost=500, member_cost=400)
+            self.recipe = Recipe.objects.create(name='Daiquiri', product=self.product)
+            self.step = RecipeStep.objects.create(recipe=self.recipe, ingredient=Ingredient.objects.create(name='Rum'))
+
+        self.client.force_login(User.objects.create_user(username='test'))
+
+    def test_detail(self):
+        url = self.recipe.get_absolute_url()
+        self.assertContains(self.client.get(url), 'Rum')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertContains(self.client.get(url), 'Rum')
+        self.assertFalse([query for query in queries if 'blackbook_' in query['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.filter(pk=self.step.ingredient_id).update(name='Cuban Rum')
+            self.step.ingredient.refresh_from_db()
+            self.step.ingredient.save()
+        self.assertContains(self.client.get(url), 'Cuban Rum')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.cost = 700
+            self.product.save()
+        self.assertContains(self.client.get(url), '<span class="integer">7</span>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_max_age(self):
+        url = reverse('blackbook:recipe_list')
+        with patch.object(caching, 'VERSION_MAX_AGE', 0):
+            self.assertContains(self.client.get(url), 'Daiquiri')
+            # Changed by another process, whose invalidation this process does not see
+            Recipe.objects.filter(pk=self.recipe.pk).update(name='Gimlet')
+            self.assertContains(self.client.get(url), 'Gimlet')
+            self.assertContains(self.client.get(self.recipe.get_absolute_url()), 'Gimlet')
+
+    def test_list(self):
+        url = reverse('blackbook:recipe_list')
+        self.assertContains(self.client.get(url), 'Daiquiri')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(name='Gimlet')
+        self.assertContains(self.client.get(url), 'Gimlet')
+
+class RecipeTransferTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        spirit = IngredientCategory.objects.create(name='Spirit', light_color='#ff0000')
+        rum = Ingredient.objects.create(name='Rum', category=spirit)
+        daiquiri = Recipe.objects.create(name='Daiquiri', description='Shaken', serving_glass=ServingGlass.objects.create(name='Coupe', icon='<svg/>'))
+        daiquiri.tags.add(Tag.objects.create(name='Sour', color='#00ff00'))
+        RecipeStep.objects.create(recipe=daiquiri, order=0, amount='6cl', ingredient=rum)
+        RecipeStep.objects.create(recipe=daiquiri, order=1, instruction='Shake')
+
+    def roundtrip(self, filename: str):
+        path = Path(self.directory.name) / filename
+        call_command('blackbook_export', str(path))
+        for model in [Recipe, Ingredient, IngredientCategory, Tag, ServingGlass]:
+            model.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('blackbook_import', str(path), stdout=StringIO())
+
+        recipe = Recipe.objects.get(name='Daiquiri')
+        self.assertEqual(recipe.description, 'Shaken')
+        self.assertEqual(recipe.serving_glass.icon, '<svg/>')
+        self.assertEqual([tag.color for tag in recipe.tags.all()], ['#00ff00'])
+        self.assertEqual([(step.amount, step.ingredient and step.ingredient.category.light_color, step.instruction) for step in recipe.steps.all()], [
+            ('6cl', '#ff0000', ''),
+            ('', None, 'Shake'),
+        ])
+        self.assertEqual(list(search_recipes('has:rum')), [recipe])
+
+    def test_jsonl(self):
+        self.roundtrip('recipes.jsonl')
+
+    def test_yaml(self):
+        self.roundtrip('recipes.yaml')
+
+    def test_replace(self):
+        path = Path(self.directory.name) / 'recipes.jsonl'
+        path.write_text(
+            '{"type": "recipe", "name": "Daiquiri", "tags": ["Classic"], "steps": [{"ingredient": "Rum", "amount": "5cl"}]}\n'
+            '{"type": "recipe", "name": "Gimlet", "steps": [{"ingredient": "Gin"}]}\n'
+        )
+        call_command('blackbook_import', str(path), stdout=StringIO())
+
+        self.assertEqual(Ingredient.objects.filter(name='Rum').count(), 1)
+        daiquiri = Recipe.objects.get(name='Daiquiri')
+        self.assertEqual([tag.name for tag in daiquiri.tags.all()], ['Classic'])
+        self.assertEqual([step.amount for step in daiquiri.steps.all()], ['5cl'])
+        self.assertEqual(Recipe.objects.get(name='Gimlet').steps.get().ingredient.name, 'Gin')
+
+    def test_icons(self):
+        path = Path(self.directory.name) / 'recipes.jsonl'
+        path.write_text('{"type": "glass", "name": "Coupe", "icon": "<svg onload=\\"alert(1)\\"><script>alert(1)</script><path d=\\"M 0 0\\"/></svg>"}\n')
+        call_command('blackbook_import', str(path), stdout=StringIO())
+        self.assertEqual(ServingGlass.objects.get(name='Coupe').icon, '<svg><path d="M0 0"/></svg>')
+
+        path.write_text('{"type": "glass", "name": "Coupe", "icon": "<svg><path"}\n')
+        with self.assertRaises(ValueError), path.open() as file:
+            import_records(read_records(file, 'jsonl'))
+        self.assertEqual(ServingGlass.objects.get(name='Coupe').icon, '<svg><path d="M0 0"/></svg>')
+
+class RecipeCloneTest(TestCase):
+    def setUp(self) -> None:
+        self.recipe = Recipe.objects.create(name='Daiquiri')
+        self.client.force_login(User.objects.create_superuser(username='test'))
+
+    def test_unique_name(self):
+        from .views import get_unique_recipe_name
+        self.assertEqual(get_unique_recipe_name('Daiquiri'), 'Daiquiri 2')
+        Recipe.objects.create(name='Daiquiri 7')
+        Recipe.objects.create(name='Daiquiri Frozen')
+        self.assertEqual(get_unique_recipe_name('Daiquiri 2'), 'Daiquiri 8')
+        self.assertEqual(get_unique_recipe_name('Gimlet'), 'Gimlet 2')
+        # Too long for a number
+        Recipe.objects.create(name='Daiquiri 99999999999999999999')
+        self.assertEqual(get_unique_recipe_name('Daiquiri'), 'Daiquiri 8')
+        self.assertEqual(get_unique_recipe_name('Daiquiri 99999999999999999999'), 'Daiquiri 99999999999999999999 2')
+
+    def test_concurrent_clone(self):
+        url = reverse('blackbook:recipe_new') + f'?clone={self.recipe.pk}'
+        self.assertContains(self.client.get(url), 'value="Daiquiri 2"')
+
+        data = {
+            'name': 'Daiquiri 2',
+            'description': '',
+            'steps-TOTAL_FORMS': 0,
+            'steps-INITIAL_FORMS': 0,
+            'new-tags-TOTAL_FORMS': 0,
+            'new-tags-INITIAL_FORMS': 0,
+        }
+        self.client.post(url, data)
+        self.client.post(url, data)
+        self.assertEqual(sorted(Recipe.objects.values_list('name', flat=True)), ['Daiquiri', 'Daiquiri 2', 'Daiquiri 3'])
+
+class RecipeDetailTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.recipe = Recipe.objects.create(name='Daiquiri', description='Shaken')
+        self.client.force_login(User.objects.create_user(username='test'))
+
+    def test_padded_pk(self):
+        url = reverse('blackbook:recipe_detail', args=[f'0{self.recipe.pk}'])
+        self.assertContains(self.client.get(url), 'Shaken')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.description = 'Stirred'
+            self.recipe.save()
+        self.assertContains(self.client.get(url), 'Stirred')
+        self.assertEqual(self.client.get(reverse('blackbook:recipe_detail', args=['abc'])).status_code, 404)
+
+class IconTest(TestCase):
+    ICON = """<?xml version="1.0"?>
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" width="32" height="32" viewBox="0 0 32 32" onload="alert(1)">
+    <g inkscape:label="Layer 1" id="layer1">
+        <script>alert(1)</script>
+        <path id="path1" style="fill:none;stroke:#000000" d="M 1.00001 , 2.123456 L 3.5 -4.25" onclick="alert(1)" />
+        <image href="https://example.com/tracker.png" />
+    </g>
+</svg>"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='test'))
+
+    def test_clean(self):
+        form = ServingGlassForm({'name': 'Coupe', 'icon': self.ICON})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['icon'], '<svg width="32" height="32" viewBox="0 0 32 32"><g><path fill="none" stroke="#000000" d="M1,2.12L3.5-4.25"/></g></svg>')
+
+        form = ServingGlassForm({'name': 'Coupe', 'icon': '<svg><path'})
+        self.assertFalse(form.is_valid())
+
+    def test_clean_text(self):
+        icon = '<svg>\n  <text x="1">Mojito <tspan font-weight="bold">No.</tspan> <tspan>5</tspan> (large)</text>\n</svg>'
+        self.assertEqual(clean_svg(icon), '<svg><text x="1">Mojito <tspan font-weight="bold">No.</tspan> <tspan>5</tspan> (large)</text></svg>')
+
+    def test_sprite(self):
+        icon = ServingGlassForm({'name': 'Coupe', 'icon': self.ICON})
+        icon.is_valid()
+        glass = icon.save()
+        ServingGlass.objects.create(name='Coupe (large)', icon=glass.icon)
+        recipe = Recipe.objects.create(name='Daiquiri', serving_glass=glass)
+
+        response = self.client.get(recipe.get_absolute_url())
+        self.assertContains(response, f'<svg height="32" viewBox="0 0 32 32" width="32"><use href="/recipes/icons.svg?v=')
+
+        response = self.client.get(reverse('blackbook:recipe_icons'))
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertEqual(response.content.decode().count('<symbol'), 1)
+        self.assertEqual(self.client.get(reverse('blackbook:recipe_icons'), headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_invalid(self):
+        # Stored before icons were cleaned
+        glass = ServingGlass.objects.create(name='Coupe', icon='<svg><path')
+        recipe = Recipe.objects.create(name='Daiquiri', serving_glass=glass)
+        with self.assertLogs('blackbook.svg', 'WARNING'):
+            self.assertEqual(self.client.get(recipe.get_absolute_url()).status_code, 200)
+        self.assertNotContains(self.client.get(reverse('blackbook:recipe_icons')), '<symbol')
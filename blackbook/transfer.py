@@ -0,0 +1,211 @@
+"""
+Import and export of the recipe book.
+
+The recipe book is a stream of records, each a mapping with a `type`:
+- `category`: `name`, `light_color`, `dark_color`
+- `ingredient`: `name`, `category`
+- `tag`: `name`, `color`
+- `glass`, `method`: `name`, `icon`
+- `group`: `name`, `order`
+- `recipe`: `name`, `description`, `group`, `serving_glass`, `method`, `tags`,
+  `steps` (list of mappings with `amount`, `ingredient`, `instruction`)
+
+Related objects are referenced by name. Imported objects replace existing objects of the same name,
+missing related objects are created.
+Records are written as JSON Lines or as a YAML document stream.
+"""
+from collections.abc import Iterable, Iterator
+from typing import Any, IO
+import json
+import xml.etree.ElementTree as ET
+
+from django.db import models, transaction
+
+from .models import Recipe, RecipeStep, RecipeGroup, Tag, Ingredient, IngredientCategory, ServingGlass, PrepMethod
+from . import search, availability, caching
+from .svg import clean_svg
+
+BATCH_SIZE = 500
+
+FORMATS = ['jsonl', 'yaml']
+
+# record type -> (model, fields besides name)
+NAMED_TYPES: dict[str, tuple[type[models.Model], list[str]]] = {
+    'category': (IngredientCategory, ['light_color', 'dark_color']),
+    'ingredient': (Ingredient, []),
+    'tag': (Tag, ['color']),
+    'glass': (ServingGlass, ['icon']),
+    'method': (PrepMethod, ['icon']),
+    'group': (RecipeGroup, ['order']),
+}
+
+def clean_icon(record: dict[str, Any]) -> str:
+    """
+    Sanitized icon of `record`, raises `ValueError` for invalid markup
+    """
+    icon = record['icon'] or ''
+    if not icon:
+        return ''
+    try:
+        return clean_svg(icon)
+    except (ET.ParseError, ValueError) as e:
+        raise ValueError(f"Invalid icon of {record['type']} '{record['name']}': {e}")
+
+def name_or_none(obj: models.Model | None) -> str | None:
+    return obj.name if obj is not None else None
+
+def export_records() -> Iterator[dict[str, Any]]:
+    for type, (model, fields) in NAMED_TYPES.items():
+        queryset = model.objects.order_by('pk')
+        if model is Ingredient:
+            queryset = queryset.select_related('category')
+        for obj in queryset.iterator(chunk_size=BATCH_SIZE):
+            record = {'type': type, 'name': obj.name} | {field: getattr(obj, field) for field in fields}
+            if model is Ingredient:
+                record['category'] = name_or_none(obj.category)
+            yield record
+
+    recipes = Recipe.objects\
+        .order_by('pk')\
+        .select_related('group', 'serving_glass', 'method')\
+        .prefetch_related('tags', 'steps__ingredient')
+    for recipe in recipes.iterator(chunk_size=BATCH_SIZE):
+        yield {
+            'type': 'recipe',
+            'name': recipe.name,
+            'description': recipe.description,
+            'group': name_or_none(recipe.group),
+            'serving_glass': name_or_none(recipe.serving_glass),
+            'method': name_or_none(recipe.method),
+            'tags': [tag.name for tag in recipe.tags.all()],
+            'steps': [{
+                'amount': step.amount,
+                'ingredient': name_or_none(step.ingredient),
+                'instruction': step.instruction,
+            } for step in recipe.steps.all()],
+        }
+
+def write_records(records: Iterable[dict[str, Any]], file: IO[str], format: str):
+    if format == 'yaml':
+        import yaml
+        yaml.safe_dump_all(records, file, allow_unicode=True, sort_keys=False)
+    else:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False))
+            file.write('\n')
+
+def read_records(file: IO[str], format: str) -> Iterator[dict[str, Any]]:
+    if format == 'yaml':
+        import yaml
+        yield from (record for record in yaml.safe_load_all(file) if record)
+    else:
+        yield from (json.loads(line) for line in file if line.strip())
+
+class NameMap:
+    """
+    Objects of `model` by name, creating missing ones in bulk
+    """
+    def __init__(self, model: type[models.Model]) -> None:
+        self.model = model
+        self.objects: dict[str, models.Model] = {}
+        # Names of existing objects to update
+        self.changed: set[str] = set()
+        # The first object of each name wins, like a lookup by name would
+        for obj in model.objects.order_by('-pk'):
+            self.objects[obj.name] = obj
+
+    def get(self, name: str | None) -> models.Model | None:
+        if name is None:
+            return None
+        try:
+            return self.objects[name]
+        except KeyError:
+            obj = self.objects[name] = self.model(name=name)
+            return obj
+
+    def save(self, update_fields: list[str] = []):
+        new = [obj for obj in self.objects.values() if obj.pk is None]
+        self.model.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        if update_fields:
+            changed = [self.objects[name] for name in self.changed if self.objects[name].pk is not None]
+            self.model.objects.bulk_update(changed, update_fields, batch_size=BATCH_SIZE)
+
+@transaction.atomic
+def import_records(records: Iterable[dict[str, Any]]) -> dict[str, int]:
+    """
+    Returns: number of imported records per type
+    """
+    maps = {type: NameMap(model) for type, (model, _) in NAMED_TYPES.items()}
+    updated_fields: dict[str, set[str]] = {type: set() for type in NAMED_TYPES}
+    recipe_records: dict[str, dict[str, Any]] = {}
+    counts = dict.fromkeys([*NAMED_TYPES, 'recipe'], 0)
+
+    for record in records:
+        type = record.get('type')
+        if type == 'recipe':
+            recipe_records[record['name']] = record
+        elif type in NAMED_TYPES:
+            obj = maps[type].get(record['name'])
+            maps[type].changed.add(record['name'])
+            for field in NAMED_TYPES[type][1]:
+                if field in record:
+                    setattr(obj, field, clean_icon(record) if field == 'icon' else record[field])
+                    updated_fields[type].add(field)
+            if type == 'ingredient' and 'category' in record:
+                obj.category = maps['category'].get(record['category'])
+                updated_fields[type].add('category')
+        else:
+            raise ValueError(f"Unknown record type '{type}'")
+        counts[type] += 1
+
+    # Recipes reference objects by name, create the missing ones too
+    for record in recipe_records.values():
+        maps['group'].get(record.get('group'))
+        maps['glass'].get(record.get('serving_glass'))
+        maps['method'].get(record.get('method'))
+        for tag in record.get('tags', []):
+            maps['tag'].get(tag)
+        for step in record.get('steps', []):
+            maps['ingredient'].get(step.get('ingredient'))
+
+    # Categories first, ingredients reference them
+    for type in NAMED_TYPES:
+        maps[type].save(sorted(updated_fields[type]))
+
+    recipes = NameMap(Recipe)
+    for name, record in recipe_records.items():
+        recipe = recipes.get(name)
+        recipe.description = record.get('description', '')
+        recipe.group = maps['group'].get(record.get('group'))
+        recipe.serving_glass = maps['glass'].get(record.get('serving_glass'))
+        recipe.method = maps['method'].get(record.get('method'))
+    recipes.changed = set(recipe_records)
+    recipes.save(['description', 'group', 'serving_glass', 'method'])
+    imported = [recipes.objects[name] for name in recipe_records]
+
+    # Steps and tags of imported recipes are replaced
+    RecipeStep.objects.filter(recipe__in=imported).delete()
+    Recipe.tags.through.objects.filter(recipe__in=imported).delete()
+    RecipeStep.objects.bulk_create((
+        RecipeStep(
+            recipe=recipe,
+            order=order,
+            amount=step.get('amount', ''),
+            ingredient=maps['ingredient'].get(step.get('ingredient')),
+            instruction=step.get('instruction', ''),
+        )
+        for recipe in imported
+        for order, step in enumerate(recipe_records[recipe.name].get('steps', []))
+    ), batch_size=BATCH_SIZE)
+    Recipe.tags.through.objects.bulk_create((
+        Recipe.tags.through(recipe=recipe, tag=maps['tag'].get(tag))
+        for recipe in imported
+        for tag in set(recipe_records[recipe.name].get('tags', []))
+    ), batch_size=BATCH_SIZE)
+
+    # Bulk operations do not send signals
+    transaction.on_commit(lambda: search.index_recipes([recipe.pk for recipe in imported]))
+    transaction.on_commit(availability.invalidate)
+    transaction.on_commit(lambda: caching.invalidate(caching.CATALOG, caching.RECIPE_LIST, *(caching.recipe_version_name(recipe.pk) for recipe in imported)))
+
+    return counts
@@ -16,46 +16,46 @@ function debounce<Args extends any[], F extends (...args: Args) => any>(func: F,
     }
 }
 
-type StringOrArray = string | string[]
-
-type StringArrayMap = {
-    [key: string]: StringOrArray
-}
-
 function splitQuoted(str: string): string[] {
     return [...str.matchAll(/([^'"\s]+)|"(.*?)"|'(.*?)'/g)]
         .map(match => match.slice(1).find(e => e !== undefined))
         .filter(e => e !== undefined)
 }
 
-// An array of [name, element] pairs, for faster search
-const search_items: [StringArrayMap, HTMLElement][] = [...document.querySelectorAll<HTMLElement>('#recipes a.recipe')]
-    .map(e => [JSON.parse(e.querySelector('script')?.textContent ?? '{}'), e])
+const search_items = [...document.querySelectorAll<HTMLElement>('#recipes a.recipe')]
+const search_url = search_bar.dataset.searchUrl!
 
-function search() {
-    search_items.forEach(([_, e]) => delete e.dataset.selected)
+let search_controller: AbortController | null = null
 
-    const searchTerms = splitQuoted(search_bar.value.toLowerCase())
+async function search() {
+    search_items.forEach(e => delete e.dataset.selected)
 
-    const matches = (metadata: StringArrayMap): boolean => {
-        return searchTerms.every(term => {
-            const invert = term.startsWith('-')
-            if (invert) {
-                term = term.slice(1)
-            }
-            const [value, op] = [...term.split(':', 2).reverse(), 'name']
+    // Only the latest query may update the list
+    search_controller?.abort()
+    const controller = search_controller = new AbortController()
 
-            let metavalue = metadata[op]
-            if (!Array.isArray(metavalue)) {
-                metavalue = [metavalue]
+    let matches: Set<string> | null = null
+    if (search_bar.value.trim()) {
+        try {
+            const response = await fetch(search_url + '?' + new URLSearchParams({ q: search_bar.value }), {
+                signal: controller.signal,
+            })
+            if (!response.ok) {
+                return
             }
-
-            return invert != metavalue.some(e => e.includes(value))
-        })
+            const result: { ids: number[] } = await response.json()
+            matches = new Set(result.ids.map(id => id.toString()))
+        }
+        catch {
+            return
+        }
+    }
+    if (controller.signal.aborted) {
+        return
     }
 
-	search_items.forEach(([metadata, element]) => {        
-        element.style.display = matches(metadata) ? '' : 'none'
+	search_items.forEach(element => {
+        element.style.display = matches === null || matches.has(element.dataset.id!) ? '' : 'none'
 	})
 }
 
@@ -107,7 +107,7 @@ async function selectWithAnimation(list: HTMLElement[], index: number): Promise<
 const random_button = document.querySelector<HTMLButtonElement>('#random')!
 random_button.addEventListener("click", _ => {
     document.querySelectorAll<HTMLElement>('.recipe[data-selected]').forEach(e => delete e.dataset.selected)
-    const visible_recipes = search_items.map(e => e[1]).filter(e => e.style.display !== "none")
+    const visible_recipes = search_items.filter(e => e.style.display !== "none")
 
     const selected_index = Math.floor(Math.random() * visible_recipes.length)
     
@@ -1,10 +1,13 @@
 from django.urls import path
-from .views import recipe_edit, RecipeList, RecipeDetail
+from .views import recipe_edit, recipe_search, recipe_availability, recipe_icons, RecipeList, RecipeDetail
 
 app_name = "blackbook"
 urlpatterns = [
     path("", RecipeList.as_view(), name="recipe_list"),
     path("new/", recipe_edit, name="recipe_new", kwargs={'pk': None}),
+    path("search/", recipe_search, name="recipe_search"),
+    path("available/", recipe_availability, name="recipe_availability"),
+    path("icons.svg", recipe_icons, name="recipe_icons"),
     path("<pk>/", RecipeDetail.as_view(), name="recipe_detail"),
     path("<pk>/edit/", recipe_edit, name="recipe_edit"),
 ]
@@ -1,9 +1,21 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpRequest, HttpResponseRedirect
+from django.http import HttpRequest, HttpResponse, HttpResponseRedirect, HttpResponseBadRequest, JsonResponse, Http404
+from django.views.decorators.http import condition
+from django.utils.cache import patch_cache_control
 from django.views.generic import ListView, DetailView
+from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.utils.translation import get_language
+from django.db import transaction, IntegrityError
+from django.db.models import IntegerField, Max
+from django.db.models.functions import Cast, LTrim, Substr
+import re
 
 from .models import Recipe, Tag, Ingredient
 from .forms import RecipeForm, RecipeStepFormset, TagFormset
+from .search import search_recipes
+from .availability import available_recipes, stock_ingredients
+from . import caching
 
 # Create your views here.
 
@@ -12,34 +24,113 @@ class RecipeList(ListView):
         .only('name', 'group')\
         .order_by('name')\
         .select_related('group')\
-        .prefetch_related('tags', 'steps__ingredient')
+        .prefetch_related('tags')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Only evaluated if the cached fragment is missing
         context["tags"] = Tag.objects.order_by('name')
         context["ingredients"] = Ingredient.objects.order_by('name')
+        context["cache_version"] = f'{get_language()}:{caching.recipe_list_version()}'
+        context["cache_timeout"] = caching.FRAGMENT_TIMEOUT
         return context
     
 
+def recipe_search(request: HttpRequest):
+    """
+    Ids of all recipes matching the query `q`
+    """
+    ids = search_recipes(request.GET.get('q', '')).values_list('pk', flat=True)
+    return JsonResponse({'ids': list(ids)})
+
+def recipe_availability(request: HttpRequest):
+    """
+    Recipes which can be made from the ingredients given as `ingredient`,
+    and recipes which miss only one of them.
+    With `stock` set, ingredients in stock are available as well.
+    """
+    try:
+        ingredients = {int(pk) for pk in request.GET.getlist('ingredient')}
+    except ValueError:
+        return HttpResponseBadRequest("'ingredient' must be ingredient ids")
+    if request.GET.get('stock'):
+        ingredients.update(stock_ingredients())
+
+    result = available_recipes(ingredients)
+    return JsonResponse({
+        'ingredients': sorted(ingredients),
+        'makeable': result.makeable,
+        'missing_one': [{'recipe': recipe, 'ingredient': ingredient} for recipe, ingredient in result.missing_one],
+    })
+
+def icon_sprite_etag(request: HttpRequest) -> str:
+    return caching.get_icon_sprite()[1]
+
+@condition(etag_func=icon_sprite_etag)
+def recipe_icons(request: HttpRequest):
+    """
+    Sprite of all icons, referenced by `{% recipe_icon %}`
+    """
+    content, version = caching.get_icon_sprite()
+    response = HttpResponse(content, content_type='image/svg+xml')
+    if request.GET.get('v') == version:
+        # Versioned url, a new version gets a new url
+        patch_cache_control(response, private=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    return response
+
 class RecipeDetail(DetailView):
     queryset = Recipe.objects\
         .select_related('group', 'serving_glass', 'method', 'product')\
         .prefetch_related('steps__ingredient', 'tags')
+    template_name = 'blackbook/recipe_detail.html'
+
+    def get(self, request, *args, **kwargs):
+        try:
+            # '01' and '1' share their fragment, invalidation uses the latter
+            pk = int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404()
+        key = caching.recipe_fragment_key(pk)
+        recipe_html = cache.get(key)
+        if recipe_html is None:
+            recipe = self.get_object()
+            recipe_html = render_to_string('blackbook/snippets/recipe.html', {'recipe': recipe}, request)
+            cache.set(key, recipe_html, timeout=caching.FRAGMENT_TIMEOUT)
+
+        return self.render_to_response({'recipe_html': recipe_html})
+
+# Longer numbers do not fit the integer column they are compared as, and are part of the name
+MAX_NUMBER_DIGITS = 9
+NUMBERED_NAME = re.compile(rf"^(.*?)(?:\s+(\d{{1,{MAX_NUMBER_DIGITS}}}))?$")
+
+# Attempts to save a clone, in case another clone took its name
+CLONE_ATTEMPTS = 3
 
 def get_unique_recipe_name(recipe_name: str) -> str:
     """
     Appends/increases the number at the end of `recipe_name`
     until no recipe with this name exists.
     """
-    import re
-    regex = re.compile(r"^(.*?)(?:\s+(\d+))?$")
-    clone_name, _ = regex.findall(recipe_name)[0]
+    clone_name = NUMBERED_NAME.match(recipe_name).group(1)
+
+    highest_number = Recipe.objects\
+        .filter(name__startswith=clone_name, name__regex=rf'^{re.escape(clone_name)}\s+\d{{1,{MAX_NUMBER_DIGITS}}}$')\
+        .annotate(number=Cast(LTrim(Substr('name', len(clone_name) + 1)), IntegerField()))\
+        .aggregate(highest=Max('number'))['highest']
 
-    similar_names: list[str] = Recipe.objects.filter(name__startswith=clone_name).values_list('name', flat=True)
+    return clone_name + ' ' + str(max(highest_number or 1, 1) + 1)
 
-    highest_number = max((int(regex.findall(name)[0][1] or '1') for name in similar_names), default=1)
+def save_recipe(form: RecipeForm, formset: RecipeStepFormset, tag_formset: TagFormset) -> Recipe:
+    with transaction.atomic():
+        recipe: Recipe = form.save()
+        formset.instance = recipe
+        formset.save()
 
-    return clone_name + ' ' + str(highest_number + 1)
+        if tag_formset.is_valid():
+            new_tags = tag_formset.save()
+            recipe.tags.add(*new_tags)
+            recipe.save()
+    return recipe
 
 def recipe_edit(request: HttpRequest, pk):
     recipe = None
@@ -47,19 +138,27 @@ def recipe_edit(request: HttpRequest, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
 
     if request.method == "POST":
-        form = RecipeForm(request.POST, instance=recipe)
-        formset = RecipeStepFormset(request.POST, instance=recipe)
-        tag_formset = TagFormset(request.POST, prefix="new-tags", queryset=Tag.objects.none())
+        data = request.POST
+        is_clone = pk is None and bool(request.GET.get('clone'))
+        if is_clone and Recipe.objects.filter(name=data.get('name', '')).exists():
+            # Another clone took the proposed name in the meantime
+            data = data.copy()
+            data['name'] = get_unique_recipe_name(data['name'])
+
+        form = RecipeForm(data, instance=recipe)
+        formset = RecipeStepFormset(data, instance=recipe)
+        tag_formset = TagFormset(data, prefix="new-tags", queryset=Tag.objects.none())
 
         if form.is_valid() and formset.is_valid():
-            recipe: Recipe = form.save()
-            formset.instance = recipe
-            formset.save()
-
-            if tag_formset.is_valid():
-                new_tags = tag_formset.save()
-                recipe.tags.add(*new_tags)
-                recipe.save()
+            for attempt in range(CLONE_ATTEMPTS):
+                try:
+                    recipe = save_recipe(form, formset, tag_formset)
+                    break
+                except IntegrityError:
+                    name_taken = Recipe.objects.filter(name=form.instance.name).exists()
+                    if not is_clone or not name_taken or attempt == CLONE_ATTEMPTS - 1:
+                        raise
+                    form.instance.name = get_unique_recipe_name(form.instance.name)
 
             return HttpResponseRedirect(recipe.get_absolute_url())
 
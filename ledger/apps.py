@@ -6,4 +6,6 @@ class LedgerConfig(AppConfig):
     
     def ready(self) -> None:
         from . import signals
+        from .conf import settings
+        settings.validate()
         return super().ready()
@@ -0,0 +1,33 @@
+"""
+Versions of cached ledger state.
+
+Each version is a random token kept in the default cache, deleting it invalidates the version.
+- `VERSION_KEY`: the state shown on the main screen.
+  Any change to transactions, accounts or products deletes it,
+  so clients holding the old version know they are out of date.
+  It expires after `SNAPSHOT_MAX_AGE`, for the same reason as the catalog version.
+- `CATALOG_VERSION_KEY`: the products and accounts of `catalog`.
+  It expires after `CATALOG_MAX_AGE`, so changes missed by a cache that is not shared
+  between processes are picked up eventually.
+"""
+from uuid import uuid4
+
+from django.core.cache import cache
+
+VERSION_KEY = 'ledger:version'
+CATALOG_VERSION_KEY = 'ledger:catalog:version'
+
+def get_version(key: str = VERSION_KEY, timeout: float | None = None) -> str:
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        # Another process may have set it in the meantime
+        if not cache.add(key, version, timeout=timeout):
+            version = cache.get(key, version)
+    return version
+
+def invalidate(key: str = VERSION_KEY):
+    cache.delete(key)
+
+def snapshot_key(category: str, version: str) -> str:
+    return f'ledger:snapshot:{category}:{version}'
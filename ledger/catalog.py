@@ -0,0 +1,56 @@
+"""
+In-process catalog of products and active accounts.
+
+Transaction forms look up their product and account here instead of in the database,
+so validating an order runs no queries.
+The catalog is rebuilt whenever its version (`caching.CATALOG_VERSION_KEY`) changes.
+Saving or deleting an account or product invalidates it in all processes sharing the default cache.
+Processes that do not share it (e.g. with the default in-memory cache) see the change
+once the version expires after `CATALOG_MAX_AGE`, deployments with more than one process
+should configure a shared cache.
+"""
+from copy import copy
+from threading import Lock
+from typing import NamedTuple
+
+from .models import Account, Product
+from . import caching
+from .conf import settings
+
+class Catalog(NamedTuple):
+    version: str
+    products: dict[int, Product]
+    accounts: dict[int, Account]
+
+_catalog: Catalog | None = None
+_catalog_lock = Lock()
+
+def get_catalog() -> Catalog:
+    global _catalog
+    version = caching.get_version(caching.CATALOG_VERSION_KEY, timeout=settings.CATALOG_MAX_AGE.total_seconds())
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = Catalog(
+                version,
+                {product.pk: product for product in Product.objects.all()},
+                {account.pk: account for account in Account.objects.filter(active=True)},
+            )
+        return _catalog
+
+def invalidate():
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+    caching.invalidate(caching.CATALOG_VERSION_KEY)
+
+def get_product(pk: int) -> Product | None:
+    product = get_catalog().products.get(pk)
+    # Requests must not share instances
+    return copy(product) if product is not None else None
+
+def get_account(pk: int) -> Account | None:
+    """
+    Active account `pk`
+    """
+    account = get_catalog().accounts.get(pk)
+    return copy(account) if account is not None else None
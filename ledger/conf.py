@@ -13,4 +13,18 @@ TIMEJUMP_THRESHOLD = timedelta(hours=12)
 TRANSACTION_HISTORY_MIN_ENTRIES = 10
 TRANSACTION_HISTORY_OLD_THRESHOLD = timedelta(hours=12)
 
-settings = AppSettings('LEDGER', globals())
+# The state of the main screen (`caching.VERSION_KEY`) is considered changed after this at the latest
+SNAPSHOT_MAX_AGE = timedelta(seconds=60)
+# Products and accounts of the order forms are reloaded after this at the latest, see `catalog.py`
+CATALOG_MAX_AGE = timedelta(seconds=60)
+
+# Older ledger changes are deleted by `prune_ledger_changes`, `None` keeps them
+CHANGES_RETENTION = timedelta(days=90)
+
+# Run orders, deposits and reverts one after another in a single writer thread, see `writer.py`.
+# Meant for SQLite, which only allows one writer at a time
+WRITE_QUEUE = False
+# Most writes committed together by the writer thread
+WRITE_BATCH_SIZE = 20
+
+settings = AppSettings('LEDGER', globals(), nullable_keys=['CHANGES_RETENTION'])
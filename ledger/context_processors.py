@@ -0,0 +1,52 @@
+from functools import cache
+from hashlib import sha1
+from json import dumps
+from typing import Any
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpRequest
+from django.urls import reverse
+
+from .conf import settings
+
+API_ENDPOINTS = [
+    'deposit',
+    'withdraw',
+    'order',
+    'revert',
+    'events',
+    'ping',
+    'qr',
+    'snapshot',
+]
+
+@cache
+def api_description() -> dict[str, Any]:
+    """
+    Endpoints and configuration of the client scripts, see `API` in `ts/base.ts`
+    """
+    return {
+        'endpoints': {name: reverse('ledger:api:' + name) for name in API_ENDPOINTS},
+        'config': {
+            'transaction_timeout': settings.TRANSACTION_TIMEOUT.total_seconds() * 1000,
+            'submit_overlay': settings.SUBMIT_OVERLAY.total_seconds() * 1000
+        },
+    }
+
+@cache
+def api_description_etag() -> str:
+    return f'"{sha1(dumps(api_description(), sort_keys=True).encode()).hexdigest()}"'
+
+@receiver(setting_changed)
+def reset_api_description(setting: str, **kwargs):
+    if setting in ('LEDGER', 'ROOT_URLCONF'):
+        api_description.cache_clear()
+        api_description_etag.cache_clear()
+
+def js_config(request: HttpRequest) -> dict[str, Any]:
+    """
+    Embeds the client configuration into every page (`#js-config`),
+    scripts do not need to fetch it
+    """
+    return {'js_config': api_description()}
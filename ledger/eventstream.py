@@ -4,8 +4,16 @@ A bare-bones toolset to handle and send Server-sent-events.
 Capable of multiple channels.
 
 Use send_event() to send a event and data to all listeners on a specified channel
+Use send_to_listener() to send a event and data to a single listener
 Use EventstreamResponse() to allow for clients to listen on specified channels
 
+Each listener receives its id as data of the initial `open` event.
+
+Events may carry a compact variant of their data (see `send_event()`),
+listeners connected with `compact=True` receive that instead.
+Streams are compressed with gzip or deflate if the client accepts it,
+each event is flushed on its own.
+
 See https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events
 
 
@@ -19,19 +27,52 @@ from dataclasses import dataclass
 from django.http import StreamingHttpResponse
 from asyncio import Queue, QueueFull, CancelledError
 from json import dumps
-from typing import Any, Iterable, Callable
+from typing import Any, AsyncIterator, Iterable, Callable
+from uuid import uuid4
+import re
+import zlib
 from collections import defaultdict
 from logging import getLogger
 from functools import cached_property
 
 logger = getLogger(__name__)
 
+# Supported content encodings and their zlib window bits
+ENCODINGS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+def encode_data(data: Any | str, compact: bool = False) -> str:
+    if isinstance(data, str):
+        return data
+    return dumps(data, separators=(',', ':')) if compact else dumps(data)
+
 @dataclass
 class StreamEvent:
     event: str | None = None
     # eventstream specifies than an event must at least contain a data field
     data: str = ""
     id: str | None = None
+    # Sent instead of `data` to compact listeners, if set
+    compact_data: str | None = None
+
+    @classmethod
+    def from_data(cls, event: str | None = None, data: Any | str = '', id: str | None = None, compact_data: Any | str | None = None) -> "StreamEvent":
+        """
+        If `data` is not a `str`, it is json-encoded
+        """
+        return cls(
+            event=event,
+            data=encode_data(data),
+            id=id,
+            compact_data=encode_data(compact_data, compact=True) if compact_data is not None else None,
+        )
+
+    def compacted(self) -> "StreamEvent":
+        if self.compact_data is None:
+            return self
+        return StreamEvent(event=self.event, data=self.compact_data, id=self.id)
 
     def __str__(self) -> str:
         result = ''
@@ -46,12 +87,24 @@ class StreamEvent:
 class StreamListener:
     events: Queue[StreamEvent]
     identifier: str
-    def __init__(self, identifier) -> None:
+    # Random, only known to the connected client
+    id: str
+    compact: bool
+    def __init__(self, identifier, compact: bool = False) -> None:
         self.events = Queue()
         self.identifier = identifier
+        self.id = uuid4().hex
+        self.compact = compact
+
+    def post_event(self, event: StreamEvent):
+        try:
+            self.events.put_nowait(event)
+        except QueueFull:
+            logger.warning(f"Dropped event {event!r} for listener {self.identifier} because queue is full")
 
     async def get_event(self) -> StreamEvent:
-        return await self.events.get()
+        event = await self.events.get()
+        return event.compacted() if self.compact else event
 
 class EventstreamChannel:
     listeners: list[StreamListener]
@@ -81,63 +134,119 @@ class EventstreamChannel:
             logger.info(f"{self.logging_prefix}: Posting event {event!r} to channel with no listeners")
 
         for listener in self.listeners:
-            try:
-                listener.events.put_nowait(event)
-            except QueueFull:
-                logger.warning(f"{self.logging_prefix}: Dropped event {event!r} for listener {listener.identifier} because queue is full")
+            listener.post_event(event)
 
 eventstream_channels: defaultdict[str, EventstreamChannel] = defaultdict(EventstreamChannel)
+eventstream_listeners: dict[str, StreamListener] = {}
 
 def get_eventstream_channel(channel: str) -> EventstreamChannel:
     return eventstream_channels[channel]
 
-def send_event(channel: str, event: str | None = None, data: Any | str = '', id: str | None = None):
+def send_event(channel: str | Iterable[str], event: str | None = None, data: Any | str = '', id: str | None = None, compact_data: Any | str | None = None):
     """
     Send an event to all listeners on `channel`.
+    Listeners of more than one of the given channels receive the event once.
+    Compact listeners receive `compact_data` instead of `data`, if given.
     
     If `data` is not a `str`, it is json-encoded before sending
     """
-    eventstream_channels[channel].post_event(
-       StreamEvent(
-            event=event,
-            data=data if isinstance(data, str) else dumps(data),
-            id=id
-        ) 
-    )
+    stream_event = StreamEvent.from_data(event, data, id, compact_data)
+    if isinstance(channel, str):
+        eventstream_channels[channel].post_event(stream_event)
+        return
 
-async def listen(channel: str | Iterable[str], identifier: str, initial_event: Iterable[StreamEvent] | StreamEvent = None):
+    listeners: dict[str, StreamListener] = {}
+    for ch in channel:
+        if ch in eventstream_channels:
+            listeners |= {listener.id: listener for listener in eventstream_channels[ch].listeners}
+    for listener in listeners.values():
+        listener.post_event(stream_event)
+
+def send_to_listener(listener_id: str, event: str | None = None, data: Any | str = '', id: str | None = None) -> bool:
+    """
+    Send an event to the listener with id `listener_id` only.
+
+    If `data` is not a `str`, it is json-encoded before sending
+
+    Returns: `False` if no such listener is connected
+    """
+    listener = eventstream_listeners.get(listener_id)
+    if listener is None:
+        return False
+    listener.post_event(StreamEvent(
+        event=event,
+        data=encode_data(data, compact=listener.compact),
+        id=id
+    ))
+    return True
+
+async def listen(channel: str | Iterable[str], identifier: str, initial_event: Iterable[StreamEvent] | StreamEvent = None, compact: bool = False):
     if isinstance(initial_event, StreamEvent):
         initial_event = [initial_event]
     if isinstance(channel, str):
         channel = [channel]
 
     ev_channels = [get_eventstream_channel(ch) for ch in channel]
+    listener = StreamListener(identifier=identifier, compact=compact)
     try:
-        listener = StreamListener(identifier=identifier)
-        await listener.events.put(StreamEvent(event='open'))
+        await listener.events.put(StreamEvent(event='open', data=listener.id))
         if initial_event:
             for event in initial_event:
                 await listener.events.put(event)
         for ch in ev_channels:
             ch.add_listener(listener)
+        eventstream_listeners[listener.id] = listener
 
         while True:
             event = await listener.get_event()
             yield str(event)
-    except CancelledError:
+    finally:
+        # Cancelled by the server or closed by the client
+        eventstream_listeners.pop(listener.id, None)
         for ch in ev_channels:
-            ch.remove_listener(listener)
+            if listener in ch.listeners:
+                ch.remove_listener(listener)
     
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Preferred supported encoding of an `Accept-Encoding` header
+    """
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.partition(';')
+        quality = re.search(r'q=(\d+(?:\.\d*)?)', params)
+        if quality is None or float(quality.group(1)) > 0:
+            accepted.add(coding.strip().lower())
+    return next((encoding for encoding in ENCODINGS if encoding in accepted), None)
+
+async def compress(stream: AsyncIterator[str], encoding: str):
+    """
+    Compresses `stream`, flushing after every chunk so events are not held back
+    """
+    compressor = zlib.compressobj(wbits=ENCODINGS[encoding])
+    async for chunk in stream:
+        yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
 class EventstreamResponse(StreamingHttpResponse):
     """
     Http response for connecting client to channels of a eventstream
     """
-    def __init__(self, channel: str | Iterable[str], *args, identifier: str, initial_event: Iterable[StreamEvent] | StreamEvent = None, **kwargs) -> None:
+    def __init__(self, channel: str | Iterable[str], *args, identifier: str, initial_event: Iterable[StreamEvent] | StreamEvent = None, compact: bool = False, accept_encoding: str | None = None, **kwargs) -> None:
         """
-        Requires a list of channels the client will receive events from
+        Requires a list of channels the client will receive events from.
+
+        - `compact` Send the compact data of events
+        - `accept_encoding` `Accept-Encoding` header of the request, the stream is compressed if possible
         """
-        super().__init__(listen(channel, identifier=identifier, initial_event=initial_event), *args, content_type="text/event-stream", **kwargs)
+        stream = listen(channel, identifier=identifier, initial_event=initial_event, compact=compact)
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is not None:
+            stream = compress(stream, encoding)
+        super().__init__(stream, *args, content_type="text/event-stream", **kwargs)
         self['Cache-Control'] = 'no-cache'
         self['X-Accel-Buffering'] = 'no'
+        self['Vary'] = 'Accept-Encoding'
+        if encoding is not None:
+            self['Content-Encoding'] = encoding
 
     
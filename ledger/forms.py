@@ -2,12 +2,14 @@ from typing import Any, Callable, Iterator, Tuple
 from django.forms import ModelForm, Form, CharField, IntegerField, HiddenInput, ModelChoiceField, BooleanField, ModelMultipleChoiceField, MultipleChoiceField, DateField, DateTimeField
 from django.utils.translation import gettext_lazy as _, pgettext_lazy
 from django.forms.widgets import TextInput, NumberInput, CheckboxSelectMultiple
+from django.core.exceptions import ValidationError
 
 from .formfield import ReadonlyWidget
 
 from itertools import groupby
 
 from .models import Account, Product, Transaction
+from . import catalog
 from .formfield import FixedPrecisionField, DecimalInput, NativeDateInput
 
 class GroupedModelChoiceIterator(ModelChoiceField.iterator):
@@ -37,6 +39,28 @@ class GroupedModelChoiceField(ModelMultipleChoiceField):
         else:
             self.group_label = group_label
 
+class CatalogChoiceField(ModelChoiceField):
+    """
+    Choices are looked up with `lookup` (see `catalog`) instead of the queryset.
+    The queryset is still used to render the choices.
+    """
+    def __init__(self, lookup: Callable[[int], Any], *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.lookup = lookup
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            obj = self.lookup(int(value))
+        except (ValueError, TypeError):
+            obj = None
+        if obj is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+        return obj
+
 def default_placeholder(cls=None, placeholder=" "):
     """
     Decorator for form classes.
@@ -82,13 +106,13 @@ class EditAccountForm(CreateAccountForm):
 
 @default_placeholder
 class TransactionForm(Form):
-    account = ModelChoiceField(Account.objects.filter(active=True), label=_('Account'), widget=HiddenInput)
+    account = CatalogChoiceField(catalog.get_account, Account.objects.filter(active=True), label=_('Account'), widget=HiddenInput)
     amount = FixedPrecisionField(label=_('Amount'), decimal_places=2, min_value=1)
     reason = CharField(label=_('Reason'), required=False)
     
 class ProductTransactionForm(Form):
-    account = ModelChoiceField(Account.objects.filter(active=True))
-    product = ModelChoiceField(Product.objects)
+    account = CatalogChoiceField(catalog.get_account, Account.objects.filter(active=True))
+    product = CatalogChoiceField(catalog.get_product, Product.objects)
     amount = IntegerField(min_value=1, initial=1, required=False)
     invert_member = BooleanField(initial=False, required=False)
     
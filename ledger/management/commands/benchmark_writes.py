@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+
+from ...models import Account, Product
+from ...utils.transaction import order_product
+from ... import writer
+
+class Command(BaseCommand):
+    help = "Compare concurrent orders written directly and through the writer queue. " \
+        "Creates (and deletes) a hidden account and product, run it on a copy of the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent terminals (default: 8)")
+        parser.add_argument('--orders', type=int, default=50, help="Orders per terminal (default: 50)")
+
+    def handle(self, *args, threads: int, orders: int, **options):
+        account = Account.objects.create(display_name='Benchmark', member=False, credit=threads * orders * 100, active=False)
+        product = Product.objects.create(full_name='Benchmark', display_name='Benchmark', cost=1, member_cost=1, visible=False)
+
+        # Not decorated, so the mode does not depend on `WRITE_QUEUE`
+        direct = order_product.__wrapped__
+        modes = {
+            'direct': direct,
+            'queue': lambda *args, **kwargs: writer.submit(direct, *args, **kwargs).result(),
+        }
+
+        def terminal(place_order) -> tuple[list[float], int]:
+            latencies, errors = [], 0
+            try:
+                for _ in range(orders):
+                    start = perf_counter()
+                    try:
+                        place_order(account, product, issuer=None)
+                    except OperationalError:
+                        # "database is locked"
+                        errors += 1
+                    latencies.append(perf_counter() - start)
+            finally:
+                connection.close()
+            return latencies, errors
+
+        try:
+            for mode, place_order in modes.items():
+                start = perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as executor:
+                    results = list(executor.map(terminal, [place_order] * threads))
+                duration = perf_counter() - start
+
+                latencies = [latency for terminal_latencies, _ in results for latency in terminal_latencies]
+                errors = sum(errors for _, errors in results)
+                self.stdout.write(
+                    f"{mode:>6}: {len(latencies) / duration:.0f} orders/s, "
+                    f"median {median(latencies) * 1000:.1f} ms, p95 {quantiles(latencies, n=20)[-1] * 1000:.1f} ms, "
+                    f"{errors} failed")
+        finally:
+            account.delete()
+            product.delete()
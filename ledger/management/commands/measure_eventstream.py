@@ -0,0 +1,37 @@
+from datetime import timedelta
+import zlib
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from ...eventstream import ENCODINGS, StreamEvent
+from ...models import Transaction
+from ...utils.transaction import transaction_event, compact_event
+
+class Command(BaseCommand):
+    help = "Compare the size of the transaction eventstream in each schema and encoding, replaying recent transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=12, help="Replay transactions of the last HOURS hours (default: 12)")
+
+    def handle(self, *args, hours: float, **options):
+        transactions = Transaction.objects\
+            .filter(timestamp__gte=now() - timedelta(hours=hours))\
+            .order_by('timestamp')\
+            .select_related('account', 'related_transaction')
+        events = []
+        for transaction in transactions:
+            data = transaction_event(transaction)
+            events.append(StreamEvent.from_data('create', data, id=transaction.pk, compact_data=compact_event(data)))
+
+        self.stdout.write(f"{len(events)} events")
+        for schema, stream in [
+            ('verbose', [str(event) for event in events]),
+            ('compact', [str(event.compacted()) for event in events]),
+        ]:
+            sizes = {'identity': sum(len(chunk.encode()) for chunk in stream)}
+            for encoding, wbits in ENCODINGS.items():
+                # Flushed after every event, like the live stream
+                compressor = zlib.compressobj(wbits=wbits)
+                sizes[encoding] = sum(len(compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)) for chunk in stream)
+            self.stdout.write(f"{schema:>8}: " + ', '.join(f"{encoding} {size} bytes" for encoding, size in sizes.items()))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...conf import settings
+from ...models import Account
+from ...utils.banking import precompute_qr_codes
+
+class Command(BaseCommand):
+    help = "Render the deposit QR codes of all permanent accounts into the cache"
+
+    def handle(self, *args, **options):
+        if not settings.BANKING:
+            raise CommandError("LEDGER['BANKING'] is not set")
+        accounts = Account.objects.filter(permanent=True).only('full_name')
+        count = precompute_qr_codes(account.qr_name for account in accounts.iterator())
+        self.stdout.write(f"Rendered {count} QR codes")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from ...conf import settings
+from ...models import LedgerChange
+
+class Command(BaseCommand):
+    help = "Delete ledger changes past retention"
+
+    def handle(self, *args, **options):
+        if settings.CHANGES_RETENTION is None:
+            self.stdout.write("LEDGER['CHANGES_RETENTION'] is None, keeping all changes")
+            return
+        deleted = LedgerChange.prune(now() - settings.CHANGES_RETENTION)
+        self.stdout.write(f"Deleted {deleted} ledger changes")
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:34
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0018_account_joined_squashed_0019_remove_account_joined_account_created_squashed_0020_alter_account_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('timestamp', models.DateTimeField(auto_now_add=True, verbose_name='timestamp')),
+                ('entity', models.CharField(max_length=32, verbose_name='entity')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='object id')),
+                ('operation', models.CharField(choices=[('create', 'create'), ('update', 'update'), ('delete', 'delete')], max_length=6, verbose_name='operation')),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='payload')),
+            ],
+            options={
+                'verbose_name': 'ledger change',
+                'verbose_name_plural': 'ledger changes',
+            },
+        ),
+    ]
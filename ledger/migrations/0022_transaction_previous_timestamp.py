@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+def set_previous_timestamps(apps, schema_editor):
+    Transaction = apps.get_model('ledger', 'Transaction')
+    previous_timestamp = None
+    batch = []
+    for transaction in Transaction._base_manager.order_by('timestamp').only('timestamp').iterator(chunk_size=BATCH_SIZE):
+        transaction.previous_timestamp = previous_timestamp
+        previous_timestamp = transaction.timestamp
+        batch.append(transaction)
+        if len(batch) >= BATCH_SIZE:
+            Transaction._base_manager.bulk_update(batch, ['previous_timestamp'])
+            batch = []
+    Transaction._base_manager.bulk_update(batch, ['previous_timestamp'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0021_ledgerchange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='previous_timestamp',
+            field=models.DateTimeField(blank=True, default=None, editable=False, null=True, verbose_name='previous timestamp'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(models.OrderBy(models.F('timestamp'), descending=True), name='idx_transaction_timestamp'),
+        ),
+        migrations.RunPython(set_previous_timestamps, migrations.RunPython.noop),
+    ]
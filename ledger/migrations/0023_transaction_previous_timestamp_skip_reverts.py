@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:02
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+REVERT_TYPES = {'RVDP', 'RVWD'}
+
+def set_previous_timestamps(apps, schema_editor):
+    Transaction = apps.get_model('ledger', 'Transaction')
+    previous_timestamp = None
+    batch = []
+    for transaction in Transaction._base_manager.order_by('timestamp').only('timestamp', 'type', 'previous_timestamp').iterator(chunk_size=BATCH_SIZE):
+        if transaction.previous_timestamp != previous_timestamp:
+            transaction.previous_timestamp = previous_timestamp
+            batch.append(transaction)
+        # Reverts are not shown in transaction lists
+        if transaction.type not in REVERT_TYPES:
+            previous_timestamp = transaction.timestamp
+        if len(batch) >= BATCH_SIZE:
+            Transaction._base_manager.bulk_update(batch, ['previous_timestamp'])
+            batch = []
+    Transaction._base_manager.bulk_update(batch, ['previous_timestamp'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0022_transaction_previous_timestamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_previous_timestamps, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,10 @@
-from typing import Any, Optional, Type
+from typing import Any, Iterable, Optional, Type
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
 from django.utils.timezone import now
 from .managers import TransactionManager, ProductManager, TransactionQuerySet
 from .modelfield import PositiveFixedPrecisionField, FixedPrecisionField
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.core.exceptions import PermissionDenied
 from django.utils.formats import get_format
 from django.utils.translation import gettext, gettext_lazy as _, pgettext_lazy
@@ -12,6 +13,7 @@ from django.contrib.admin import display
 from django.contrib.auth.models import AbstractBaseUser
 from django.contrib.auth import get_user_model
 from .utils import fpint, server_language
+from .writer import serialized
 # Create your models here.
 # TODO : Better terminologiy regarding money:
 # TODO : User A has amount k and additionally is allowed to go amount n into debt
@@ -21,7 +23,23 @@ from .utils import fpint, server_language
 
 UserModel: Type[AbstractBaseUser] = get_user_model()
 
-class AccountGroup(models.Model):
+class ChangeLoggedModel(models.Model):
+    """
+    Saves and deletes happen in one database transaction with their `LedgerChange`,
+    which is written by the `post_save`/`post_delete` signals
+    """
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+class AccountGroup(ChangeLoggedModel):
     name = models.CharField(verbose_name=_('name'), max_length=255)
     order = models.PositiveIntegerField(
         verbose_name=_('order'),
@@ -62,7 +80,7 @@ class AccountQueryset(models.QuerySet):
             )\
             .select_related('group')
 
-class Account(models.Model):
+class Account(ChangeLoggedModel):
     class NotEnoughFunds(Exception): pass
     
     objects = AccountQueryset.as_manager()
@@ -99,6 +117,13 @@ class Account(models.Model):
 
     def __str__(self) -> str:
         return self.display_name
+
+    @property
+    def qr_name(self) -> str:
+        """
+        Name in the invoice text of deposit QR codes
+        """
+        return self.full_name or '[Name]'
     
     @property
     @display(description=_('Last closing balance'))
@@ -141,9 +166,12 @@ class Account(models.Model):
         pending_transactions = self.transactions.filter(closing_balance=None, timestamp__lt=cutoff_date)
         if pending_transactions.exists():
             closing_balance = AccountBalance.objects.create(account=self, timestamp=cutoff_date, closing_balance=self.current_balance, previous_balance=self.last_balance)
+            pending_ids = list(pending_transactions.values_list('pk', flat=True))
             pending_transactions.update(closing_balance=closing_balance)
+            # `update` sends no signals
+            LedgerChange.record_many(LedgerChange.Operation.UPDATE, Transaction.objects.filter(pk__in=pending_ids))
 
-class AccountBalance(models.Model):
+class AccountBalance(ChangeLoggedModel):
     account = models.ForeignKey(Account, verbose_name=_('account'), on_delete=models.CASCADE, related_name='balances')
     timestamp = models.DateTimeField(verbose_name=_('timestamp'))
     closing_balance = FixedPrecisionField(verbose_name=_('closing balance'), decimal_places=fpint.__precision__)
@@ -157,7 +185,7 @@ class AccountBalance(models.Model):
     def __str__(self) -> str:
         return gettext("{account}: {closing_balance} at {timestamp}").format(account=self.account, closing_balance=fpint(self.closing_balance), timestamp=self.timestamp.replace(microsecond=0))
 
-class Transaction(models.Model):
+class Transaction(ChangeLoggedModel):
     class AlreadyReverted(Exception): pass
     class TransactionType(models.TextChoices):
         DEPOSIT = 'DEPT', _('Deposit')
@@ -170,6 +198,10 @@ class Transaction(models.Model):
         def withdraws(cls) -> set["Transaction.TransactionType"]:
             return {cls.ORDER, cls.WITHDRAW, cls.REVERT_WITHDRAW}
 
+        @classmethod
+        def reverts(cls) -> set["Transaction.TransactionType"]:
+            return {cls.REVERT_DEPOSIT, cls.REVERT_WITHDRAW}
+
     revert_threshold = settings.REVERT_THRESHOLD
     timejump_threshold = settings.TIMEJUMP_THRESHOLD
     recent_objects = TransactionManager()
@@ -186,6 +218,10 @@ class Transaction(models.Model):
 
     extra = models.JSONField(verbose_name=_('extra'), default=dict, blank=True)
     
+    # Timestamp of the latest transaction before this one, not counting reverts (transaction lists do not show them).
+    # Kept up to date on inserts and deletes. Gaps larger than `timejump_threshold` are timejumps
+    previous_timestamp = models.DateTimeField(verbose_name=_('previous timestamp'), null=True, default=None, blank=True, editable=False)
+
     related_transaction: "Transaction" = models.OneToOneField(to="self", verbose_name=_('related transaction'), help_text=_('Used to track and associate canceled transactions'), on_delete=models.CASCADE, null=True, default=None, blank=True, editable=False)
 
     idempotency_key: str | None
@@ -200,6 +236,7 @@ class Transaction(models.Model):
         indexes = [
             models.Index('closing_balance', models.F('timestamp').desc(), name="idx_recent_transactions"),
             models.Index('closing_balance', name='idx_balance_transaction'),
+            models.Index(models.F('timestamp').desc(), name='idx_transaction_timestamp'),
         ]
         verbose_name = _('transaction')
         verbose_name_plural = _('transactions')
@@ -211,6 +248,43 @@ class Transaction(models.Model):
     def __str__(self) -> str:
         return f"{self.account.display_name}: {self.reason} ({self.fp_amount.locale_str}€)"
 
+    def save_base(self, *args, **kwargs):
+        # Runs in the database transaction opened by `save`
+        adding = self._state.adding and not kwargs.get('raw')
+        if adding and self.previous_timestamp is None:
+            # `timestamp` is only set while saving
+            self.previous_timestamp = Transaction.timestamp_before(self.timestamp or now())
+        result = super().save_base(*args, **kwargs)
+        if adding and self.type not in self.TransactionType.reverts():
+            Transaction.relink_after(self.timestamp, self.timestamp)
+        return result
+
+    @classmethod
+    def timestamp_before(cls, timestamp: datetime) -> datetime | None:
+        """
+        Timestamp of the latest transaction before `timestamp` which is not a revert
+        """
+        return cls.objects\
+            .filter(timestamp__lt=timestamp)\
+            .exclude(type__in=cls.TransactionType.reverts())\
+            .order_by('-timestamp')\
+            .values_list('timestamp', flat=True)\
+            .first()
+
+    @classmethod
+    def relink_after(cls, timestamp: datetime, previous_timestamp: datetime | None):
+        """
+        Sets `previous_timestamp` of the transactions after `timestamp`, up to the first one which is not a revert.
+        Needed after inserting or deleting a transaction at `timestamp` which is not a revert.
+        """
+        # Usually the newest transaction was inserted and there are none
+        for t in cls.objects.filter(timestamp__gt=timestamp).order_by('timestamp').iterator(chunk_size=10):
+            if t.previous_timestamp != previous_timestamp:
+                t.previous_timestamp = previous_timestamp
+                t.save(update_fields=['previous_timestamp'])
+            if t.type not in cls.TransactionType.reverts():
+                break
+
     @property
     @display(description=_('Signed amount'))
     def fp_amount(self) -> fpint:
@@ -232,6 +306,7 @@ class Transaction(models.Model):
         has_permissions = user.is_staff or (user == self.issuer and not is_stale)
         return has_permissions
 
+    @serialized
     @transaction.atomic
     def revert(self, issuer: UserModel | None, idempotency_key=None) -> "Transaction":
         if not self.user_can_revert(issuer):
@@ -259,7 +334,7 @@ class Transaction(models.Model):
         self.save()
         return revert_transaction
 
-class ProductGroup(models.Model):
+class ProductGroup(ChangeLoggedModel):
     name = models.CharField(verbose_name=_('name'), max_length=255)
     order = models.PositiveIntegerField(
         verbose_name=_('order'),
@@ -277,7 +352,7 @@ class ProductGroup(models.Model):
         verbose_name = _('product group')
         verbose_name_plural = _('product groups')
 
-class Product(models.Model):
+class Product(ChangeLoggedModel):
     class ProductCategory(models.TextChoices):
         ARTICLE = 'ATCL', _('Article')
         STOCK = 'STCK', _('Stock')
@@ -321,3 +396,62 @@ class Product(models.Model):
 
 # https://stackoverflow.com/questions/29688982/derived-account-balance-vs-stored-account-balance-for-a-simple-bank-account/29713230#29713230
         
+
+class LedgerChange(models.Model):
+    """
+    Log of all changes to ledger models, in order.
+    The primary key is the sequence number of the change.
+
+    Sequence numbers are assigned on insert, so they are only in commit order while
+    one transaction writes at a time (SQLite). With concurrent writers (e.g. PostgreSQL)
+    a change can become visible after changes with a higher number.
+    """
+    class Operation(models.TextChoices):
+        CREATE = 'create', _('create')
+        UPDATE = 'update', _('update')
+        DELETE = 'delete', _('delete')
+
+    id = models.BigAutoField(primary_key=True)
+    timestamp = models.DateTimeField(verbose_name=_('timestamp'), auto_now_add=True)
+    # Model name of the changed object, e.g. `transaction`
+    entity = models.CharField(verbose_name=_('entity'), max_length=32)
+    object_id = models.PositiveBigIntegerField(verbose_name=_('object id'))
+    operation = models.CharField(verbose_name=_('operation'), max_length=6, choices=Operation)
+    # Field values after the change, `None` for deletions
+    payload = models.JSONField(verbose_name=_('payload'), null=True, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        verbose_name = _('ledger change')
+        verbose_name_plural = _('ledger changes')
+
+    @staticmethod
+    def serialize(instance: models.Model) -> dict[str, Any]:
+        return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+
+    @classmethod
+    def for_instance(cls, operation: Operation, instance: models.Model) -> "LedgerChange":
+        return cls(
+            entity=instance._meta.model_name,
+            object_id=instance.pk,
+            operation=operation,
+            payload=cls.serialize(instance) if operation != cls.Operation.DELETE else None)
+
+    @classmethod
+    def record(cls, operation: Operation, instance: models.Model) -> "LedgerChange":
+        change = cls.for_instance(operation, instance)
+        change.save()
+        return change
+
+    @classmethod
+    def record_many(cls, operation: Operation, instances: Iterable[models.Model]):
+        cls.objects.bulk_create(cls.for_instance(operation, instance) for instance in instances)
+
+    @classmethod
+    def prune(cls, before: datetime) -> int:
+        """
+        Deletes changes older than `before` and returns their count.
+        The latest change is kept, so up-to-date cursors stay valid
+        """
+        latest = cls.objects.order_by('-id').values_list('id', flat=True).first()
+        deleted, _ = cls.objects.filter(timestamp__lt=before).exclude(id=latest).delete()
+        return deleted
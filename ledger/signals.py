@@ -1,9 +1,20 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 from .eventstream import send_event
-from .models import Transaction
-from .utils.transaction import transaction_event
+from .models import Transaction, Account, AccountGroup, AccountBalance, Product, ProductGroup, LedgerChange
+from . import caching, catalog
+from .utils.banking import precompute_qr_codes
+from .utils.transaction import transaction_event, transaction_channels, compact_event, BALANCE_CHANNEL, CATALOG_CHANNEL
+
+# Fields shown by clients, changes to them are broadcast
+BROADCAST_FIELDS = {
+	Account: ['display_name', 'member', 'credit', 'active', 'group_id'],
+	AccountGroup: ['name', 'order'],
+	Product: ['display_name', 'cost', 'member_cost', 'visible', 'category', 'group_id', 'order'],
+	ProductGroup: ['name', 'order'],
+}
 
 @receiver(post_save, sender=Transaction)
 def notify_clients(instance: Transaction, created: bool, **_):
@@ -12,5 +23,101 @@ def notify_clients(instance: Transaction, created: bool, **_):
 	
 	data = transaction_event(instance)
 
-	send_event("transaction", "create", data, id=instance.pk)
+	send_event(transaction_channels(instance), "create", data, id=instance.pk, compact_data=compact_event(data))
+	# Pages showing a single account still show the balances of all accounts
+	balance = {'account': data['account'], 'balance': data['balance']}
+	send_event(BALANCE_CHANNEL, "balance", balance, compact_data=compact_event(balance))
+
+
+@receiver(post_delete, sender=Transaction)
+def relink_previous_timestamp(instance: Transaction, **_):
+	if instance.type in Transaction.TransactionType.reverts():
+		return
+	# Transactions deleted together (e.g. with their account) are all gone already
+	Transaction.relink_after(instance.timestamp, Transaction.timestamp_before(instance.timestamp))
+
+@receiver(post_save, sender=Account)
+def precompute_qr_code(instance: Account, **_):
+	if instance.permanent:
+		name = instance.qr_name
+		transaction.on_commit(lambda: precompute_qr_codes([name]))
+
+@receiver([post_save, post_delete], sender=Transaction)
+@receiver([post_save, post_delete], sender=Account)
+@receiver([post_save, post_delete], sender=AccountGroup)
+@receiver([post_save, post_delete], sender=AccountBalance)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductGroup)
+def invalidate_version(**_):
+	transaction.on_commit(caching.invalidate)
+
+@receiver([post_save, post_delete], sender=Account)
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_catalog(**_):
+	# Right away for this process, again on commit for processes that rebuilt it in between
+	catalog.invalidate()
+	transaction.on_commit(catalog.invalidate)
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=Account)
+@receiver(post_save, sender=AccountGroup)
+@receiver(post_save, sender=AccountBalance)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductGroup)
+def log_save(instance, created: bool, raw: bool, **_):
+	if raw:
+		return
+	LedgerChange.record(LedgerChange.Operation.CREATE if created else LedgerChange.Operation.UPDATE, instance)
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Account)
+@receiver(post_delete, sender=AccountGroup)
+@receiver(post_delete, sender=AccountBalance)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductGroup)
+def log_delete(instance, **_):
+	LedgerChange.record(LedgerChange.Operation.DELETE, instance)
+
+def broadcast_fields(instance) -> dict:
+	return {field: getattr(instance, field) for field in BROADCAST_FIELDS[type(instance)]}
+
+def broadcast_change(instance, operation: str, fields: dict = {}):
+	data = {'entity': instance._meta.model_name, 'id': instance.pk, 'op': operation}
+	if fields:
+		data['fields'] = fields
+	# The data is compact already, compact listeners only get it without whitespace
+	transaction.on_commit(lambda: send_event(CATALOG_CHANNEL, "change", data, compact_data=data))
+
+@receiver(pre_save, sender=Account)
+@receiver(pre_save, sender=AccountGroup)
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductGroup)
+def remember_broadcast_fields(instance, raw: bool, **_):
+	if raw or instance.pk is None:
+		return
+	previous = type(instance).objects.filter(pk=instance.pk).values(*BROADCAST_FIELDS[type(instance)]).first()
+	instance._broadcast_previous = previous
+
+@receiver(post_save, sender=Account)
+@receiver(post_save, sender=AccountGroup)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductGroup)
+def broadcast_save(instance, created: bool, raw: bool, **_):
+	if raw:
+		return
+	current = broadcast_fields(instance)
+	previous = getattr(instance, '_broadcast_previous', None)
+	if created or previous is None:
+		broadcast_change(instance, 'create', current)
+		return
+	# Only changed fields are sent
+	diff = {field: value for field, value in current.items() if previous[field] != value}
+	if diff:
+		broadcast_change(instance, 'update', diff)
 
+@receiver(post_delete, sender=Account)
+@receiver(post_delete, sender=AccountGroup)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductGroup)
+def broadcast_delete(instance, **_):
+	broadcast_change(instance, 'delete')
@@ -1,5 +1,5 @@
 import { Transaction } from "./transaction.js";
-import { Account } from "./accounts.js";
+import { Account, applyAccountChange } from "./accounts.js";
 import { API, debounce } from "./base.js";
 const selected_account = document.querySelector('#accounts .item[selected]');
 const decimalSeparator = Intl.NumberFormat()
@@ -28,15 +28,16 @@ withdraw_all?.addEventListener('click', _ => {
     input.value = newValue.slice(0, -2) + decimalSeparator + newValue.slice(-2);
 });
 const account_id = parseInt(document.getElementById('deposit-transaction').elements.namedItem('account').value);
-Transaction.all(); // Register undo buttons
-Transaction.listen(event => {
+function update_balance(event) {
     const account = Account.byId(event.account.toString());
     if (!account) {
         return;
     }
     account.balance = event.balance;
     account.disabled = account.budget <= 0;
-}, false, account_id);
+}
+Transaction.all(); // Register undo buttons
+Transaction.listen(update_balance, false, account_id, update_balance, applyAccountChange);
 const deposit_amount = document.querySelector('#deposit-transaction #id_amount');
 deposit_amount.addEventListener("input", debounce(async (_) => {
     const rsp = await fetch(API.endpoints.qr + '?' + new URLSearchParams({
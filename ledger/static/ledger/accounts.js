@@ -1,4 +1,4 @@
-import { _set_money, HTMLIdentifierWrapper } from "./base.js";
+import { _set_money, _set_text, HTMLIdentifierWrapper, scheduleReload } from "./base.js";
 export class Account extends HTMLIdentifierWrapper {
     static all_selector = '#accounts .item';
     static id_attribute = 'data-account-id';
@@ -11,18 +11,62 @@ export class Account extends HTMLIdentifierWrapper {
     }
     get id() { return this.element.dataset.accountId ?? ''; }
     get name() { return this.element.querySelector('.name')?.textContent ?? ''; }
+    set name(value) { _set_text(this.element.querySelector('.name'), value); }
     get isMember() { return 'member' in this.element.dataset; }
     get credit() { return parseInt(this.element.dataset.credit ?? '0'); }
+    set credit(value) { this.element.dataset.credit = value.toString(); }
     get budget() { return this.balance + this.credit; }
     get balance() { return parseInt(this.element.dataset.balance ?? '0'); }
     set balance(value) {
         this.element.dataset.balance = value.toString();
         _set_money(this.element.querySelector('.money'), value);
     }
-    get disabled() { return this.radio.disabled; }
-    set disabled(value) { this.radio.disabled = value; }
+    get disabled() { return this.radio?.disabled ?? false; }
+    set disabled(value) { if (this.radio) {
+        this.radio.disabled = value;
+    } }
     get selected() { return this.element.hasAttribute('selected'); }
     set selected(value) { this.element.toggleAttribute('selected', value); }
     select() { this.selected = true; }
     canAfford(product) { return this.budget >= product.totalCost(this.isMember); }
 }
+/**
+ * Apply a changed account to the page.
+ * Names and credit are updated in place, anything affecting the layout reloads the page
+ */
+export function applyAccountChange(change) {
+    if (change.entity == 'accountgroup') {
+        scheduleReload();
+        return;
+    }
+    if (change.entity != 'account') {
+        return;
+    }
+    const account = Account.byId(change.id.toString());
+    const fields = change.fields ?? {};
+    if (!account) {
+        // Shown once it is active
+        if (fields.active === true) {
+            scheduleReload();
+        }
+        return;
+    }
+    if (change.op == 'delete' || fields.active === false) {
+        account.element.remove();
+        return;
+    }
+    for (const [field, value] of Object.entries(fields)) {
+        switch (field) {
+            case 'display_name':
+                account.name = value;
+                break;
+            case 'credit':
+                account.credit = value;
+                account.disabled = account.budget <= 0;
+                break;
+            default:
+                scheduleReload();
+                return;
+        }
+    }
+}
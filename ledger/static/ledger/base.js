@@ -48,11 +48,38 @@ export function _set_money(element, amount) {
     element.querySelector('.integer').textContent = amount_string.slice(0, -2);
     element.querySelector('.fraction').textContent = amount_string.slice(-2);
 }
+export function _set_text(element, text) {
+    // The last non-empty text node, other children (icons, inputs) are kept
+    const node = [...element.childNodes].reverse().find(node => node.nodeType == Node.TEXT_NODE && node.textContent?.trim());
+    if (node) {
+        node.textContent = text;
+    }
+    else {
+        element.append(text);
+    }
+}
+// Reloads of all terminals are spread over this many milliseconds
+const RELOAD_JITTER = 5_000;
+let reload_scheduled = false;
+/**
+ * Reload the page after a random delay, so not all terminals reload at once
+ */
+export function scheduleReload() {
+    if (reload_scheduled) {
+        return;
+    }
+    reload_scheduled = true;
+    setTimeout(() => location.reload(), Math.random() * RELOAD_JITTER);
+}
 export function _cloneTemplate(id) {
     const template = document.getElementById(id);
     return template.content.cloneNode(true);
 }
-export const API = await (await fetch('/api/ledger/')).json();
+// Embedded into the page, fetched only if missing
+const api_config = document.getElementById('js-config');
+export const API = api_config
+    ? JSON.parse(api_config.textContent)
+    : await (await fetch('/api/ledger/')).json();
 export function debounce(func, wait, immediate = false) {
     var timeout;
     return function (...args) {
@@ -1,15 +1,35 @@
-import { API, HTMLIdentifierWrapper, debounce } from './base.js';
+import { _set_money, _set_text, API, HTMLIdentifierWrapper, debounce, scheduleReload } from './base.js';
 import { Transaction } from './transaction.js';
-import { Account } from './accounts.js';
+import { Account, applyAccountChange } from './accounts.js';
 const TRANSACTION_TIMEOUT = API.config.transaction_timeout;
 const SEARCH_DEBOUNCE_DELAY = 50;
+// Time the event stream gets to replay missed transactions after reconnecting
+const REPLAY_TIMEOUT = 5000;
 class Product extends HTMLIdentifierWrapper {
     static all_selector = '#products .item';
     static id_attribute = 'data-product-id';
     get id() { return this.element.dataset.productId ?? ''; }
     get name() { return this.element.querySelector('.name')?.textContent ?? ''; }
+    set name(value) { _set_text(this.element.querySelector('.name'), value); }
     get cost() { return parseInt(this.element.dataset.cost ?? '0'); }
     get memberCost() { return parseInt(this.element.dataset.memberCost ?? '0'); }
+    /**
+     * Returns `false` if the price display cannot be updated in place
+     */
+    setPrice(cost, memberCost) {
+        const prices = this.element.querySelectorAll('.price .money');
+        // The member price is only shown if it differs
+        if (prices.length != (cost != memberCost ? 2 : 1)) {
+            return false;
+        }
+        this.element.dataset.cost = cost.toString();
+        this.element.dataset.memberCost = memberCost.toString();
+        _set_money(prices[0], cost);
+        if (prices.length > 1) {
+            _set_money(prices[1], memberCost);
+        }
+        return true;
+    }
     totalCost(member) {
         const cost = member ? this.memberCost : this.cost;
         const amount = multiplier.value;
@@ -47,7 +67,54 @@ Transaction.listen(event => {
     account.balance = event.balance;
     account.disabled = account.budget <= 0;
     updateSelection();
-}, true);
+}, true, undefined, undefined, change => {
+    applyAccountChange(change);
+    applyProductChange(change);
+    updateSelection();
+});
+// Products of this category are shown
+const product_category = document.querySelector('#products')?.dataset.category;
+function applyProductChange(change) {
+    if (change.entity == 'productgroup') {
+        scheduleReload();
+        return;
+    }
+    if (change.entity != 'product') {
+        return;
+    }
+    const product = Product.byId(change.id.toString());
+    const fields = change.fields ?? {};
+    if (!product) {
+        // Shown once it is visible in this category
+        if (fields.visible === true || fields.category == product_category) {
+            scheduleReload();
+        }
+        return;
+    }
+    if (change.op == 'delete' || fields.visible === false || ('category' in fields && fields.category != product_category)) {
+        product.element.remove();
+        return;
+    }
+    if ('cost' in fields || 'member_cost' in fields) {
+        if (!product.setPrice(fields.cost ?? product.cost, fields.member_cost ?? product.memberCost)) {
+            scheduleReload();
+            return;
+        }
+    }
+    for (const [field, value] of Object.entries(fields)) {
+        switch (field) {
+            case 'cost':
+            case 'member_cost':
+                break;
+            case 'display_name':
+                product.name = value;
+                break;
+            default:
+                scheduleReload();
+                return;
+        }
+    }
+}
 // Better transaction multiplier
 const multiplier = {
     element: document.querySelector('#transaction-multiplier > span'),
@@ -166,3 +233,60 @@ function clearSearch() {
     search_bar.dispatchEvent(new Event('input'));
 }
 document.querySelector('#item-search ~ button')?.addEventListener('click', clearSearch);
+// Catch up after waking up
+const snapshot_meta = document.querySelector('meta[name="ledger-snapshot"]');
+function sameIds(items, elements) {
+    const ids = new Set(elements.map(e => e.id));
+    return items.length == ids.size && items.every(item => ids.has(item.id.toString()));
+}
+async function refreshSnapshot() {
+    if (!snapshot_meta) {
+        return;
+    }
+    let rsp;
+    try {
+        rsp = await fetch(snapshot_meta.content, {
+            headers: { 'If-None-Match': snapshot_meta.dataset.etag ?? '' },
+            cache: 'no-store',
+        });
+    }
+    catch {
+        return;
+    }
+    // 304: Nothing changed since the page was rendered
+    if (!rsp.ok) {
+        return;
+    }
+    const snapshot = await rsp.json();
+    snapshot_meta.dataset.etag = rsp.headers.get('ETag') ?? '';
+    if (!sameIds(snapshot.accounts, Account.all()) || !sameIds(snapshot.products, Product.all())) {
+        location.reload();
+        return;
+    }
+    snapshot.accounts.forEach(data => {
+        const account = Account.byId(data.id.toString());
+        if (!account) {
+            return;
+        }
+        account.balance = data.balance;
+        account.disabled = account.budget <= 0;
+    });
+    updateSelection();
+    // Missed transactions are added by the replay of the event stream, reload only if they do not arrive
+    if (missedTransaction(snapshot)) {
+        setTimeout(() => {
+            if (missedTransaction(snapshot)) {
+                location.reload();
+            }
+        }, REPLAY_TIMEOUT);
+    }
+}
+function missedTransaction(snapshot) {
+    const known_transactions = new Set(Transaction.all().map(t => t.id));
+    return snapshot.transactions.some(t => !known_transactions.has(t.id.toString()));
+}
+document.addEventListener('visibilitychange', _ => {
+    if (document.visibilityState == "visible") {
+        refreshSnapshot();
+    }
+});
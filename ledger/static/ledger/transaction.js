@@ -1,5 +1,21 @@
 import { _set_money, API, HTMLWrapper } from './base.js';
 const SUBMIT_OVERLAY_DURATION = API.config.submit_overlay;
+// Keys of the compact event schema, see `COMPACT_KEYS` in `utils/transaction.py`
+const COMPACT_KEYS = {
+    i: 'id',
+    a: 'account',
+    n: 'account_name',
+    b: 'balance',
+    m: 'amount',
+    r: 'reason',
+    l: 'related',
+    k: 'idempotency_key',
+    tb: 'timejump_before',
+    ta: 'timejump_after',
+};
+function parseCompactEvent(data) {
+    return Object.fromEntries(Object.entries(JSON.parse(data)).map(([key, value]) => [COMPACT_KEYS[key] ?? key, value]));
+}
 function getRadioGroup(formElements, name) {
     const elements = formElements[name];
     if (elements instanceof RadioNodeList) {
@@ -65,10 +81,16 @@ export class Transaction extends HTMLWrapper {
         });
     }
     static ping_nonce = undefined;
+    static listener_id = undefined;
     static ping_eventsource() {
         try {
             this.ping_nonce = Date.now().valueOf();
-            fetch(this.api.ping + `?nonce=${this.ping_nonce}`);
+            const params = new URLSearchParams({ nonce: this.ping_nonce.toString() });
+            if (this.listener_id !== undefined) {
+                // Only this connection receives the ping
+                params.set('listener', this.listener_id);
+            }
+            fetch(this.api.ping + '?' + params);
             setTimeout(_ => {
                 if (this.ping_nonce !== undefined) {
                     console.log("Transaction eventsource ping failed, reconnecting...");
@@ -89,7 +111,9 @@ export class Transaction extends HTMLWrapper {
     static eventsource_handlers = {};
     static async reconnect() {
         this.event_source?.close();
-        await this.listen(this.eventsource_handlers.ontransaction, true);
+        this.listener_id = undefined;
+        const { ontransaction, account, onbalance, onchange } = this.eventsource_handlers;
+        await this.listen(ontransaction, true, account, onbalance, onchange);
     }
     static attachPing() {
         document.addEventListener('visibilitychange', ev => {
@@ -98,9 +122,19 @@ export class Transaction extends HTMLWrapper {
             }
         });
     }
-    static async listen(ontransaction, reconnect = false, account) {
+    /**
+     * Receive new transactions from the server.
+     * With `account`, only transactions of that account are received,
+     * and balance changes of all accounts are passed to `onbalance`.
+     * Changed accounts and products are passed to `onchange`
+     */
+    static async listen(ontransaction, reconnect = false, account, onbalance, onchange) {
         const url = new URL(this.api.events, document.location.origin);
-        this.eventsource_handlers.ontransaction = ontransaction;
+        this.eventsource_handlers = { ontransaction, account, onbalance, onchange };
+        if (account !== undefined) {
+            url.searchParams.set('account', account.toString());
+        }
+        url.searchParams.set('schema', 'compact');
         const all_transaction_ids = this.all().map(t => parseInt(t.id));
         if (reconnect && all_transaction_ids.length > 0) {
             const max_transaction_id = Math.max(...all_transaction_ids).toString();
@@ -114,8 +148,14 @@ export class Transaction extends HTMLWrapper {
             }
         });
         this.event_source.addEventListener('reload', _ => { location.reload(); });
+        this.event_source.addEventListener('balance', event => {
+            onbalance?.(parseCompactEvent(event.data));
+        });
+        this.event_source.addEventListener('change', event => {
+            onchange?.(JSON.parse(event.data));
+        });
         this.event_source.addEventListener('create', event => {
-            const data = JSON.parse(event.data);
+            const data = parseCompactEvent(event.data);
             console.log("received server event:", data);
             const related_transaction = data.related !== undefined && Transaction.from(document.querySelector(`.transaction:has([name="transaction"][value="${data.related}"])`));
             if (related_transaction) {
@@ -173,7 +213,12 @@ export class Transaction extends HTMLWrapper {
                 ontransaction(data);
             }
         });
-        this.event_source.addEventListener('open', _ => {
+        this.event_source.addEventListener('open', event => {
+            if (event instanceof MessageEvent && event.data) {
+                // Sent by the server, identifies this connection
+                this.listener_id = event.data;
+                return;
+            }
             // Successful connection, do not try to reconnect anymore
             console.log('Eventsource connected');
             clearInterval(this.reconnect_interval);
@@ -186,7 +231,7 @@ export class Transaction extends HTMLWrapper {
                 // Retry every 10s
                 if (this.reconnect_interval === undefined) {
                     this.reconnect_interval = setInterval(() => {
-                        this.listen(ontransaction, true);
+                        this.listen(ontransaction, true, account, onbalance, onchange);
                     }, 10_000);
                 }
             }
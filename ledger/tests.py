@@ -1,21 +1,29 @@
-from django.test import TestCase, Client, AsyncClient
+from django.test import TestCase, TransactionTestCase, Client, AsyncClient, override_settings
 
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ImproperlyConfigured
 from django.forms import Form, NumberInput
 from django.contrib.auth.models import User
+from django.core.cache import cache
 
 from django.utils.timezone import now
 from datetime import datetime, timedelta
 from django.forms.models import modelform_factory
 from django.utils.formats import get_format
 
-from .models import Transaction, Account, Product
-from .eventstream import send_event
+from .models import Transaction, Account, Product, LedgerChange
+from .eventstream import send_event, negotiate_encoding
 from .formfield import FixedPrecisionField
+from .conf import settings
+from .forms import ProductTransactionForm
+from .utils.transaction import order_product, transaction_event, mark_timejumps
+from . import writer
+from .utils.banking import EPCCode
 
 from django.urls import reverse
 from asgiref.sync import sync_to_async
+from json import loads
 import re
+import zlib
 
 
 # Create your tests here.
@@ -346,6 +354,144 @@ class TransactionEventTest(TestCase):
         self.assertIn(b'event: open\n', events[0])
         self.assertIn(b'event: reload\n', events[1])
 
+class ListenerPingTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test')
+
+    async def test_targeted_ping(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('ledger:api:events'))
+        other_response = await client.get(reverse('ledger:api:events'))
+
+        stream = aiter(response.streaming_content)
+        other_stream = aiter(other_response.streaming_content)
+        open_event = await anext(stream)
+        other_open_event = await anext(other_stream)
+        self.assertIn(b'event: open\n', open_event)
+        listener_id = re.search(rb'data: (\w+)', open_event).group(1).decode()
+        self.assertNotIn(listener_id.encode(), other_open_event)
+
+        ping = await client.get(reverse('ledger:api:ping'), query_params={'nonce': '42', 'listener': listener_id})
+        self.assertEqual(ping.status_code, 200)
+        await sync_to_async(send_event)(channel='transaction', event='dummy')
+
+        self.assertEqual(await anext(stream), b'event: ping\ndata: 42\n\n')
+        self.assertEqual(await anext(other_stream), b'event: dummy\ndata: \n\n')
+
+        ping = await client.get(reverse('ledger:api:ping'), query_params={'nonce': '42', 'listener': 'unknown'})
+        self.assertEqual(ping.status_code, 404)
+
+class AccountEventTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test')
+        self.acc1 = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+        self.acc2 = Account.objects.create(display_name='acc2', credit=20_00, member=False)
+
+    def create_transaction(self, account: Account) -> Transaction:
+        return Transaction.objects.create(account=account, amount=50, type=Transaction.TransactionType.ORDER, reason='test', issuer=None)
+
+    async def test_account_channel(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('ledger:api:events'), query_params={'account': self.acc1.pk})
+        stream = aiter(response.streaming_content)
+        self.assertIn(b'event: open\n', await anext(stream))
+
+        await sync_to_async(self.create_transaction)(self.acc2)
+        transaction = await sync_to_async(self.create_transaction)(self.acc1)
+
+        # Other accounts only send their balance
+        event = await anext(stream)
+        self.assertIn(b'event: balance\n', event)
+        self.assertIn(f'"account": {self.acc2.pk}'.encode(), event)
+        self.assertIn(f'event: create\nid: {transaction.pk}\n'.encode(), await anext(stream))
+        self.assertIn(b'event: balance\n', await anext(stream))
+
+    async def test_account_replay(self):
+        last_transaction = await sync_to_async(self.create_transaction)(self.acc1)
+        await sync_to_async(self.create_transaction)(self.acc2)
+        transaction = await sync_to_async(self.create_transaction)(self.acc1)
+
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('ledger:api:events'), query_params={'account': self.acc1.pk, 'last_transaction': last_transaction.pk})
+        stream = aiter(response.streaming_content)
+        self.assertIn(b'event: open\n', await anext(stream))
+
+        self.assertIn(f'event: create\nid: {transaction.pk}\n'.encode(), await anext(stream))
+        # The balance of acc2 changed while the client was away
+        self.assertEqual(f'event: balance\ndata: {{"account": {self.acc2.pk}, "balance": -50}}\n\n'.encode(), await anext(stream))
+
+    async def test_invalid_filter(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('ledger:api:events'), query_params={'group': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+class CatalogEventTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test')
+        self.acc1 = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+        self.product = Product.objects.create(display_name='Beer', cost=1_50, member_cost=1_50)
+
+    def update_product(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.cost = 2_00
+            self.product.save()
+            # Unchanged, nothing is sent
+            self.product.save()
+    
+    def delete_account(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.acc1.delete()
+
+    async def test_changes(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('ledger:api:events'), query_params={'account': self.acc1.pk})
+        stream = aiter(response.streaming_content)
+        self.assertIn(b'event: open\n', await anext(stream))
+
+        await sync_to_async(self.update_product)()
+        event = (await anext(stream)).decode()
+        self.assertIn('event: change\n', event)
+        data = loads(re.search(r'data: (.*)', event).group(1))
+        # Only changed fields are sent
+        self.assertEqual(data, {'entity': 'product', 'id': self.product.pk, 'op': 'update', 'fields': {'cost': 2_00}})
+
+        pk = self.acc1.pk
+        await sync_to_async(self.delete_account)()
+        data = loads(re.search(r'data: (.*)', (await anext(stream)).decode()).group(1))
+        self.assertEqual(data, {'entity': 'account', 'id': pk, 'op': 'delete'})
+
+class CompressedEventTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test')
+        self.acc1 = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'gzip')
+        self.assertEqual(negotiate_encoding('gzip;q=0, deflate;q=0.5'), 'deflate')
+        self.assertIsNone(negotiate_encoding('br'))
+        self.assertIsNone(negotiate_encoding(None))
+
+    async def test_compressed_compact(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('ledger:api:events'), query_params={'schema': 'compact'}, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        stream = aiter(response.streaming_content)
+        # Every event can be decompressed on its own
+        self.assertIn(b'event: open\n', decompressor.decompress(await anext(stream)))
+        transaction = await sync_to_async(Transaction.objects.create)(account=self.acc1, amount=50, type=Transaction.TransactionType.ORDER, reason='test', issuer=None)
+        event = decompressor.decompress(await anext(stream)).decode()
+        self.assertIn(f'event: create\nid: {transaction.pk}\n', event)
+        data = loads(re.search(r'data: (.*)', event).group(1))
+        self.assertEqual((data['i'], data['a'], data['r']), (transaction.pk, self.acc1.pk, 'test'))
+
 class ApiViewTest(TestCase):
     """
     Test following URLs:
@@ -479,3 +625,290 @@ class FormFieldTest(TestCase):
             html_value = html_value[1]
             self.assertEqual(expected, html_value, f"for {value=}")
         
+
+class SettingsTest(TestCase):
+    def test_memoized(self):
+        self.assertEqual(settings.REVERT_THRESHOLD, timedelta(hours=6))
+        self.assertIn('REVERT_THRESHOLD', vars(settings))
+
+        with override_settings(LEDGER={'REVERT_THRESHOLD': timedelta(hours=1)}):
+            self.assertEqual(settings.REVERT_THRESHOLD, timedelta(hours=1))
+            self.assertEqual(settings.snapshot['REVERT_THRESHOLD'], timedelta(hours=1))
+        self.assertEqual(settings.REVERT_THRESHOLD, timedelta(hours=6))
+
+    def test_validate(self):
+        with override_settings(LEDGER={'REVERT_THRESHOLD': 6}):
+            with self.assertRaises(ImproperlyConfigured):
+                settings.validate()
+        with override_settings(LEDGER={'REVERT_TRESHOLD': timedelta(hours=1)}):
+            with self.assertRaises(ImproperlyConfigured):
+                settings.validate()
+        self.assertEqual(settings.validate()['TRANSACTION_HISTORY_MIN_ENTRIES'], 10)
+
+    def test_nullable(self):
+        with override_settings(LEDGER={'CHANGES_RETENTION': None}):
+            self.assertIsNone(settings.validate()['CHANGES_RETENTION'])
+        with override_settings(LEDGER={'REVERT_THRESHOLD': None}):
+            with self.assertRaises(ImproperlyConfigured):
+                settings.validate()
+
+@override_settings(LEDGER={'BANKING': {'name': 'Bar e.V.', 'iban': 'DE02120300000000202051', 'invoice-text': 'Deposit {name}'}})
+class DepositQrTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_superuser(username='admin')
+        self.client.force_login(self.user)
+        self.account = Account.objects.create(display_name='acc', full_name='Jane Doe', member=True, permanent=True)
+
+    def test_etag(self):
+        url = reverse('ledger:api:qr') + f'?account={self.account.pk}&amount=5'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<svg', response.content)
+
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        other = self.client.get(reverse('ledger:api:qr') + f'?account={self.account.pk}&amount=6')
+        self.assertNotEqual(other['ETag'], response['ETag'])
+
+    def test_precomputed(self):
+        code = EPCCode.from_config(self.account.qr_name)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.save()
+        self.assertEqual(cache.get(f'ledger:qr:{code.digest}'), code.qr_code)
+
+class ApiDescriptionTest(TestCase):
+    def setUp(self) -> None:
+        self.client.force_login(User.objects.create_user(username='test'))
+
+    def test_embedded(self):
+        response = self.client.get(reverse('ledger:main'))
+        self.assertContains(response, '<script id="js-config" type="application/json">')
+        self.assertEqual(response.context['js_config']['endpoints']['qr'], reverse('ledger:api:qr'))
+
+    def test_etag(self):
+        response = self.client.get('/api/ledger/')
+        self.assertEqual(response.json()['config']['transaction_timeout'], settings.TRANSACTION_TIMEOUT.total_seconds() * 1000)
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertEqual(self.client.get('/api/ledger/', headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+        with override_settings(LEDGER={'TRANSACTION_TIMEOUT': timedelta(seconds=3)}):
+            changed = self.client.get('/api/ledger/', headers={'If-None-Match': response['ETag']})
+            self.assertEqual(changed.json()['config']['transaction_timeout'], 3000)
+
+class SnapshotTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='test'))
+        self.acc1 = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+        self.product = Product.objects.create(full_name='Beer', cost=2_00, member_cost=1_50)
+
+    def test_conditional(self):
+        page = self.client.get(reverse('ledger:main'))
+        etag = page.context['snapshot_etag']
+
+        response = self.client.get(reverse('ledger:api:snapshot'))
+        self.assertEqual(response['ETag'], etag)
+        snapshot = response.json()
+        self.assertEqual(snapshot['accounts'][0]['balance'], 0)
+        self.assertEqual(snapshot['products'][0]['cost'], 2_00)
+        self.assertEqual(self.client.get(reverse('ledger:api:snapshot'), headers={'If-None-Match': etag}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(account=self.acc1, amount=50, type=Transaction.TransactionType.ORDER, reason='test', issuer=None)
+        response = self.client.get(reverse('ledger:api:snapshot'), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['accounts'][0]['balance'], -50)
+        self.assertEqual(response.json()['transactions'][0]['amount'], -50)
+
+    @override_settings(LEDGER={'SNAPSHOT_MAX_AGE': timedelta(0)})
+    def test_max_age(self):
+        etag = self.client.get(reverse('ledger:api:snapshot'))['ETag']
+        # Changed by another process, whose invalidation this process does not see
+        Product.objects.filter(pk=self.product.pk).update(cost=2_50)
+        response = self.client.get(reverse('ledger:api:snapshot'), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['products'][0]['cost'], 2_50)
+
+    def test_category(self):
+        self.assertNotEqual(
+            self.client.get(reverse('ledger:api:snapshot'))['ETag'],
+            self.client.get(reverse('ledger:api:snapshot'), query_params={'category': Product.ProductCategory.STOCK})['ETag'])
+        self.assertEqual(self.client.get(reverse('ledger:api:snapshot'), query_params={'category': 'x'}).status_code, 400)
+
+class LedgerChangeTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_superuser(username='admin')
+        self.client.force_login(self.user)
+
+    def test_log(self):
+        account = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+        order = Transaction.objects.create(account=account, amount=50, type=Transaction.TransactionType.ORDER, reason='test', issuer=None)
+        revert = order.revert(self.user)
+        account.close_balance()
+
+        changes = list(LedgerChange.objects.order_by('id').values_list('entity', 'object_id', 'operation'))
+        self.assertEqual(changes[:4], [
+            ('account', account.pk, 'create'),
+            ('transaction', order.pk, 'create'),
+            ('transaction', revert.pk, 'create'),
+            ('transaction', order.pk, 'update'),
+        ])
+        # Closing re-parents both transactions
+        self.assertEqual(changes[4][0], 'accountbalance')
+        self.assertCountEqual(changes[5:], [('transaction', order.pk, 'update'), ('transaction', revert.pk, 'update')])
+
+        account.delete()
+        self.assertEqual(LedgerChange.objects.filter(operation='delete').count(), 4)
+
+    def test_tail(self):
+        account = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+        for _ in range(3):
+            Transaction.objects.create(account=account, amount=50, type=Transaction.TransactionType.ORDER, reason='test', issuer=None)
+
+        response = self.client.get(reverse('ledger:api:changes'), query_params={'limit': 3}).json()
+        self.assertTrue(response['more'])
+        self.assertEqual([change['entity'] for change in response['changes']], ['account', 'transaction', 'transaction'])
+        self.assertEqual(response['changes'][1]['payload']['reason'], 'test')
+
+        response = self.client.get(reverse('ledger:api:changes'), query_params={'after': response['cursor']}).json()
+        self.assertFalse(response['more'])
+        self.assertEqual(len(response['changes']), 1)
+
+        self.client.force_login(User.objects.create_user(username='test'))
+        self.assertEqual(self.client.get(reverse('ledger:api:changes')).status_code, 403)
+
+    def test_prune(self):
+        account = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+        cursor = self.client.get(reverse('ledger:api:changes')).json()['cursor']
+        account.display_name = 'acc2'
+        account.save()
+        LedgerChange.objects.update(timestamp=now() - timedelta(days=100))
+
+        self.assertEqual(LedgerChange.prune(now() - settings.CHANGES_RETENTION), 1)
+        # The latest change is kept
+        self.assertEqual(list(LedgerChange.objects.values_list('operation', flat=True)), ['update'])
+        self.assertEqual(self.client.get(reverse('ledger:api:changes'), query_params={'after': cursor}).status_code, 410)
+
+class CatalogTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.account = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+        self.product = Product.objects.create(full_name='Beer', display_name='Beer', cost=1_50, member_cost=1_00)
+
+    def form(self, **data) -> ProductTransactionForm:
+        return ProductTransactionForm({'account': self.account.pk, 'product': self.product.pk} | data)
+
+    def test_no_queries(self):
+        self.assertTrue(self.form().is_valid())
+        with self.assertNumQueries(0):
+            form = self.form()
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['product'].cost, 1_50)
+        # Instances are not shared between forms
+        other = self.form()
+        self.assertTrue(other.is_valid())
+        self.assertIsNot(form.cleaned_data['account'], other.cleaned_data['account'])
+
+    def test_invalid(self):
+        self.assertFalse(self.form(product='abc').is_valid())
+        self.assertFalse(self.form(product=self.product.pk + 1).is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.active = False
+            self.account.save()
+        self.assertFalse(self.form().is_valid())
+
+    def test_invalidate(self):
+        self.assertTrue(self.form().is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.cost = 2_00
+            self.product.save()
+        form = self.form()
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['product'].cost, 2_00)
+
+    @override_settings(LEDGER={'CATALOG_MAX_AGE': timedelta(0)})
+    def test_max_age(self):
+        self.assertTrue(self.form().is_valid())
+        # Changed by another process, whose invalidation this process does not see
+        Product.objects.filter(pk=self.product.pk).update(cost=2_00)
+        form = self.form()
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['product'].cost, 2_00)
+
+@override_settings(LEDGER={'WRITE_QUEUE': True})
+class WriterTest(TransactionTestCase):
+    def setUp(self) -> None:
+        self.rich = Account.objects.create(display_name='rich', credit=20_00, member=False)
+        self.poor = Account.objects.create(display_name='poor', credit=0, member=False)
+        self.product = Product.objects.create(full_name='Beer', display_name='Beer', cost=1_50, member_cost=1_50)
+
+    def test_batch(self):
+        futures = [
+            writer.submit(order_product.__wrapped__, account, self.product, issuer=None)
+            for account in [self.rich, self.poor, self.rich]
+        ]
+        self.assertIsInstance(futures[0].result(), Transaction)
+        # Failed writes do not affect the others of their batch
+        self.assertRaises(Account.NotEnoughFunds, futures[1].result)
+        self.assertIsInstance(futures[2].result(), Transaction)
+        self.assertEqual(Transaction.objects.filter(account=self.rich).count(), 2)
+
+    def test_serialized(self):
+        transaction = order_product(self.rich, self.product, issuer=None)
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).amount, 1_50)
+        with self.assertRaises(Account.NotEnoughFunds):
+            order_product(self.poor, self.product, issuer=None)
+
+class TimejumpTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='test')
+        self.account = Account.objects.create(display_name='acc1', credit=20_00, member=False)
+        start = now() - timedelta(days=2)
+        self.transactions = [self.create_transaction(timestamp) for timestamp in [start, start + timedelta(hours=1), now() - timedelta(hours=1)]]
+
+    def create_transaction(self, timestamp: datetime) -> Transaction:
+        transaction = Transaction.objects.create(account=self.account, amount=50, type=Transaction.TransactionType.ORDER, reason='test', issuer=None)
+        Transaction.objects.filter(pk=transaction.pk).update(timestamp=timestamp)
+        return Transaction.objects.get(pk=transaction.pk)
+
+    def test_previous_timestamp(self):
+        first, second, third = self.transactions
+        self.assertIsNone(first.previous_timestamp)
+        self.assertEqual(third.previous_timestamp, second.timestamp)
+
+        self.assertNotIn('timejump_before', transaction_event(second))
+        self.assertIn('timejump_before', transaction_event(third))
+
+    def test_relink(self):
+        first, second, third = self.transactions
+        second.delete()
+        third.refresh_from_db()
+        self.assertEqual(third.previous_timestamp, first.timestamp)
+
+        # Reverts are not shown in lists and skipped
+        third.revert(User.objects.create_superuser(username='admin'))
+        fourth = self.create_transaction(now())
+        self.assertEqual(fourth.previous_timestamp, third.timestamp)
+
+        other = Account.objects.create(display_name='acc2', credit=20_00, member=False)
+        transaction = Transaction.objects.create(account=other, amount=50, type=Transaction.TransactionType.ORDER, reason='test', issuer=None)
+        self.assertEqual(transaction.previous_timestamp, fourth.timestamp)
+        # Deletes all transactions before it
+        self.account.delete()
+        transaction.refresh_from_db()
+        self.assertIsNone(transaction.previous_timestamp)
+
+    def test_history(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('ledger:main'))
+        third, second, first = response.context['transaction_list']
+        self.assertEqual([t.pk for t in (first, second, third)], [t.pk for t in self.transactions])
+        self.assertEqual((third.timejump_after, third.timejump_before), (False, True))
+        self.assertEqual((second.timejump_after, second.timejump_before), (True, False))
+        self.assertEqual((first.timejump_after, first.timejump_before), (False, False))
+
+    def test_filtered(self):
+        third = self.transactions[-1]
+        self.assertTrue(mark_timejumps([third])[0].timejump_before)
+        # The stored previous timestamp may belong to another account
+        self.assertFalse(mark_timejumps([third], filtered=True)[0].timejump_before)
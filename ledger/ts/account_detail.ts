@@ -1,6 +1,6 @@
 
-import { Transaction } from "./transaction.js"
-import { Account } from "./accounts.js"
+import { Transaction, BalanceEvent } from "./transaction.js"
+import { Account, applyAccountChange } from "./accounts.js"
 import { API, debounce } from "./base.js"
 
 const selected_account = document.querySelector<HTMLElement>('#accounts .item[selected]')!
@@ -40,13 +40,15 @@ withdraw_all?.addEventListener('click', _ => {
 
 const account_id = parseInt(((document.getElementById('deposit-transaction') as HTMLFormElement).elements.namedItem('account') as HTMLInputElement).value)
 
-Transaction.all() // Register undo buttons
-Transaction.listen(event => {
+function update_balance(event: BalanceEvent) {
 	const account = Account.byId(event.account.toString())
 	if (!account) { return }
 	account.balance = event.balance
 	account.disabled = account.budget <= 0
-}, false, account_id)
+}
+
+Transaction.all() // Register undo buttons
+Transaction.listen(update_balance, false, account_id, update_balance, applyAccountChange)
 
 const deposit_amount = document.querySelector<HTMLInputElement>('#deposit-transaction #id_amount')!
 deposit_amount.addEventListener("input", debounce(async _  =>  {
@@ -1,5 +1,6 @@
 
-import { _money, _set_money, HTMLIdentifierWrapper } from "./base.js"
+import { _money, _set_money, _set_text, HTMLIdentifierWrapper, scheduleReload } from "./base.js"
+import type { ChangeEvent } from "./transaction.js"
 
 interface Product {
 	totalCost(member: boolean): number
@@ -11,17 +12,20 @@ export class Account extends HTMLIdentifierWrapper {
 	static deselectAll() { this.all().forEach(acc => acc.selected = false) }
 	static enableAll() { this.all().forEach(acc => acc.disabled = false) }
 
-	radio: HTMLInputElement
+	// Not rendered for linked accounts
+	radio: HTMLInputElement | null
 	constructor(element: HTMLElement) {
 		super(element)
 
-		this.radio = element.querySelector<HTMLInputElement>('input[name="account"]')!
+		this.radio = element.querySelector<HTMLInputElement>('input[name="account"]')
 	}
 
 	get id(): string { return this.element.dataset.accountId ?? '' }
 	get name(): string { return this.element.querySelector('.name')?.textContent ?? '' }
+	set name(value: string) { _set_text(this.element.querySelector<HTMLElement>('.name')!, value) }
 	get isMember(): boolean { return 'member' in this.element.dataset }
 	get credit(): number { return parseInt(this.element.dataset.credit ?? '0') }
+	set credit(value: number) { this.element.dataset.credit = value.toString() }
 	get budget(): number { return this.balance + this.credit }
 	
 	get balance(): number { return parseInt(this.element.dataset.balance ?? '0') }
@@ -30,8 +34,8 @@ export class Account extends HTMLIdentifierWrapper {
         _set_money(this.element.querySelector('.money')!, value)
 	}
 
-	get disabled(): boolean { return this.radio.disabled }
-	set disabled(value: boolean) { this.radio.disabled = value }
+	get disabled(): boolean { return this.radio?.disabled ?? false }
+	set disabled(value: boolean) { if (this.radio) { this.radio.disabled = value } }
 	
 	get selected(): boolean { return this.element.hasAttribute('selected') }
 	set selected(value: boolean) { this.element.toggleAttribute('selected', value) }
@@ -39,3 +43,43 @@ export class Account extends HTMLIdentifierWrapper {
 	canAfford(product: Product): boolean { return this.budget >= product.totalCost(this.isMember) }
 }
 
+
+/**
+ * Apply a changed account to the page.
+ * Names and credit are updated in place, anything affecting the layout reloads the page
+ */
+export function applyAccountChange(change: ChangeEvent) {
+	if (change.entity == 'accountgroup') {
+		scheduleReload()
+		return
+	}
+	if (change.entity != 'account') { return }
+
+	const account = Account.byId(change.id.toString())
+	const fields = change.fields ?? {}
+	if (!account) {
+		// Shown once it is active
+		if (fields.active === true) {
+			scheduleReload()
+		}
+		return
+	}
+	if (change.op == 'delete' || fields.active === false) {
+		account.element.remove()
+		return
+	}
+	for (const [field, value] of Object.entries(fields)) {
+		switch (field) {
+			case 'display_name':
+				account.name = value
+				break
+			case 'credit':
+				account.credit = value
+				account.disabled = account.budget <= 0
+				break
+			default:
+				scheduleReload()
+				return
+		}
+	}
+}
@@ -64,6 +64,30 @@ export function _set_money(element: HTMLElement, amount: number) {
 	element.querySelector('.fraction')!.textContent = amount_string.slice(-2)
 }
 
+export function _set_text(element: HTMLElement, text: string) {
+	// The last non-empty text node, other children (icons, inputs) are kept
+	const node = [...element.childNodes].reverse().find(node => node.nodeType == Node.TEXT_NODE && node.textContent?.trim())
+	if (node) {
+		node.textContent = text
+	}
+	else {
+		element.append(text)
+	}
+}
+
+// Reloads of all terminals are spread over this many milliseconds
+const RELOAD_JITTER = 5_000
+let reload_scheduled = false
+
+/**
+ * Reload the page after a random delay, so not all terminals reload at once
+ */
+export function scheduleReload() {
+	if (reload_scheduled) { return }
+	reload_scheduled = true
+	setTimeout(() => location.reload(), Math.random() * RELOAD_JITTER)
+}
+
 export function _cloneTemplate(id: string): DocumentFragment {
 	const template = document.getElementById(id) as HTMLTemplateElement
 	return template.content.cloneNode(true) as DocumentFragment
@@ -78,6 +102,7 @@ interface API {
 		events: string
 		ping: string
         qr: string
+        snapshot: string
         session: string
 	}
 
@@ -87,7 +112,11 @@ interface API {
     }
 }
 
-export const API: API = await (await fetch('/api/ledger/')).json()
+// Embedded into the page, fetched only if missing
+const api_config = document.getElementById('js-config')
+export const API: API = api_config
+    ? JSON.parse(api_config.textContent!)
+    : await (await fetch('/api/ledger/')).json()
 
 export function debounce<Args extends any[], F extends (...args: Args) => any>(func: F, wait: number, immediate: boolean = false) {
     var timeout: ReturnType<typeof setTimeout> | null
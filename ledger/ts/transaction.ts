@@ -13,6 +13,42 @@ interface ServerEvent {
 	idempotency_key: string | undefined,
 }
 
+// Keys of the compact event schema, see `COMPACT_KEYS` in `utils/transaction.py`
+const COMPACT_KEYS: Record<string, string> = {
+	i: 'id',
+	a: 'account',
+	n: 'account_name',
+	b: 'balance',
+	m: 'amount',
+	r: 'reason',
+	l: 'related',
+	k: 'idempotency_key',
+	tb: 'timejump_before',
+	ta: 'timejump_after',
+}
+
+function parseCompactEvent<T>(data: string): T {
+	return Object.fromEntries(
+		Object.entries(JSON.parse(data)).map(([key, value]) => [COMPACT_KEYS[key] ?? key, value])
+	) as T
+}
+
+export interface BalanceEvent {
+	account: number,
+	balance: number,
+}
+
+/**
+ * An account or product changed, `fields` holds the changed values.
+ * See `broadcast_change` in `signals.py`
+ */
+export interface ChangeEvent {
+	entity: 'account' | 'accountgroup' | 'product' | 'productgroup',
+	id: number,
+	op: 'create' | 'update' | 'delete',
+	fields?: Record<string, any>,
+}
+
 interface Product {
 	readonly id: string
 	readonly name: string
@@ -138,10 +174,16 @@ export class Transaction extends HTMLWrapper {
 	}
 
 	private static ping_nonce: number | undefined = undefined
+	private static listener_id: string | undefined = undefined
 	private static ping_eventsource() {
 		try {
 			this.ping_nonce = Date.now().valueOf()
-			fetch(this.api.ping + `?nonce=${this.ping_nonce}`)
+			const params = new URLSearchParams({ nonce: this.ping_nonce.toString() })
+			if (this.listener_id !== undefined) {
+				// Only this connection receives the ping
+				params.set('listener', this.listener_id)
+			}
+			fetch(this.api.ping + '?' + params)
 
 			setTimeout(_ => {
 				if (this.ping_nonce !== undefined) {
@@ -163,10 +205,15 @@ export class Transaction extends HTMLWrapper {
 	private static event_source: EventSource | undefined = undefined
 	private static eventsource_handlers: {
 		ontransaction?: (event: ServerEvent) => void
+		account?: number
+		onbalance?: (event: BalanceEvent) => void
+		onchange?: (event: ChangeEvent) => void
 	} = {}
 	private static async reconnect() {
 		this.event_source?.close()
-		await this.listen(this.eventsource_handlers.ontransaction, true)
+		this.listener_id = undefined
+		const { ontransaction, account, onbalance, onchange } = this.eventsource_handlers
+		await this.listen(ontransaction, true, account, onbalance, onchange)
 	}
 	static attachPing() {
 		document.addEventListener('visibilitychange', ev => {
@@ -175,10 +222,20 @@ export class Transaction extends HTMLWrapper {
 			}
 		})
 	}
-	static async listen(ontransaction?: (event: ServerEvent) => void, reconnect: boolean = false, account?: number) {
+	/**
+	 * Receive new transactions from the server.
+	 * With `account`, only transactions of that account are received,
+	 * and balance changes of all accounts are passed to `onbalance`.
+	 * Changed accounts and products are passed to `onchange`
+	 */
+	static async listen(ontransaction?: (event: ServerEvent) => void, reconnect: boolean = false, account?: number, onbalance?: (event: BalanceEvent) => void, onchange?: (event: ChangeEvent) => void) {
 		const url = new URL(this.api.events, document.location.origin)
 
-		this.eventsource_handlers.ontransaction = ontransaction
+		this.eventsource_handlers = { ontransaction, account, onbalance, onchange }
+		if (account !== undefined) {
+			url.searchParams.set('account', account.toString())
+		}
+		url.searchParams.set('schema', 'compact')
 		
 		const all_transaction_ids = this.all().map(t => parseInt(t.id))
 		if (reconnect && all_transaction_ids.length > 0) {
@@ -195,8 +252,14 @@ export class Transaction extends HTMLWrapper {
 			}
 		})
 		this.event_source.addEventListener('reload', _ => { location.reload() })
+		this.event_source.addEventListener('balance', event => {
+			onbalance?.(parseCompactEvent<BalanceEvent>(event.data))
+		})
+		this.event_source.addEventListener('change', event => {
+			onchange?.(JSON.parse(event.data) as ChangeEvent)
+		})
 		this.event_source.addEventListener('create', event => {
-			const data = JSON.parse(event.data) as ServerEvent
+			const data = parseCompactEvent<ServerEvent>(event.data)
 			console.log("received server event:", data)
             
             const related_transaction = data.related !== undefined && Transaction.from(document.querySelector<HTMLElement>(`.transaction:has([name="transaction"][value="${data.related}"])`))
@@ -264,7 +327,12 @@ export class Transaction extends HTMLWrapper {
 			}
 		})
 
-		this.event_source.addEventListener('open', _ => {
+		this.event_source.addEventListener('open', event => {
+			if (event instanceof MessageEvent && event.data) {
+				// Sent by the server, identifies this connection
+				this.listener_id = event.data
+				return
+			}
 			// Successful connection, do not try to reconnect anymore
 			console.log('Eventsource connected')
 			clearInterval(this.reconnect_interval)
@@ -278,7 +346,7 @@ export class Transaction extends HTMLWrapper {
 				// Retry every 10s
 				if (this.reconnect_interval === undefined) {
 					this.reconnect_interval = setInterval(() => {
-						this.listen(ontransaction, true)
+						this.listen(ontransaction, true, account, onbalance, onchange)
 					}, 10_000);
 				}
 			}
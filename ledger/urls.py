@@ -34,6 +34,8 @@ urlpatterns = [
 		path("events/", views.transaction_events, name="events"),
 		path("ping/", views.transaction_ping, name="ping"),
         path("qr/", views.deposit_qr, name="qr"),
+        path("snapshot/", views.main_snapshot, name="snapshot"),
+        path("changes/", views.ledger_changes, name="changes"),
         path("session/", views.set_session_var, name="session"),
 	], "api"))),
 ]
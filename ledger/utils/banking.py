@@ -1,8 +1,12 @@
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+from hashlib import sha1
 import re
 from ..conf import settings
-from typing import Optional
+from typing import Iterable, Optional
+
+from django.core.cache import cache
 
 import qrcode
 from qrcode.image.svg import SvgPathImage
@@ -112,15 +116,14 @@ class EPCCode:
 
     @property
     def qr_code(self) -> str:
-        qr = qrcode.QRCode(image_factory=CustomSvgPathImage)
-        qr.add_data(str(self))
-        svg = qr.make_image(
-            attrib={
-                'fill': 'currentColor',
-            },
-            module_drawer= SvgSquareDrawerNoNS(),
-            eye_drawer=SvgSquareDrawerNoNS())
-        return svg.to_string(encoding="unicode")
+        return render_qr_code(str(self))
+
+    @property
+    def digest(self) -> str:
+        """
+        Identifies the QR code, e.g. as ETag
+        """
+        return payload_digest(str(self))
     
     def __str__(self) -> str:
         if self.version == Version.nonEWR and not self.bic:
@@ -155,3 +158,44 @@ BCD
 {self.additionalInformation}"""
         return result.strip()
 
+
+def payload_digest(payload: str) -> str:
+    return sha1(payload.encode()).hexdigest()
+
+@lru_cache(maxsize=256)
+def render_qr_code(payload: str) -> str:
+    """
+    SVG of the QR code of `payload`.
+
+    Rendering is expensive, codes are kept in memory
+    and in the default cache (shared between processes, if configured so).
+    """
+    key = f'ledger:qr:{payload_digest(payload)}'
+    svg = cache.get(key)
+    if svg is None:
+        qr = qrcode.QRCode(image_factory=CustomSvgPathImage)
+        qr.add_data(payload)
+        svg = qr.make_image(
+            attrib={
+                'fill': 'currentColor',
+            },
+            module_drawer= SvgSquareDrawerNoNS(),
+            eye_drawer=SvgSquareDrawerNoNS())
+        svg = svg.to_string(encoding="unicode")
+        cache.set(key, svg, timeout=None)
+    return svg
+
+def precompute_qr_codes(names: Iterable[str]) -> int:
+    """
+    Renders the codes without amount for the given account names
+
+    Returns: number of codes
+    """
+    count = 0
+    for name in names:
+        code = EPCCode.from_config(name)
+        if code is None:
+            break
+        render_qr_code(str(code))
+        count += 1
+    return count
@@ -1,12 +1,37 @@
 from typing import Literal
 from django.utils.translation import gettext as _, pgettext
 from django.utils.formats import date_format
+from django.utils.timezone import now
 from ..models import Transaction, Account, Product, UserModel
 
 from django.core.exceptions import PermissionDenied
 
 from . import server_language
+from ..writer import serialized
 
+# Eventstream channels of transactions, see `transaction_channels()`
+TRANSACTION_CHANNEL = 'transaction'
+# Balance changes of all accounts
+BALANCE_CHANNEL = 'balance'
+# Changes to accounts, products and their groups, all listeners receive them
+CATALOG_CHANNEL = 'catalog'
+
+def account_channel(pk: int) -> str:
+    return f'{TRANSACTION_CHANNEL}:account:{pk}'
+
+def group_channel(pk: int) -> str:
+    return f'{TRANSACTION_CHANNEL}:group:{pk}'
+
+def transaction_channels(instance: Transaction) -> list[str]:
+    """
+    All channels `instance` is sent to: all transactions, those of its account and of its account group
+    """
+    channels = [TRANSACTION_CHANNEL, account_channel(instance.account_id)]
+    if instance.account.group_id is not None:
+        channels.append(group_channel(instance.account.group_id))
+    return channels
+
+@serialized
 def order_product(account: Account, product: Product, issuer: UserModel, amount=1, invert_member_status=False, extra_data={}) -> Transaction:
     if not isinstance(account, Account):
         raise TypeError(f'expected `account` to be Account, is {type(account)}')
@@ -53,6 +78,7 @@ def order_product(account: Account, product: Product, issuer: UserModel, amount=
         **extra_data
     )
 
+@serialized
 def custom_transaction(account: Account, amount: int, action: Literal['deposit', 'withdraw'], issuer: UserModel, reason="", extra_data={}) -> Transaction:
     if not isinstance(account, Account):
         raise TypeError(f'expected `account` to be Account, is {type(account)}')
@@ -93,6 +119,46 @@ def custom_transaction(account: Account, amount: int, action: Literal['deposit',
         **extra_data
     )
     
+def mark_timejumps(transactions: list[Transaction], filtered: bool = False) -> list[Transaction]:
+    """
+    Sets `timejump_before` and `timejump_after` on `transactions`, ordered newest first.
+
+    Indicating whether `Transaction.timejump_threshold` lies between a transaction and
+    - the next one, or now for the newest (`timejump_after`)
+    - the one before, or its `previous_timestamp` for the oldest (`timejump_before`)
+
+    If `transactions` is `filtered` (e.g. a single account), `previous_timestamp` may belong
+    to a transaction not in the list, so the oldest one has no `timejump_before`.
+    """
+    threshold = Transaction.timejump_threshold
+    next_timestamp = now()
+    for index, transaction in enumerate(transactions):
+        if index + 1 < len(transactions):
+            previous_timestamp = transactions[index + 1].timestamp
+        else:
+            previous_timestamp = transaction.previous_timestamp if not filtered else None
+        transaction.timejump_after = next_timestamp - transaction.timestamp > threshold
+        transaction.timejump_before = previous_timestamp is not None and transaction.timestamp - previous_timestamp > threshold
+        next_timestamp = transaction.timestamp
+    return transactions
+
+# Keys of transaction and balance events in the compact schema, see `COMPACT_KEYS` in `ts/transaction.ts`
+COMPACT_KEYS = {
+    'id': 'i',
+    'account': 'a',
+    'account_name': 'n',
+    'balance': 'b',
+    'amount': 'm',
+    'reason': 'r',
+    'related': 'l',
+    'idempotency_key': 'k',
+    'timejump_before': 'tb',
+    'timejump_after': 'ta',
+}
+
+def compact_event(data: dict) -> dict:
+    return {COMPACT_KEYS.get(key, key): value for key, value in data.items()}
+
 def transaction_event(instance: Transaction) -> dict:
     data = {
         "id": instance.pk,
@@ -111,9 +177,9 @@ def transaction_event(instance: Transaction) -> dict:
         data["idempotency_key"] = instance.idempotency_key
 
     # Test if timejump occured
-    previous_transaction: Transaction = Transaction.recent_objects.filter(timestamp__lt=instance.timestamp).order_by("-timestamp").first()
-    if previous_transaction and previous_transaction.timestamp < instance.timestamp - Transaction.timejump_threshold:
-        data['timejump_before'] = date_format(previous_transaction.timestamp, 'l, d. F Y H:i')
+    previous_timestamp = instance.previous_timestamp
+    if previous_timestamp is not None and previous_timestamp < instance.timestamp - Transaction.timejump_threshold:
+        data['timejump_before'] = date_format(previous_timestamp, 'l, d. F Y H:i')
         data['timejump_after'] = date_format(instance.timestamp, 'l, d. F Y H:i')
             
     return data
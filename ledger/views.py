@@ -12,44 +12,38 @@ from django.db.models.query import QuerySet, Q
 from django.http import HttpRequest, HttpResponse, JsonResponse, HttpResponseRedirect, HttpResponseBadRequest, FileResponse
 from django.shortcuts import render
 from django.urls import reverse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, condition
 from django.views.generic import ListView, UpdateView, CreateView, TemplateView
 from json import loads, dumps
 from django.shortcuts import get_object_or_404
 from django.utils.timezone import now
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag, urlencode
+from django.core.cache import cache
 from django.utils.translation import gettext as _, pgettext
 from django.core.paginator import Page, Paginator
 
 from .conf import settings
+from .context_processors import api_description, api_description_etag
+from . import caching
 from .decorators import idempotent
-from .eventstream import EventstreamResponse, StreamEvent
+from .eventstream import EventstreamResponse, StreamEvent, send_event, send_to_listener
 from .mixins import EnableFieldsMixin
-from .models import Account, Transaction, Product
+from .models import Account, Transaction, Product, LedgerChange
 from .forms import TransactionForm, ProductTransactionForm, RevertTransactionForm, CreateAccountForm, RestrictedCreateAccountForm, EditAccountForm, TransactionListFilter
 from .utils.banking import EPCCode
 from .utils import server_language
-from .utils.transaction import order_product, custom_transaction as custom_transaction_api, transaction_event
+from .utils.transaction import order_product, custom_transaction as custom_transaction_api, transaction_event, compact_event, mark_timejumps
+from .utils.transaction import TRANSACTION_CHANNEL, BALANCE_CHANNEL, CATALOG_CHANNEL, account_channel, group_channel
 
+# The description only changes with a deploy
+API_DESCRIPTION_MAX_AGE = 60 * 60 * 24
+
+@condition(etag_func=lambda request: api_description_etag())
 def get_api_description(request: HttpRequest):
-    api_description = {
-        'endpoints': {
-            name: reverse('ledger:api:' + name)
-            for name in [
-                'deposit',
-                'withdraw',
-                'order',
-                'revert',
-                'events',
-                'ping',
-                'qr',
-            ]
-        },
-        'config': {
-            'transaction_timeout': settings.TRANSACTION_TIMEOUT.total_seconds() * 1000,
-            'submit_overlay': settings.SUBMIT_OVERLAY.total_seconds() * 1000
-        },
-    }
-    return JsonResponse(api_description)
+    response = JsonResponse(api_description())
+    patch_cache_control(response, private=True, max_age=API_DESCRIPTION_MAX_AGE)
+    return response
 
 class AccountList(ListView):
     queryset = Account.objects.grouped()
@@ -88,14 +82,13 @@ class AccountDetail(EnableFieldsMixin, UpdateView):
             account_list = account_list.filter(active=True)
         kwargs |= {
             'account_list': account_list,
-            'transactions': Transaction.recent_objects\
+            'transactions': mark_timejumps(list(Transaction.recent_objects\
                 .filter(account=self.object)\
                 .exclude(type__in=[Transaction.TransactionType.REVERT_DEPOSIT, Transaction.TransactionType.REVERT_WITHDRAW])\
                 .order_by('-timestamp')\
-                .annotate_timejump()\
                 .annotate_revertible(user=self.request.user)\
-                .select_related('account'),
-            'banking_details': EPCCode.from_config(self.object.full_name or '[Name]'),
+                .select_related('account')), filtered=True),
+            'banking_details': EPCCode.from_config(self.object.qr_name),
         }
 
         if self.request.user.has_perm(PERMS[('deposit', self.object.permanent)]):
@@ -286,53 +279,118 @@ class TransactionList(PermissionRequiredMixin, ListView):
 
         return ImproperlyConfigured("No output format given")
 
+def recent_transactions(queryset: QuerySet[Transaction]) -> list[Transaction]:
+    """
+    Return all transactions newer than `old_threshold`.
+    If there are fewer than `min_results`, fill with transactions older than that
+    """
+    min_results = settings.TRANSACTION_HISTORY_MIN_ENTRIES
+    old_threshold = now() - settings.TRANSACTION_HISTORY_OLD_THRESHOLD
+    queryset = queryset\
+        .exclude(type__in=[Transaction.TransactionType.REVERT_DEPOSIT, Transaction.TransactionType.REVERT_WITHDRAW])\
+        .order_by('-timestamp')
+
+    transactions = []
+    for t in queryset[:100]:
+        t: Transaction
+        if len(transactions) < min_results:
+            transactions.append(t)
+        elif t.timestamp > old_threshold:
+            transactions.append(t)
+        else:
+            break
+    return transactions 
+
+def snapshot_version() -> str:
+    return caching.get_version(timeout=settings.SNAPSHOT_MAX_AGE.total_seconds())
+
+def snapshot_etag(category: str, version: str) -> str:
+    return quote_etag(f'{version}-{category}')
+
 class IndexView(TemplateView):
     template_name = "ledger/main.html"
 
     product_category = Product.ProductCategory.ARTICLE
 
     def get_transactions(self) -> list[Transaction]:
-        """
-        Return all transactions newer than `old_threshold`.
-        If there are fewer than `min_results`, fill with transactions older than that
-        """
-        min_results = settings.TRANSACTION_HISTORY_MIN_ENTRIES
-        old_threshold = now() - settings.TRANSACTION_HISTORY_OLD_THRESHOLD
-        queryset = Transaction.objects\
-            .exclude(type__in=[Transaction.TransactionType.REVERT_DEPOSIT, Transaction.TransactionType.REVERT_WITHDRAW])\
-            .order_by('-timestamp')\
-            .annotate_timejump()\
-            .annotate_revertible(user=self.request.user)\
-            .select_related('account')
-
-        transactions = []
-        for t in queryset[:100]:
-            t: Transaction
-            if len(transactions) < min_results:
-                transactions.append(t)
-            elif t.timestamp > old_threshold:
-                transactions.append(t)
-            else:
-                break
-        return transactions 
+        return mark_timejumps(recent_transactions(Transaction.objects
+            .annotate_revertible(user=self.request.user)
+            .select_related('account')))
 
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        # Taken before querying, changes while rendering make the page outdated
+        version = snapshot_version()
         return super().get_context_data(**kwargs) | {
             "account_list": Account.objects.filter(active=True).grouped(),
             "product_list": Product.objects.grouped().filter(category=self.product_category),
             "transaction_list": self.get_transactions(),
+            "snapshot_url": reverse('ledger:api:snapshot') + '?' + urlencode({'category': self.product_category}),
+            "snapshot_etag": snapshot_etag(self.product_category, version),
         }
 
+# Snapshots of outdated versions are dropped eventually
+SNAPSHOT_TIMEOUT = 60 * 60
+
+def snapshot_data(category: str) -> dict[str, Any]:
+    return {
+        'accounts': [{
+            'id': account.pk,
+            'name': account.display_name,
+            'group': account.group_id,
+            'member': account.member,
+            'credit': account.credit,
+            'balance': account.current_balance,
+        } for account in Account.objects.filter(active=True).grouped()],
+        'products': [{
+            'id': product.pk,
+            'name': product.display_name,
+            'group': product.group_id,
+            'cost': product.cost,
+            'member_cost': product.member_cost,
+        } for product in Product.objects.grouped().filter(category=category)],
+        'transactions': [{
+            'id': transaction.pk,
+            'account': transaction.account_id,
+            'amount': transaction.normalized_amount,
+            'reason': transaction.reason,
+            'timestamp': transaction.timestamp.isoformat(),
+            'related': transaction.related_transaction_id,
+        } for transaction in recent_transactions(Transaction.objects.all())],
+    }
+
+def main_snapshot(request: HttpRequest):
+    """
+    State of the main screen as JSON: accounts with balances, products and recent transactions.
+
+    Tagged with the ledger version, `If-None-Match` is answered with 304 if nothing changed.
+    """
+    category = request.GET.get('category', Product.ProductCategory.ARTICLE)
+    if category not in Product.ProductCategory.values:
+        return HttpResponseBadRequest()
+
+    version = snapshot_version()
+    etag = snapshot_etag(category, version)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        # Shared by all clients catching up on the same version
+        key = caching.snapshot_key(category, version)
+        content = cache.get(key)
+        if content is None:
+            content = dumps(snapshot_data(category))
+            cache.set(key, content, timeout=SNAPSHOT_TIMEOUT)
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 def test(request: HttpRequest):
     return render(request, "ledger/test.html", {
         "accounts": Account.objects.filter(active=True).grouped(),
         "products": Product.objects.grouped(),
-        "transactions": Transaction.objects\
+        "transactions": mark_timejumps(list(Transaction.objects\
                 .order_by('-timestamp')\
-                .annotate_timejump()\
                 .annotate_revertible(user=request.user)\
-                .select_related('account'),
-        'js_config': js_config(),
+                .select_related('account'))),
     })
 
 def test_event(request: HttpRequest):
@@ -444,26 +502,72 @@ def revert_transaction(request: HttpRequest, pk: int = None):
         return HttpResponseBadRequest(form.errors.as_ul())
 
 def transaction_events(request: HttpRequest):
+    """
+    Transactions as they are created.
+
+    Query parameters (optional):
+    - `account`: only transactions of this account, and the balances of all accounts
+      (when resuming, the current balance of every other account touched since `last_transaction`)
+    - `group`: only transactions of accounts in this group
+    - `schema`: `compact` for short keys, see `COMPACT_KEYS`
+    """
     initial_event = None
+    account = None
+    channel = [TRANSACTION_CHANNEL]
+    transactions = Transaction.objects.all()
+    try:
+        if account := request.GET.get('account'):
+            account = int(account)
+            channel = [account_channel(account), BALANCE_CHANNEL]
+            transactions = transactions.filter(account=account)
+        elif group := request.GET.get('group'):
+            group = int(group)
+            channel = [group_channel(group)]
+            transactions = transactions.filter(account__group=group)
+    except ValueError:
+        return HttpResponseBadRequest()
 
     latest_client_transaction_id = request.headers.get('Last-Event-ID', None) or request.GET.get('last_transaction', None)
     if latest_client_transaction_id:
         try:
             latest_client_transaction_id = int(latest_client_transaction_id)
             last_client_transaction: Transaction = Transaction.objects.get(pk=latest_client_transaction_id)
-            missing_transactions: list[Transaction] = Transaction.objects.order_by('-timestamp').filter(timestamp__gt=last_client_transaction.timestamp)
-            initial_event = [StreamEvent('create', dumps(transaction_event(transaction)), id=transaction.pk) for transaction in missing_transactions]
+            missing_transactions: list[Transaction] = transactions.order_by('-timestamp').filter(timestamp__gt=last_client_transaction.timestamp)
+            initial_event = []
+            for transaction in missing_transactions:
+                data = transaction_event(transaction)
+                initial_event.append(StreamEvent.from_data('create', data, id=transaction.pk, compact_data=compact_event(data)))
+            if account:
+                # Balances of the other accounts changed as well
+                # Annotated with their balance, instead of two queries per account
+                touched_accounts = Account.objects.grouped() \
+                    .filter(pk__in=Transaction.objects.filter(timestamp__gt=last_client_transaction.timestamp).values('account')) \
+                    .exclude(pk=account)
+                for touched_account in touched_accounts:
+                    balance = {'account': touched_account.pk, 'balance': touched_account.current_balance}
+                    initial_event.append(StreamEvent.from_data('balance', balance, compact_data=compact_event(balance)))
         except (ValueError, Transaction.DoesNotExist):
             pass
 
-    return EventstreamResponse(channel='transaction', identifier=f"{request.META['REMOTE_ADDR']}:{request.META['REMOTE_PORT']}", initial_event=initial_event)
+    return EventstreamResponse(
+        channel=[*channel, CATALOG_CHANNEL],
+        identifier=f"{request.META['REMOTE_ADDR']}:{request.META['REMOTE_PORT']}",
+        initial_event=initial_event,
+        compact=request.GET.get('schema') == 'compact',
+        accept_encoding=request.headers.get('Accept-Encoding'))
 
 def transaction_ping(request: HttpRequest):
     nonce = request.GET.get('nonce')
     if not nonce:
         return HttpResponseBadRequest()
     
-    send_event('transaction', 'ping', nonce)
+    listener = request.GET.get('listener')
+    if listener is None:
+        # Clients not knowing their listener id
+        send_event(TRANSACTION_CHANNEL, 'ping', nonce)
+    elif not send_to_listener(listener, 'ping', nonce):
+        # Connection is gone, the client should reconnect
+        raise http.Http404()
     return HttpResponse('ok')
 
 @require_POST
@@ -482,10 +586,55 @@ def set_session_var(request: HttpRequest):
 def deposit_qr(request: HttpRequest):
     pk = request.GET.get('account')
     account = get_object_or_404(Account, pk=pk)
-    code = EPCCode.from_config(name=account.full_name)
+    code = EPCCode.from_config(name=account.qr_name)
+    if code is None:
+        raise http.Http404()
     amount = float(request.GET.get('amount', '').replace(',', '.') or '0.0')
 
     if amount > 0:
         code.amount = f"EUR{amount:.2f}"
 
-    return HttpResponse(code.qr_code)
+    # Same payload, same code
+    etag = quote_etag(code.digest)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(code.qr_code, content_type='image/svg+xml')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+CHANGES_PAGE_SIZE = 500
+
+@permission_required('ledger.view_ledgerchange', raise_exception=True)
+def ledger_changes(request: HttpRequest):
+    """
+    Ledger changes in order, starting after the sequence number `after` (default: 0).
+
+    Returns at most `limit` changes and the `cursor` to continue with,
+    `more` tells whether further changes are available already.
+    Responds with 410 Gone if the change `after` was pruned, clients have to start over from a snapshot.
+
+    The cursor assumes changes commit in sequence order, see `LedgerChange`.
+    """
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = min(int(request.GET.get('limit', CHANGES_PAGE_SIZE)), CHANGES_PAGE_SIZE)
+    except ValueError:
+        return HttpResponseBadRequest()
+    if limit < 1:
+        return HttpResponseBadRequest()
+    if after and not LedgerChange.objects.filter(id=after).exists():
+        return HttpResponse(status=HTTPStatus.GONE)
+
+    changes = list(LedgerChange.objects
+        .filter(id__gt=after)
+        .order_by('id')
+        .values('id', 'timestamp', 'entity', 'object_id', 'operation', 'payload')
+        [:limit + 1])
+    more = len(changes) > limit
+    changes = changes[:limit]
+    return JsonResponse({
+        'changes': changes,
+        'cursor': changes[-1]['id'] if changes else after,
+        'more': more,
+    })
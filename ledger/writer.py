@@ -0,0 +1,104 @@
+"""
+Single writer for ledger mutations.
+
+SQLite allows only one write transaction at a time. Concurrent writers wait
+for the lock and fail with "database is locked" if they wait too long.
+With `WRITE_QUEUE`, functions decorated with `serialized` are instead queued
+and run by one writer thread, which commits up to `WRITE_BATCH_SIZE` of them
+in a single transaction (group commit). Each function runs in its own savepoint,
+so a failing function does not affect the others in its batch.
+Callers wait until their batch is committed.
+"""
+from collections.abc import Callable
+from concurrent.futures import Future
+from functools import wraps
+from queue import SimpleQueue, Empty
+from threading import Lock, Thread
+from typing import Any, NamedTuple
+import logging
+
+from django.db import connection, transaction
+
+from .conf import settings
+
+logger = logging.getLogger(__name__)
+
+class Job(NamedTuple):
+    future: Future
+    func: Callable
+    args: tuple
+    kwargs: dict
+
+_queue: SimpleQueue[Job] = SimpleQueue()
+_thread: Thread | None = None
+_thread_lock = Lock()
+
+def _run_batch(jobs: list[Job]):
+    results: list[tuple[Job, Any, BaseException | None]] = []
+    committed = False
+    def set_committed():
+        nonlocal committed
+        committed = True
+    try:
+        with transaction.atomic():
+            # Runs before all other commit hooks of the batch
+            transaction.on_commit(set_committed)
+            for job in jobs:
+                try:
+                    with transaction.atomic():
+                        results.append((job, job.func(*job.args, **job.kwargs), None))
+                except Exception as e:
+                    results.append((job, None, e))
+    except Exception as e:
+        if committed:
+            logger.exception("Commit hook of a batch of %d writes failed", len(jobs))
+        else:
+            # None of the writes happened
+            logger.exception("Failed to commit a batch of %d writes", len(jobs))
+            results = [(job, None, error or e) for job, _, error in results]
+            results += [(job, None, e) for job in jobs[len(results):]]
+
+    for job, result, error in results:
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+def _writer():
+    while True:
+        jobs = [_queue.get()]
+        while len(jobs) < settings.WRITE_BATCH_SIZE:
+            try:
+                jobs.append(_queue.get_nowait())
+            except Empty:
+                break
+        _run_batch(jobs)
+        connection.close_if_unusable_or_obsolete()
+
+def submit(func: Callable, *args, **kwargs) -> Future:
+    """
+    Queue `func(*args, **kwargs)` for the writer thread
+    """
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = Thread(target=_writer, name='ledger-writer', daemon=True)
+            _thread.start()
+    future = Future()
+    _queue.put(Job(future, func, args, kwargs))
+    return future
+
+def serialized(func: Callable) -> Callable:
+    """
+    Run `func` in the writer thread if `WRITE_QUEUE` is enabled,
+    returns its result or raises its exception.
+
+    Calls inside of a transaction run right away,
+    the writer would neither see nor wait for its uncommitted changes.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not settings.WRITE_QUEUE or connection.in_atomic_block:
+            return func(*args, **kwargs)
+        return submit(func, *args, **kwargs).result()
+    return wrapper
@@ -1,6 +1,8 @@
 
-from typing import Any, Iterable
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.signals import setting_changed
 from django.utils.module_loading import import_string
 
@@ -43,25 +45,29 @@ class AppSettings:
     namespace: str
     defaults: SettingsDict
     import_keys: set[str]
+    nullable_keys: set[str]
 
-    def __init__(self, namespace: str, defaults: SettingsDict, import_keys: Iterable[str] = None, connect_signal=True) -> None:
+    def __init__(self, namespace: str, defaults: SettingsDict, import_keys: Iterable[str] = None, nullable_keys: Iterable[str] = None, connect_signal=True) -> None:
         """
         Params:
         - `namespace` The name to search in django.conf.settings for app-specific settings
         - `defaults` List of valid settings and their default values. Only settings with UPPERCASE keys will be used
         - `import_keys` Setting names that are supposed to import something. Settings might be customized in the
           project/settings.py where no imports are allowed.
+        - `nullable_keys` Setting names that also accept `None`, besides the type of their default
         - `connect_signal` Connect to the `setting_changed` signal and reload settings
         """
         self.defaults = {key: value for key, value in defaults.items() if key.isupper()}
         self.namespace = namespace
         self.import_keys = set(import_keys or [])
+        self.nullable_keys = set(nullable_keys or [])
 
         if connect_signal:
             def signal_callback(*args, setting, **kwargs):
                 if setting == self.namespace:
                     self.reload()
-            setting_changed.connect(signal_callback)
+            # The callback is local to this instance, a weak reference would be collected immediately
+            setting_changed.connect(signal_callback, weak=False)
 
     @cached_property
     def settings(self) -> SettingsDict:
@@ -73,19 +79,62 @@ class AppSettings:
         except ImportError as e:
             raise ImportError(f"Failed to import '{value}' for setting '{attr}'. {e}")
 
-    def __getattr__(self, attr: str):
-        if attr not in self.defaults:
-            raise AttributeError(f"Invalid setting: '{attr}'")
-        
+    def _resolve(self, attr: str):
         value = self.settings.get(attr, self.defaults[attr])
 
         if attr in self.import_keys:
             if isinstance(value, str):
-                value = self._import_value(value)
+                value = self._import_value(value, attr)
             elif isinstance(value, (list, tuple)):
-                value = [self._import_value(v) for v in value]
+                value = [self._import_value(v, attr) for v in value]
         
         return value
+
+    def __getattr__(self, attr: str):
+        if attr not in self.defaults:
+            raise AttributeError(f"Invalid setting: '{attr}'")
+        
+        value = self._resolve(attr)
+        # Later lookups find the instance attribute and skip `__getattr__`
+        self.__dict__[attr] = value
+        return value
+
+    def _check_type(self, attr: str, value):
+        default = self.defaults[attr]
+        if default is None or attr in self.import_keys:
+            return
+        if value is None and attr in self.nullable_keys:
+            return
+        expected = type(default)
+        if expected is float:
+            expected = (int, float)
+        elif expected in (list, tuple):
+            expected = (list, tuple)
+        if not isinstance(value, expected) or (isinstance(value, bool) and not isinstance(default, bool)):
+            raise ImproperlyConfigured(
+                f"Setting {self.namespace}['{attr}'] must be of type '{type(default).__name__}', got '{type(value).__name__}'")
+
+    @cached_property
+    def snapshot(self) -> Mapping[str, Any]:
+        """
+        All settings, resolved and validated
+        """
+        unknown = set(self.settings) - set(self.defaults)
+        if unknown:
+            raise ImproperlyConfigured(f"Invalid settings in {self.namespace}: {', '.join(sorted(unknown))}")
+        values = {}
+        for attr in self.defaults:
+            values[attr] = getattr(self, attr)
+            self._check_type(attr, values[attr])
+        return MappingProxyType(values)
+
+    def validate(self) -> Mapping[str, Any]:
+        """
+        Resolves and checks all settings, raises `ImproperlyConfigured` for invalid ones.
+        Call this in `AppConfig.ready()` to fail at startup instead of at first use.
+        """
+        return self.snapshot
     
     def reload(self):
-        del self.settings
+        for key in ['settings', 'snapshot', *self.defaults]:
+            self.__dict__.pop(key, None)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class WikiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wiki'
+
+    def ready(self) -> None:
+        from . import signals
+        from .conf import settings
+        settings.validate()
+        return super().ready()
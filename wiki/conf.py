@@ -0,0 +1,20 @@
+from utils.settings import AppSettings
+
+from datetime import timedelta
+
+ATTACHMENT_STORE_ROOT = None
+# Contents stored more recently are not deleted with their last attachment, as an upload of them
+# might not be committed yet. They are left to `wiki_gc_attachments`
+ATTACHMENT_UPLOAD_GRACE = timedelta(hours=1)
+
+# Directory to cache resized image attachments in. `None` disables image derivatives
+IMAGE_DERIVATIVE_ROOT = None
+IMAGE_DERIVATIVE_WIDTHS = [480, 960, 1440, 1920]
+# Only formats supported by the installed Pillow are used
+IMAGE_DERIVATIVE_FORMATS = ['avif', 'webp']
+IMAGE_DERIVATIVE_QUALITY = 75
+IMAGE_DERIVATIVE_WORKERS = 2
+# How long a request waits for a derivative before the original is served instead
+IMAGE_DERIVATIVE_WAIT = timedelta(seconds=5)
+
+settings = AppSettings('WIKI', globals())
@@ -0,0 +1,145 @@
+"""
+Resized and recompressed variants ("derivatives") of image attachments.
+
+Derivatives are generated on first request in a background thread pool
+and cached on disk below `WIKI['IMAGE_DERIVATIVE_ROOT']`:
+```
+<root>/<attachment pk>/<width>.<format>
+```
+The cache of an attachment is dropped whenever it is saved or deleted (see `wiki.signals`).
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from io import BytesIO
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import BinaryIO, Callable
+import os
+import shutil
+
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError, features
+
+from .conf import settings
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+}
+
+# Images worth resizing. Vector graphics and animations are left alone
+RASTER_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp', 'avif', 'tif', 'tiff', 'bmp'}
+RASTER_FORMATS = {'jpeg', 'png', 'webp', 'avif', 'tiff', 'bmp', 'mpo'}
+
+def enabled() -> bool:
+    return bool(settings.IMAGE_DERIVATIVE_ROOT) and bool(supported_formats())
+
+def supported_formats() -> list[str]:
+    return [
+        format for format in settings.IMAGE_DERIVATIVE_FORMATS
+        if format in MIME_TYPES and format in features.modules and features.check_module(format)
+    ]
+
+def image_width(content: bytes | BinaryIO) -> int | None:
+    """
+    Width of the image in `content`, if it is a raster image.
+
+    Only the image header is parsed.
+    """
+    if isinstance(content, bytes):
+        content = BytesIO(content)
+    try:
+        with Image.open(content) as image:
+            width, height = image.size
+            if image.format.lower() not in RASTER_FORMATS:
+                return None
+            # Orientations 5 to 8 are rotated by 90°, swapping width and height
+            if image.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8):
+                return height
+            return width
+    except (UnidentifiedImageError, OSError):
+        return None
+
+def candidate_widths(width: int) -> list[int]:
+    """
+    Widths to offer for an image which is `width` pixels wide.
+    Images are never upscaled, the largest candidate is the image itself.
+    """
+    return [w for w in sorted(settings.IMAGE_DERIVATIVE_WIDTHS) if w < width] + [width]
+
+def cache_path(attachment_pk: int, width: int, format: str) -> Path:
+    return Path(settings.IMAGE_DERIVATIVE_ROOT) / str(attachment_pk) / f"{width}.{format}"
+
+def drop_cache(attachment_pk: int):
+    if settings.IMAGE_DERIVATIVE_ROOT:
+        shutil.rmtree(Path(settings.IMAGE_DERIVATIVE_ROOT) / str(attachment_pk), ignore_errors=True)
+
+def render(content: bytes, width: int, format: str, target: Path):
+    with Image.open(BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=target.parent, prefix='.render-', delete=False) as temporary:
+            try:
+                image.save(temporary, format=format, quality=settings.IMAGE_DERIVATIVE_QUALITY)
+            except:
+                os.unlink(temporary.name)
+                raise
+        os.replace(temporary.name, target)
+
+_executor: ThreadPoolExecutor | None = None
+_pending: dict[Path, Future] = {}
+_pending_lock = Lock()
+
+def _submit(content: bytes, width: int, format: str, target: Path) -> Future:
+    global _executor
+    with _pending_lock:
+        # Concurrent requests for the same derivative share one job
+        future = _pending.get(target)
+        if future is not None:
+            return future
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_DERIVATIVE_WORKERS, thread_name_prefix='wiki-derivatives')
+        future = _executor.submit(render, content, width, format, target)
+        _pending[target] = future
+
+    def done(_):
+        with _pending_lock:
+            _pending.pop(target, None)
+    future.add_done_callback(done)
+    return future
+
+def get_derivative(attachment_pk: int, load_content: Callable[[], bytes], width: int, format: str) -> Path | None:
+    """
+    Path of the cached derivative.
+
+    On a cache miss, `load_content()` is called for the original image and the
+    derivative is generated in the background. Returns `None` if it is not ready
+    within `IMAGE_DERIVATIVE_WAIT` or could not be generated.
+
+    Raises `ValueError` if `width` or `format` is not offered for this image.
+    """
+    if format not in supported_formats():
+        raise ValueError(f"Unsupported format '{format}'")
+
+    target = cache_path(attachment_pk, width, format)
+    if target.is_file():
+        return target
+
+    content = load_content()
+    original_width = image_width(content)
+    if original_width is None or width not in candidate_widths(original_width):
+        raise ValueError(f"No derivative of width {width}")
+
+    future = _submit(content, width, format, target)
+    try:
+        future.result(timeout=settings.IMAGE_DERIVATIVE_WAIT.total_seconds())
+    except TimeoutError:
+        return None
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    return target
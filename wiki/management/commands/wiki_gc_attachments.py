@@ -0,0 +1,41 @@
+from time import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...conf import settings
+from ...models import Attachment
+from ...storage import get_attachment_store
+
+class Command(BaseCommand):
+    help = "Delete contents from the attachment store which are no longer referenced by any attachment"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=int(settings.ATTACHMENT_UPLOAD_GRACE.total_seconds()),
+            help="Only delete files untouched for this many seconds. Protects uploads which are not yet committed. Default: WIKI['ATTACHMENT_UPLOAD_GRACE']")
+        parser.add_argument('--dry-run', action='store_true', help="Only list files which would be deleted")
+
+    def handle(self, *args, grace: int, dry_run: bool, **options):
+        store = get_attachment_store()
+        if store is None:
+            raise CommandError("WIKI['ATTACHMENT_STORE_ROOT'] is not set")
+
+        cutoff = time() - grace
+        referenced = set(Attachment.objects.exclude(digest='').values_list('digest', flat=True).distinct())
+
+        candidates = [store.path(digest) for digest in store.digests() if digest not in referenced]
+        candidates += list(store.temporary_files())
+
+        freed = deleted = 0
+        for path in candidates:
+            stat = path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if dry_run:
+                self.stdout.write(str(path))
+            else:
+                path.unlink(missing_ok=True)
+            freed += stat.st_size
+            deleted += 1
+
+        action = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{action} {deleted} files ({freed} bytes)"))
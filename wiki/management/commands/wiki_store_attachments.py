@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Attachment
+from ...storage import get_attachment_store
+
+class Command(BaseCommand):
+    help = "Move attachment contents from the database into the attachment store (or back with --reverse)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reverse', action='store_true', help="Move contents from the attachment store back into the database")
+
+    def handle(self, *args, reverse: bool, **options):
+        store = get_attachment_store()
+        if store is None:
+            raise CommandError("WIKI['ATTACHMENT_STORE_ROOT'] is not set")
+
+        moved = 0
+        if reverse:
+            rows = Attachment.objects.exclude(digest='').values_list('pk', 'digest')
+            for pk, digest in rows.iterator():
+                content = store.path(digest).read_bytes()
+                Attachment.objects.filter(pk=pk).update(content=content, digest='')
+                moved += 1
+        else:
+            # values_list() skips Attachment.from_db() and loads one row at a time
+            rows = Attachment.objects.filter(digest='').values_list('pk', 'content')
+            for pk, content in rows.iterator(chunk_size=1):
+                digest = store.put(content.read())
+                Attachment.objects.filter(pk=pk).update(content=b'', digest=digest)
+                moved += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} attachments"))
@@ -1,9 +1,12 @@
 
+from typing import Callable
 from markdown import markdown
+import re
 
 from .base_path import BasePath
 from .admonition import IconAdmonition
 from .adaptive_image import AdaptiveImages
+from .. import derivatives
 
 from pymdownx.emoji import to_alt
 
@@ -13,7 +16,11 @@ from html.parser import HTMLParser
 from django.urls import reverse
 from django.utils.translation import pgettext
 
-def render_markdown(content: str, image_base_path='') -> str:
+def render_markdown(content: str, image_base_path='', image_width: Callable[[str], int | None] = None) -> str:
+    """
+    `image_width` returns the width of a local image (by url path) or `None`.
+    If given, image derivatives are offered for these images.
+    """
     link_base_path = reverse('wiki:main')
     return markdown(content, extensions=[
             BasePath(img_path=image_base_path, link_path=link_base_path),
@@ -44,7 +51,11 @@ def render_markdown(content: str, image_base_path='') -> str:
                     'alias': ['danger'],
                 },
             }),
-            AdaptiveImages(),
+            AdaptiveImages(
+                image_width=image_width,
+                derivative_formats={format: derivatives.MIME_TYPES[format] for format in derivatives.supported_formats()},
+                derivative_widths=derivatives.candidate_widths,
+            ),
             'pymdownx.superfences',
             'pymdownx.highlight',
             'pymdownx.saneheaders',
@@ -83,6 +94,36 @@ def render_markdown(content: str, image_base_path='') -> str:
             }
         })
 
+# RegEx Explaination:
+# each checkbox line must:
+# - start with any number of whitespace (space or tab) '[ \t]*'
+# - A list item '[*+-]'
+# - Followed by at least one space '[ \t]+'
+# - Followed by a valid checkbox '\[([ xX])\]'
+#   - A valid checkbox is one of '[ ]', '[x]', '[X]'
+#   - We capture the string inside the square brackets for use later
+# - Followed by at least a space (space or tab) '[ \t]' (We dont need any more, so one does fine)
+TASK_ITEM_PATTERN = re.compile(r'^[ \t]*[*+-][ \t]+\[([ xX])\][ \t]', re.MULTILINE)
+TASK_ITEM_HTML_PATTERN = re.compile(r'<input type="checkbox" disabled( checked)?/>')
+
+def task_html(checked: bool) -> str:
+    return f'<input type="checkbox" disabled{" checked" if checked else ""}/>'
+
+def task_items(content: str, html: str) -> list[tuple[int, int]] | None:
+    """
+    Offsets of all task items as `(content offset, html offset)`.
+    The content offset points at the character inside the square brackets,
+    the html offset at the start of the `<input>` tag.
+
+    Returns `None` if the task items in `content` and `html` do not line up
+    (e.g. task items inside code blocks).
+    """
+    content_offsets = [match.start(1) for match in TASK_ITEM_PATTERN.finditer(content)]
+    html_offsets = [match.start() for match in TASK_ITEM_HTML_PATTERN.finditer(html)]
+    if len(content_offsets) != len(html_offsets):
+        return None
+    return list(zip(content_offsets, html_offsets))
+
 class AnalyzeMarkdownParser(HTMLParser):
     HEADINGS = tuple(f'h{level}' for level in range(1, 7))
 
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Callable
 from xml.etree.ElementTree import Element, SubElement
 from markdown.core import Markdown
 from markdown.extensions import Extension
@@ -7,10 +7,13 @@ from markdown.treeprocessors import Treeprocessor
 from urllib.parse import urlparse, urljoin
 
 class AdaptiveImages(Extension):
-    def __init__(self, light_suffix: str = '-light', dark_suffix: str = '-dark', **kwargs: Any) -> None:
+    def __init__(self, light_suffix: str = '-light', dark_suffix: str = '-dark', image_width: Callable[[str], int | None] = None, derivative_formats: dict[str, str] = None, derivative_widths: Callable[[int], list[int]] = None, **kwargs: Any) -> None:
         self.config = {
             'light_suffix': [light_suffix, 'The suffix to use for light-mode images. Default: "-light"'],
             'dark_suffix': [dark_suffix, 'The suffix to use for dark-mode images. Default: "-dark"'],
+            'image_width': [image_width, 'Callable returning the width of a local image (by url path) or None. Enables srcset if set. Default: None'],
+            'derivative_formats': [derivative_formats or {}, 'Mapping of derivative file extension to mime type offered in srcset. Default: {}'],
+            'derivative_widths': [derivative_widths, 'Callable returning the srcset widths for an image of the given width. Default: None'],
         }
 
         super().__init__(**kwargs)
@@ -19,46 +22,87 @@ class AdaptiveImages(Extension):
         config = self.getConfigs()
         md.treeprocessors.register(AdaptiveImageTreeprocessor(
             light_suffix=config['light_suffix'],
-            dark_suffix=config['dark_suffix']), 'adaptive-image', 14)
-        
+            dark_suffix=config['dark_suffix'],
+            image_width=config['image_width'],
+            derivative_formats=config['derivative_formats'],
+            derivative_widths=config['derivative_widths']), 'adaptive-image', 14)
+
 class AdaptiveImageTreeprocessor(Treeprocessor):
+    """
+    Turns local images into `<picture>` elements.
+
+    Images with the url fragment `#adaptive` get a source for the opposite color scheme.
+    If `image_width` is given, images with a known width get sources for
+    each derivative format, available at `<image url>/<width>.<format>`.
+    """
     light_suffix: str
     dark_suffix: str
+    image_width: Callable[[str], int | None] | None
+    derivative_formats: dict[str, str]
+    derivative_widths: Callable[[int], list[int]] | None
 
-    def __init__(self, light_suffix: str, dark_suffix: str, **kwargs) -> None:
+    def __init__(self, light_suffix: str, dark_suffix: str, image_width: Callable[[str], int | None] = None, derivative_formats: dict[str, str] = None, derivative_widths: Callable[[int], list[int]] = None, **kwargs) -> None:
         self.light_suffix = light_suffix
         self.dark_suffix = dark_suffix
+        self.image_width = image_width
+        self.derivative_formats = derivative_formats or {}
+        self.derivative_widths = derivative_widths
         super().__init__(**kwargs)
 
+    def add_derivatives(self, sources: Element, path: str, attrib: dict[str, str] = {}):
+        if not (self.image_width and self.derivative_widths and self.derivative_formats):
+            return
+        width = self.image_width(path)
+        if width is None:
+            return
+
+        widths = self.derivative_widths(width)
+        for extension, mime_type in self.derivative_formats.items():
+            SubElement(sources, 'source', attrib | {
+                'type': mime_type,
+                'srcset': ', '.join(f'{path}/{w}.{extension} {w}w' for w in widths),
+                # Keep the natural size of the image, but never wider than the viewport
+                'sizes': f'min(100vw, {width}px)',
+            })
+
     def run(self, root: Element) -> Element | None:
         # list() because modifying tree during iter is undefined behavior
         for element in list(root.iter('img')):
             url = urlparse(element.attrib['src'])
             if url.netloc: continue
-            if url.fragment not in ('adaptive',): continue
-
-            # './asd/filename.png' -> ['.', 'asd', 'filename.png'][-1] -> ['filename', 'png'][0]
-            filename, extension = url.path.rsplit('/', 1)[-1].rsplit('.', 1)
-            light_mode = not filename.endswith(self.dark_suffix)
-            
-            if light_mode:
-                new_filename = filename.removesuffix(self.light_suffix) + self.dark_suffix
-            else:
-                new_filename = filename.removesuffix(self.dark_suffix) + self.light_suffix
-            new_filename += '.' + extension
-            new_url = url._replace(fragment="", path=urljoin(url.path, new_filename)).geturl()
+            adaptive = url.fragment == 'adaptive'
+            if not adaptive and not self.image_width: continue
 
-            element.tag = 'picture'
-            SubElement(element, 'source', {
-                'srcset': new_url,
-                'media': f'(prefers-color-scheme: {"dark" if light_mode else "light"})',
-            })
-            SubElement(element, 'img', element.attrib | {
-                'src': url._replace(fragment="").geturl(),
-            })
-            element.attrib.clear()
-            
+            src = url._replace(fragment="").geturl()
+            sources = Element('sources')
+
+            if adaptive:
+                # './asd/filename.png' -> ['.', 'asd', 'filename.png'][-1] -> ['filename', 'png'][0]
+                filename, extension = url.path.rsplit('/', 1)[-1].rsplit('.', 1)
+                light_mode = not filename.endswith(self.dark_suffix)
 
+                if light_mode:
+                    new_filename = filename.removesuffix(self.light_suffix) + self.dark_suffix
+                else:
+                    new_filename = filename.removesuffix(self.dark_suffix) + self.light_suffix
+                new_filename += '.' + extension
+                new_url = url._replace(fragment="", path=urljoin(url.path, new_filename)).geturl()
+                media = f'(prefers-color-scheme: {"dark" if light_mode else "light"})'
 
-            
+                self.add_derivatives(sources, new_url, {'media': media})
+                SubElement(sources, 'source', {
+                    'srcset': new_url,
+                    'media': media,
+                })
 
+            self.add_derivatives(sources, src)
+            if not len(sources):
+                continue
+
+            element.tag = 'picture'
+            img_attrib = element.attrib | {
+                'src': src,
+            }
+            element.attrib.clear()
+            element.extend(sources)
+            SubElement(element, 'img', img_attrib)
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:05
+
+import wiki.modelfield
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='digest',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='SHA-256 of the content if it is kept in the attachment store', max_length=64, verbose_name='digest'),
+        ),
+        migrations.AlterField(
+            model_name='attachment',
+            name='content',
+            field=wiki.modelfield.BinaryFileField(default=b'', digest_field='digest', verbose_name='content'),
+        ),
+    ]
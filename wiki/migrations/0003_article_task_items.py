@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki', '0002_attachment_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='task_items',
+            field=models.JSONField(default=None, editable=False, null=True),
+        ),
+    ]
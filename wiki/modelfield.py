@@ -1,3 +1,4 @@
+from pathlib import Path
 from django.db.models import BinaryField
 from django.core.files.base import ContentFile, File
 from django import forms
@@ -9,10 +10,51 @@ class BinaryFile(ContentFile):
 
     def __str__(self) -> str:
         return self.name or self.url or ''
- 
+
+class StoredFile(File):
+    """
+    File kept in a `wiki.storage.ContentStore`.
+
+    The file is only opened once its content is accessed.
+    """
+    def __init__(self, path: Path, digest: str, url: str = None) -> None:
+        self._file = None
+        self.path = Path(path)
+        self.digest = digest
+        super().__init__(None, url)
+        self.url = url
+
+    @property
+    def file(self):
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        return self._file
+
+    @file.setter
+    def file(self, value):
+        self._file = value
+
+    @property
+    def size(self) -> int:
+        return self.path.stat().st_size
+
+    def __str__(self) -> str:
+        return self.name or self.url or ''
+
+    def __bool__(self) -> bool:
+        return True
+
 class BinaryFileField(BinaryField):
-    def __init__(self, *args, **kwargs) -> None:
+    """
+    Binary field accepting files.
+
+    If `digest_field` is given and an attachment store is configured (`WIKI['ATTACHMENT_STORE_ROOT']`),
+    the content is written to the store instead of the database row.
+    The row then only keeps the content digest in `digest_field`.
+    """
+    def __init__(self, *args, digest_field: str = None, **kwargs) -> None:
         kwargs.setdefault('editable', True)
+        self.digest_field = digest_field
         super().__init__(*args, **kwargs)
 
     def deconstruct(self):
@@ -21,16 +63,40 @@ class BinaryFileField(BinaryField):
             kwargs["editable"] = False
         else:
             del kwargs["editable"]
+        if self.digest_field:
+            kwargs["digest_field"] = self.digest_field
         return name, path, args, kwargs
 
+    def pre_save(self, model_instance, add):
+        value = super().pre_save(model_instance, add)
+        if not self.digest_field:
+            return value
+
+        from .storage import get_attachment_store
+        store = get_attachment_store()
+        if store is None:
+            if isinstance(value, StoredFile):
+                # Content lives in the store, keep referencing it
+                return b''
+            setattr(model_instance, self.digest_field, '')
+            return value
+
+        if isinstance(value, StoredFile):
+            # Unchanged content, no need to hash it again
+            digest = value.digest
+        else:
+            digest = store.put(value)
+        setattr(model_instance, self.digest_field, digest)
+        return b''
+
     def get_prep_value(self, value):
         if isinstance(value, File):
             value = value.read()
         return value
-    
+
     def from_db_value(self, value, expression, connection):
         return BinaryFile(value)
-    
+
     def formfield(self, **kwargs):
         defaults = {
             'form_class': forms.FileField,
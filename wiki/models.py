@@ -4,9 +4,14 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from django.urls import reverse, NoReverseMatch
+from django.core.exceptions import ImproperlyConfigured
+from urllib.parse import unquote
+from itertools import islice
 
-from .markdown import render_markdown, AnalyzeMarkdownParser
-from .modelfield import BinaryFileField, File
+from .markdown import render_markdown, AnalyzeMarkdownParser, task_items, task_html, TASK_ITEM_PATTERN, TASK_ITEM_HTML_PATTERN
+from .modelfield import BinaryFileField, File, StoredFile
+from .storage import get_attachment_store
+from . import derivatives
 
 # Create your models here.
 
@@ -25,8 +30,14 @@ class Article(models.Model):
 
     _content_modified: bool
 
+    ATTACHMENT_PATH = 'files/'
+
     content_title = models.CharField(max_length=255, editable=False)
     content_html = models.TextField(editable=False)
+    # [(offset in raw_content, offset in content_html)] of each task item, None if unknown
+    task_items = models.JSONField(null=True, default=None, editable=False)
+    # Incremented on each content change, used to detect concurrent modifications
+    revision = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = _("Article")
@@ -67,6 +78,10 @@ class Article(models.Model):
         if "raw_content" in update_fields and self._content_modified:
             update_fields |= self.render_markdown()
 
+        if "raw_content" in update_fields:
+            self.revision += 1
+            update_fields.add('revision')
+
         if not self.slug:
             self.slug = slugify(self.title)
             update_fields.add('slug')
@@ -80,9 +95,12 @@ class Article(models.Model):
         """
         Returns: Set of modified fields
         """
-        self.content_html = render_markdown(self.content, image_base_path='files/')
+        image_width = self.attachment_image_width if self.pk and derivatives.enabled() else None
+        self.content_html = render_markdown(self.content, image_base_path=self.ATTACHMENT_PATH, image_width=image_width)
         self._content_modified = False
 
+        self.task_items = task_items(self.content, self.content_html)
+
         parser = AnalyzeMarkdownParser()
         parser.feed(self.content_html)
 
@@ -99,7 +117,77 @@ class Article(models.Model):
         if not self.content_title:
             self.content_title = parser.title[:MAX_TITLE_LENGTH]
 
-        return {'content_html', 'content_title'}
+        return {'content_html', 'content_title', 'task_items'}
+
+    def set_task_item(self, index: int, checked: bool) -> set[str]:
+        """
+        Check or uncheck the task item `index`.
+
+        Uses the task item offsets to patch `raw_content` and `content_html` in place.
+        Only renders the markdown again if the offsets are unknown.
+
+        Raises `IndexError` if there is no such task item.
+        Returns: Set of modified fields
+        """
+        if self.task_items is None:
+            # Offsets unknown, do it the slow way
+            match = next(islice(TASK_ITEM_PATTERN.finditer(self.content), index, None), None) if index >= 0 else None
+            if match is None:
+                raise IndexError(index)
+            if (match.group(1) != ' ') == checked:
+                return set()
+            self.content = self.content[:match.start(1)] + ('x' if checked else ' ') + self.content[match.end(1):]
+            return {'raw_content'} | self.render_markdown()
+
+        if not 0 <= index < len(self.task_items):
+            raise IndexError(index)
+        content_offset, html_offset = self.task_items[index]
+        if (self.raw_content[content_offset] != ' ') == checked:
+            return set()
+
+        old_html = TASK_ITEM_HTML_PATTERN.match(self.content_html, html_offset).group()
+        new_html = task_html(checked)
+        self.raw_content = self.raw_content[:content_offset] + ('x' if checked else ' ') + self.raw_content[content_offset + 1:]
+        self.content_html = self.content_html[:html_offset] + new_html + self.content_html[html_offset + len(old_html):]
+
+        # Following task items moved in the html
+        shift = len(new_html) - len(old_html)
+        self.task_items = self.task_items[:index + 1] + [
+            (content_offset, html_offset + shift) for content_offset, html_offset in self.task_items[index + 1:]
+        ]
+        return {'raw_content', 'content_html', 'task_items'}
+
+    def save_if_unchanged(self, update_fields: set[str]) -> bool:
+        """
+        Save `update_fields`, but only if the article was not modified since it was loaded.
+
+        Returns: Whether the article was saved
+        """
+        updated = type(self)._default_manager.filter(pk=self.pk, revision=self.revision).update(
+            revision=models.F('revision') + 1,
+            **{field: getattr(self, field) for field in update_fields},
+        )
+        if updated:
+            self.revision += 1
+        return bool(updated)
+
+    def attachment_image_width(self, path: str) -> int | None:
+        """
+        Width of the attached image at url `path` (relative to the article), if any
+        """
+        if not path.startswith(self.ATTACHMENT_PATH):
+            return None
+        name = unquote(path.removeprefix(self.ATTACHMENT_PATH))
+        if '/' in name or name.rsplit('.', 1)[-1].lower() not in derivatives.RASTER_EXTENSIONS:
+            return None
+
+        attachment = self.attachment_set.filter(name=name).first()
+        if attachment is None:
+            return None
+        try:
+            return derivatives.image_width(attachment.content)
+        finally:
+            attachment.content.close()
     
     def get_absolute_url(self):
         if not self.slug:
@@ -109,8 +197,9 @@ class Article(models.Model):
 class Attachment(models.Model):
     article = models.ForeignKey(Article, verbose_name=_('article'), on_delete=models.CASCADE)
     name = models.CharField(verbose_name=_('name'), max_length=50, blank=True)
-    content = BinaryFileField(verbose_name=_('content'), default=b'')
+    content = BinaryFileField(verbose_name=_('content'), default=b'', digest_field='digest')
     content: File
+    digest = models.CharField(verbose_name=_('digest'), max_length=64, default='', blank=True, editable=False, db_index=True, help_text=_("SHA-256 of the content if it is kept in the attachment store"))
 
     class Meta:
         verbose_name = _("Attachment")
@@ -124,7 +213,13 @@ class Attachment(models.Model):
     def from_db(cls: type[Self], db: str | None, field_names: Collection[str], values: Collection[Any]) -> Self:
         instance = super().from_db(db, field_names, values)
 
-        if instance.content is not models.DEFERRED:
+        if 'digest' in field_names and instance.digest and 'content' in field_names:
+            store = get_attachment_store()
+            if store is None:
+                raise ImproperlyConfigured(f"Attachment '{instance.pk}' is kept in the attachment store, but WIKI['ATTACHMENT_STORE_ROOT'] is not set")
+            instance.content = StoredFile(store.path(instance.digest), digest=instance.digest)
+
+        if 'content' in field_names:
             try:
                 instance.content.url = reverse('wiki:article_attachment', kwargs={
                     'slug': instance.article.slug,
@@ -138,4 +233,7 @@ class Attachment(models.Model):
         if not self.name:
             self.name = self.content.name
 
+        if "update_fields" in kwargs and "content" in kwargs["update_fields"]:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "digest"}
+
         super().save(**kwargs)
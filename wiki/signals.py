@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .conf import settings
+from .models import Attachment
+from .storage import get_attachment_store
+from . import derivatives
+
+@receiver(post_delete, sender=Attachment)
+def release_attachment_content(instance: Attachment, **_):
+	digest = instance.__dict__.get('digest')
+	store = get_attachment_store()
+	if not digest or store is None:
+		return
+
+	def release():
+		# Other attachments might still share the same content.
+		# Uploads which are not committed yet are not visible here, `delete` spares their content
+		if not Attachment.objects.filter(digest=digest).exists():
+			store.delete(digest, grace=settings.ATTACHMENT_UPLOAD_GRACE)
+
+	transaction.on_commit(release)
+
+@receiver(post_save, sender=Attachment)
+@receiver(post_delete, sender=Attachment)
+def drop_attachment_derivatives(instance: Attachment, **_):
+	derivatives.drop_cache(instance.pk)
@@ -0,0 +1,124 @@
+"""
+Content-addressed storage for attachment contents.
+
+Contents are stored once per SHA-256 digest below `WIKI['ATTACHMENT_STORE_ROOT']`,
+sharded by the first two characters of the digest:
+```
+<root>/3a/3a7bd3e2360a3d29eea436fcfb7e44c735d117c42d1c1835420b6b9942dd4f1b
+```
+Identical uploads therefore share one file on disk.
+
+Files are not owned by a single row. A file is referenced by every `Attachment` with its digest
+and may only be removed once that reference count drops to zero (see `wiki.signals` and
+the `wiki_gc_attachments` management command).
+"""
+
+from datetime import timedelta
+from hashlib import sha256
+from pathlib import Path
+from tempfile import NamedTemporaryFile, mkstemp
+from time import time
+from typing import Iterator
+import os
+
+from django.core.files.base import File
+
+from .conf import settings
+
+TEMPORARY_PREFIX = '.upload-'
+
+class ContentStore:
+    root: Path
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).is_file()
+
+    def put(self, content: bytes | File) -> str:
+        """
+        Store `content` and return its hex digest.
+
+        If the content is already present, the existing file is kept
+        and only its modification time is refreshed.
+        """
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            chunks = [bytes(content)]
+        else:
+            chunks = content.chunks()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        digest = sha256()
+        with NamedTemporaryFile(dir=self.root, prefix=TEMPORARY_PREFIX, delete=False) as temporary:
+            try:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    temporary.write(chunk)
+            except:
+                os.unlink(temporary.name)
+                raise
+
+        key = digest.hexdigest()
+        target = self.path(key)
+        try:
+            # Mark as recently used, so `delete` and garbage collection spare it
+            os.utime(target)
+        except FileNotFoundError:
+            target.parent.mkdir(exist_ok=True)
+            os.replace(temporary.name, target)
+        else:
+            os.unlink(temporary.name)
+        return key
+
+    def delete(self, digest: str, grace: timedelta = timedelta(0)) -> bool:
+        """
+        Delete the content of `digest` unless it was stored or refreshed by `put` within `grace`,
+        an upload of it might not be committed yet. Returns whether it was deleted.
+        """
+        path = self.path(digest)
+        self.root.mkdir(parents=True, exist_ok=True)
+        handle, moved = mkstemp(dir=self.root, prefix=TEMPORARY_PREFIX)
+        os.close(handle)
+        # Moved out of place first, a concurrent `put` then either refreshed it before or stores it anew
+        try:
+            os.replace(path, moved)
+        except FileNotFoundError:
+            os.unlink(moved)
+            return False
+        if time() - os.stat(moved).st_mtime < grace.total_seconds():
+            os.replace(moved, path)
+            return False
+        os.unlink(moved)
+        return True
+
+    def digests(self) -> Iterator[str]:
+        """
+        All digests currently present in the store
+        """
+        if not self.root.is_dir():
+            return
+        for shard in self.root.iterdir():
+            if not shard.is_dir():
+                continue
+            for path in shard.iterdir():
+                if path.is_file():
+                    yield path.name
+
+    def temporary_files(self) -> Iterator[Path]:
+        """
+        Leftovers of interrupted uploads
+        """
+        if not self.root.is_dir():
+            return
+        yield from self.root.glob(f'{TEMPORARY_PREFIX}*')
+
+def get_attachment_store() -> ContentStore | None:
+    """
+    The configured attachment store, or `None` if attachments are kept in the database
+    """
+    root = settings.ATTACHMENT_STORE_ROOT
+    return ContentStore(root) if root else None
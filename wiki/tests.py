@@ -1,3 +1,168 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.urls import reverse
+from tempfile import TemporaryDirectory
+from io import StringIO, BytesIO
+from datetime import timedelta
+import os
+from PIL import Image
+
+from .models import Article, Attachment
+from .storage import get_attachment_store
 
 # Create your tests here.
+
+class AttachmentStoreTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        self.article1 = Article.objects.create(slug='one', raw_content='# One')
+        self.article2 = Article.objects.create(slug='two', raw_content='# Two')
+
+    def store_settings(self, **kwargs):
+        return override_settings(WIKI={'ATTACHMENT_STORE_ROOT': self.directory.name, **kwargs})
+
+    def test_database(self):
+        """
+        Without a configured store, contents stay in the database row
+        """
+        attachment = Attachment.objects.create(article=self.article1, content=SimpleUploadedFile('a.txt', b'hello'))
+        attachment = Attachment.objects.get(pk=attachment.pk)
+        self.assertEqual(attachment.digest, '')
+        self.assertEqual(attachment.content.read(), b'hello')
+
+    def test_deduplicate(self):
+        """
+        Identical contents are stored once and removed with their last reference
+        """
+        with self.store_settings(ATTACHMENT_UPLOAD_GRACE=timedelta(0)):
+            store = get_attachment_store()
+            a = Attachment.objects.create(article=self.article1, content=SimpleUploadedFile('a.txt', b'hello'))
+            b = Attachment.objects.create(article=self.article2, content=SimpleUploadedFile('b.txt', b'hello'))
+            self.assertEqual(a.digest, b.digest)
+            self.assertEqual(list(store.digests()), [a.digest])
+
+            loaded = Attachment.objects.get(pk=a.pk)
+            self.assertEqual(loaded.content.read(), b'hello')
+            loaded.content.close()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                a.delete()
+            self.assertTrue(store.exists(b.digest))
+            with self.captureOnCommitCallbacks(execute=True):
+                b.delete()
+            self.assertFalse(store.exists(b.digest))
+
+    def test_pending_upload(self):
+        """
+        Recently stored contents are kept, an upload of the same content might not be committed yet
+        """
+        with self.store_settings():
+            store = get_attachment_store()
+            attachment = Attachment.objects.create(article=self.article1, content=SimpleUploadedFile('a.txt', b'hello'))
+            with self.captureOnCommitCallbacks(execute=True):
+                attachment.delete()
+            self.assertTrue(store.exists(attachment.digest))
+
+            os.utime(store.path(attachment.digest), (0, 0))
+            # Deleted once untouched for longer than the grace period
+            self.assertTrue(store.delete(attachment.digest, grace=timedelta(hours=1)))
+            self.assertFalse(store.exists(attachment.digest))
+            self.assertEqual(list(store.temporary_files()), [])
+
+    def test_migrate(self):
+        """
+        Existing rows can be moved into the store and back
+        """
+        attachment = Attachment.objects.create(article=self.article1, content=SimpleUploadedFile('a.txt', b'hello'))
+        with self.store_settings():
+            call_command('wiki_store_attachments', stdout=StringIO())
+            attachment = Attachment.objects.get(pk=attachment.pk)
+            self.assertNotEqual(attachment.digest, '')
+            self.assertEqual(attachment.content.read(), b'hello')
+            attachment.content.close()
+
+            call_command('wiki_store_attachments', reverse=True, stdout=StringIO())
+            call_command('wiki_gc_attachments', grace=0, stdout=StringIO())
+            self.assertEqual(list(get_attachment_store().digests()), [])
+
+        attachment = Attachment.objects.get(pk=attachment.pk)
+        self.assertEqual(attachment.digest, '')
+        self.assertEqual(attachment.content.read(), b'hello')
+
+class ImageDerivativeTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(WIKI={'IMAGE_DERIVATIVE_ROOT': self.directory.name, 'IMAGE_DERIVATIVE_FORMATS': ['webp'], 'IMAGE_DERIVATIVE_WIDTHS': [480]})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        image = BytesIO()
+        Image.new('RGB', (1000, 500), 'red').save(image, format='png')
+
+        self.article = Article.objects.create(slug='images', raw_content='# Images')
+        Attachment.objects.create(article=self.article, name='photo.png', content=SimpleUploadedFile('photo.png', image.getvalue()))
+        self.article.content = '![Photo](photo.png)'
+        self.article.save()
+
+        self.client.force_login(User.objects.create_user(username='test'))
+
+    def test_srcset(self):
+        self.assertIn('srcset="files/photo.png/480.webp 480w, files/photo.png/1000.webp 1000w"', self.article.content_html)
+        self.assertIn('<img alt="Photo" src="files/photo.png" />', self.article.content_html)
+
+    def test_derivative(self):
+        response = self.client.get(reverse('wiki:article_attachment_derivative', kwargs={'slug': 'images', 'name': 'photo.png', 'width': 480, 'format': 'webp'}))
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (480, 240))
+
+        # Upscaling is not offered
+        response = self.client.get(reverse('wiki:article_attachment_derivative', kwargs={'slug': 'images', 'name': 'photo.png', 'width': 2000, 'format': 'webp'}))
+        self.assertEqual(response.status_code, 404)
+
+class TaskItemTest(TestCase):
+    CONTENT = '# Shopping\n\n- [ ] Milk\n- [x] Eggs\n- [ ] Flour\n'
+
+    def setUp(self) -> None:
+        self.article = Article.objects.create(slug='shopping', raw_content='# Shopping')
+        self.article.content = self.CONTENT
+        self.article.save()
+        self.client.force_login(User.objects.create_user(username='test'))
+
+    def toggle(self, index: int, value: bool):
+        return self.client.post(f'/wiki/{self.article.slug}/taskitem/', {'index': index, 'value': 'true' if value else 'false'})
+
+    def test_toggle(self):
+        self.assertEqual(self.toggle(0, True).status_code, 204)
+        self.assertEqual(self.toggle(1, False).status_code, 204)
+        self.assertEqual(self.toggle(3, True).status_code, 404)
+
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(article.raw_content, '# Shopping\n\n- [x] Milk\n- [ ] Eggs\n- [ ] Flour\n')
+        rendered = Article(raw_content=article.raw_content)
+        rendered.render_markdown()
+        self.assertEqual(article.content_html, rendered.content_html)
+        self.assertEqual(article.task_items, [list(item) for item in rendered.task_items])
+        self.assertEqual(article.revision, self.article.revision + 2)
+
+    def test_concurrent(self):
+        stale = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(self.toggle(2, True).status_code, 204)
+
+        self.assertFalse(stale.save_if_unchanged(stale.set_task_item(0, True)))
+        stale.refresh_from_db()
+        self.assertTrue(stale.save_if_unchanged(stale.set_task_item(0, True)))
+        self.assertEqual(Article.objects.get(pk=self.article.pk).raw_content, '# Shopping\n\n- [x] Milk\n- [x] Eggs\n- [x] Flour\n')
+
+    def test_unknown_offsets(self):
+        self.article.content = self.CONTENT + '\n```\n- [ ] Not a task\n```\n'
+        self.article.save()
+        self.assertIsNone(self.article.task_items)
+
+        self.assertEqual(self.toggle(2, True).status_code, 204)
+        self.assertIn('- [x] Flour\n', Article.objects.get(pk=self.article.pk).raw_content)
@@ -14,6 +14,7 @@ urlpatterns = [
     path('<slug:slug>/taskitem/', views.article_checkbox),
     path('<slug:slug>/files/', views.article_attachment_list, name="article_attachment_list"),
     path('<slug:slug>/files/<str:name>', views.article_attachment, name="article_attachment"),
+    path('<slug:slug>/files/<str:name>/<int:width>.<str:format>', views.article_attachment_derivative, name="article_attachment_derivative"),
 
     path(':/edit/preview', views.article_preview, name="article_preview"),
 ]
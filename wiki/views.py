@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpRequest, HttpResponseRedirect, FileResponse, HttpResponse,HttpResponseBadRequest, HttpResponseNotFound
+from django.http import HttpRequest, HttpResponseRedirect, FileResponse, HttpResponse,HttpResponseBadRequest, HttpResponseNotFound, Http404
 from django.forms import modelform_factory, HiddenInput, inlineformset_factory, FileInput
 from django.core.validators import validate_slug
 from django.core.exceptions import ValidationError
@@ -9,11 +9,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
 from http import HTTPStatus
-from itertools import islice
-import re
 
 from .models import Article, Attachment
 from .markdown import render_markdown
+from . import derivatives
 
 # Create your views here.
 
@@ -230,6 +229,9 @@ def article_update(request: HttpRequest, slug: str = None):
             article: Article = form.save()
             formset.instance = article
             formset.save()
+            if formset.has_changed() and derivatives.enabled():
+                # Image derivatives depend on the attachments, which did not exist during the first render
+                article.save(update_fields=article.render_markdown())
             return HttpResponseRedirect(article.get_absolute_url())
     else:
         initial = None
@@ -268,6 +270,30 @@ def article_attachment(request: HttpRequest, slug: str, name: str):
     attachment = get_object_or_404(Attachment, article__slug=slug, name=name)
     return FileResponse(attachment.content, as_attachment=False, filename=attachment.name)
 
+def article_attachment_derivative(request: HttpRequest, slug: str, name: str, width: int, format: str):
+    if not derivatives.enabled():
+        raise Http404()
+    pk = get_object_or_404(Attachment.objects.values_list('pk', flat=True), article__slug=slug, name=name)
+
+    def load_content() -> bytes:
+        attachment = Attachment.objects.get(pk=pk)
+        try:
+            return attachment.content.read()
+        finally:
+            attachment.content.close()
+
+    try:
+        path = derivatives.get_derivative(pk, load_content, width, format)
+    except ValueError:
+        raise Http404()
+
+    if path is None:
+        # Still rendering, the original will do for now
+        return article_attachment(request, slug, name)
+    return FileResponse(open(path, 'rb'), as_attachment=False, content_type=derivatives.MIME_TYPES[format])
+
+TASK_ITEM_ATTEMPTS = 5
+
 @require_POST
 def article_checkbox(request: HttpRequest, slug: str):
     article = get_object_or_404(Article, slug=slug)
@@ -283,31 +309,22 @@ def article_checkbox(request: HttpRequest, slug: str):
     try:
         checkbox_index = int(request.POST.get('index'))
         checkbox_state = VALUE_MAP[request.POST.get('value', '').casefold()]
-    except (KeyError, ValueError):
+    except (KeyError, ValueError, TypeError):
         return HttpResponseBadRequest("Requires 'index' and 'value' field in POST body")
 
-    """
-    RegEx Explaination:
-    each checkbox line must:
-    - start with any number of whitespace (space or tab) '[ \t]*'
-    - A list item '[*+-]'
-    - Followed by at least one space '[ \t]+'
-    - Followed by a valid checkbox '\[([ xX])\]'
-      - A valid checkbox is one of '[ ]', '[x]', '[X]'
-      - We capture the string inside the square brackets for use later
-    - Followed by at least a space (space or tab) '[ \t]' (We dont need any more, so one does fine)
-    """
-    matches = re.finditer(r'^[ \t]*[*+-][ \t]+\[([ xX])\][ \t]', article.content, re.MULTILINE)
+    # Another client might toggle at the same time. Retry on the current article then
+    for _attempt in range(TASK_ITEM_ATTEMPTS):
+        try:
+            update_fields = article.set_task_item(checkbox_index, checkbox_state)
+        except IndexError:
+            return HttpResponseNotFound(f'No checkbox with id {checkbox_index} in article {article.slug}')
 
-    checkbox_match = next(islice(matches, checkbox_index, None), None)
-    if not checkbox_match:
-        return HttpResponseNotFound(f'No checkbox with id {checkbox_index} in article {article.slug}')
-    
-    new_state = 'x' if checkbox_state else ' '
-    article.content = article.content[:checkbox_match.start(1)] + new_state + article.content[checkbox_match.end(1):]
+        if not update_fields or article.save_if_unchanged(update_fields):
+            break
+        article.refresh_from_db()
+    else:
+        return HttpResponse(status=HTTPStatus.CONFLICT)
 
-    article.save()
-    
     return HttpResponse(status=HTTPStatus.NO_CONTENT)
 
 @csrf_exempt